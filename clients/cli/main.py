@@ -6,13 +6,17 @@
 """
 
 import asyncio
+import glob
+import hashlib
 import os
 import sys
+import time
 from typing import Optional
 
 from .nplt_client import NPLTClient
 from .rdt_client import RDTClient
 from .ui import ClientUI
+from shared.protocols.rdt import FEATURE_SACK, RDT_VERSION_1, SUPPORTED_VERSIONS
 from shared.utils.logger import get_client_logger
 
 
@@ -172,7 +176,7 @@ class ClientMain:
             self.running = False
             return True
 
-        # /upload <file> - 上传文件
+        # /upload <file|glob> [...] - 上传文件（多个文件并发上传）
         elif command == "/upload":
             await self._command_upload(args)
             return True
@@ -212,63 +216,200 @@ class ClientMain:
             await self._command_delete(args)
             return True
 
+        # /unfollow [file] - 停止日志跟踪
+        elif command == "/unfollow":
+            await self._command_unfollow(args)
+            return True
+
         # 未知命令
         else:
             self.logger.warning(f"未知命令: {command}")
             self.ui.print_warning(f"未知命令: {command}，输入 /help 查看帮助")
             return True
 
+    MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 单个文件大小限制（10MB）
+    MAX_PARALLEL_UPLOADS = 4  # 多文件上传时同时进行的上传数（服务器每会话上限 8）
+
     async def _command_upload(self, args: list):
-        """处理 /upload 命令"""
+        """处理 /upload 命令
+
+        支持多个路径或通配符（如 /upload a.txt logs/*.log）：多个文件通过同一连接多路并发上传。
+        """
         if not args:
-            self.ui.print_error("用法: /upload <文件路径>")
+            self.ui.print_error("用法: /upload <文件路径|通配符> [...]")
             return
 
-        filepath = args[0]
-        self.logger.info(f"上传文件请求: {filepath}")
-
-        # 检查文件是否存在
-        if not os.path.exists(filepath):
-            self.logger.error(f"文件不存在: {filepath}")
-            self.ui.print_error(f"文件不存在: {filepath}")
+        self.logger.info(f"上传文件请求: {' '.join(args)}")
+        filepaths = self._expand_upload_paths(args)
+        if not filepaths:
             return
 
-        # 获取文件信息
+        if len(filepaths) == 1:
+            # 单个文件不使用 stream_id，兼容旧版服务器
+            await self._upload_single(filepaths[0])
+        else:
+            await self._upload_multiple(filepaths)
+
+    def _expand_upload_paths(self, args: list) -> list:
+        """展开通配符并检查文件（不存在或超过大小限制的文件跳过）
+
+        Returns:
+            待上传的文件路径（去重，保持参数顺序）
+        """
+        filepaths = []
+        seen = set()
+        for arg in args:
+            pattern = os.path.expanduser(arg)
+            if glob.has_magic(pattern):
+                matches = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+                if not matches:
+                    self.ui.print_error(f"没有匹配的文件: {arg}")
+            else:
+                matches = [pattern]
+
+            for filepath in matches:
+                # 检查文件是否存在
+                if not os.path.isfile(filepath):
+                    self.logger.error(f"文件不存在: {filepath}")
+                    self.ui.print_error(f"文件不存在: {filepath}")
+                    continue
+
+                # 检查文件大小（10MB 限制）
+                filesize = os.path.getsize(filepath)
+                if filesize > self.MAX_UPLOAD_SIZE:
+                    self.logger.error(f"文件大小超过限制: {filepath} {filesize} > {self.MAX_UPLOAD_SIZE}")
+                    self.ui.print_error(f"文件大小超过限制: {filepath} ({filesize} > {self.MAX_UPLOAD_SIZE} 字节)")
+                    continue
+
+                realpath = os.path.realpath(filepath)
+                if realpath not in seen:
+                    seen.add(realpath)
+                    filepaths.append(filepath)
+        return filepaths
+
+    @staticmethod
+    def _read_upload(filepath: str) -> tuple:
+        """读取待上传文件
+
+        Returns:
+            (文件名, 文件内容, SHA-256, 上传 ID)
+        """
         filename = os.path.basename(filepath)
-        filesize = os.path.getsize(filepath)
+        with open(filepath, 'rb') as f:
+            file_data = f.read()
 
-        # 检查文件大小（10MB 限制）
-        max_size = 10 * 1024 * 1024
-        if filesize > max_size:
-            self.logger.error(f"文件大小超过限制: {filesize} > {max_size}")
-            self.ui.print_error(f"文件大小超过限制 ({filesize} > {max_size} 字节)")
-            return
+        # 上传 ID 由文件名和内容哈希决定：连接中断后重新上传同一文件时服务器可从断点续传
+        sha256 = hashlib.sha256(file_data).hexdigest()
+        upload_id = hashlib.sha256(f"{filename}\0{sha256}".encode('utf-8')).hexdigest()[:32]
+        return filename, file_data, sha256, upload_id
+
+    async def _upload_single(self, filepath: str):
+        """上传单个文件"""
+        filename = os.path.basename(filepath)
+        filesize = os.path.getsize(filepath)
 
         self.logger.info(f"上传文件: {filename} ({filesize} 字节)")
         self.ui.print_info(f"上传文件: {filename} ({filesize} 字节)")
 
         # 读取文件内容
         try:
-            with open(filepath, 'rb') as f:
-                file_data = f.read()
+            filename, file_data, sha256, upload_id = self._read_upload(filepath)
+
+            # 发送文件元数据并获取续传偏移
+            offset = await self.client.begin_upload(filename, filesize, upload_id, sha256)
+            if offset is None:
+                self.ui.print_error(f"上传文件失败: {filename}")
+                return
+            if offset > 0:
+                self.ui.print_info(f"从断点续传: 已上传 {offset}/{filesize} 字节")
 
             # 创建进度条
             progress, task_id = self.ui.create_upload_progress(filename, filesize)
 
             with progress:
-                # 发送文件元数据
-                await self.client.send_file_metadata(filename, filesize)
+                progress.update(task_id, completed=offset)
 
                 # 分块发送文件数据
-                await self.client.send_file_data(file_data, progress, task_id)
+                if not await self.client.send_file_data(file_data, progress, task_id, offset=offset):
+                    self.ui.print_error(f"上传文件失败: {filename}")
+                    return
 
+            stats = self.client.last_upload_stats
             self.logger.info(f"文件上传完成: {filename}")
-            self.ui.print_success(f"文件上传完成: {filename}")
+            self.ui.print_success(
+                f"文件上传完成: {filename}（用时 {stats['seconds']:.2f}s，"
+                f"{stats['throughput'] / 1024 / 1024:.2f} MB/s）"
+            )
 
         except Exception as e:
             self.logger.error(f"上传文件失败: {e}")
             self.ui.print_error(f"上传文件失败: {e}")
 
+    async def _upload_multiple(self, filepaths: list):
+        """通过同一连接多路并发上传多个文件（每个文件一个 stream_id，按帧轮流发送）"""
+        total_size = sum(os.path.getsize(filepath) for filepath in filepaths)
+        self.logger.info(f"多文件上传: {len(filepaths)} 个文件，共 {total_size} 字节")
+        self.ui.print_info(f"上传 {len(filepaths)} 个文件（共 {total_size} 字节）")
+
+        progress = None
+        task_ids = {}
+        for filepath in filepaths:
+            filename = os.path.basename(filepath)
+            filesize = os.path.getsize(filepath)
+            if progress is None:
+                progress, task_ids[filepath] = self.ui.create_upload_progress(filename, filesize)
+            else:
+                task_ids[filepath] = progress.add_task(filename, filename=filename, total=filesize)
+
+        semaphore = asyncio.Semaphore(self.MAX_PARALLEL_UPLOADS)
+        upload_ids = set()
+
+        async def upload(filepath: str) -> int:
+            """上传一个文件，返回本次发送的字节数（失败返回 -1）"""
+            async with semaphore:
+                try:
+                    # 读取和计算哈希放到线程中，不阻塞其他上传发送数据
+                    filename, file_data, sha256, upload_id = await asyncio.to_thread(self._read_upload, filepath)
+                    if upload_id in upload_ids:
+                        self.ui.print_warning(f"跳过重复文件: {filepath}")
+                        return 0
+                    upload_ids.add(upload_id)
+
+                    stream_id = self.client.allocate_stream_id()
+                    offset = await self.client.begin_upload(
+                        filename, len(file_data), upload_id, sha256, stream_id=stream_id
+                    )
+                    if offset is None:
+                        return -1
+                    progress.update(task_ids[filepath], completed=offset)
+
+                    if not await self.client.send_file_data(
+                        file_data, progress, task_ids[filepath], offset=offset, stream_id=stream_id
+                    ):
+                        return -1
+                    return len(file_data) - offset
+                except Exception as e:
+                    self.logger.error(f"上传文件失败: {filepath}: {e}")
+                    return -1
+
+        start_time = time.monotonic()
+        with progress:
+            results = await asyncio.gather(*(upload(filepath) for filepath in filepaths))
+        elapsed = time.monotonic() - start_time
+
+        failed = [filepath for filepath, sent in zip(filepaths, results) if sent < 0]
+        sent = sum(sent for sent in results if sent > 0)
+        for filepath in failed:
+            self.ui.print_error(f"上传文件失败: {filepath}")
+
+        throughput = sent / elapsed / 1024 / 1024 if elapsed > 0 else 0.0
+        self.logger.info(f"多文件上传完成: 成功 {len(filepaths) - len(failed)}/{len(filepaths)}，"
+                         f"{sent} 字节，用时 {elapsed:.2f}s")
+        self.ui.print_success(
+            f"上传完成: {len(filepaths) - len(failed)}/{len(filepaths)} 个文件"
+            f"（用时 {elapsed:.2f}s，{throughput:.2f} MB/s）"
+        )
+
     async def _command_model(self, args: list):
         """处理 /model 命令
 
@@ -329,6 +470,21 @@ class ClientMain:
             self.logger.error("发送历史记录请求失败")
             self.ui.print_error("获取历史记录失败")
 
+    async def _command_unfollow(self, args: list):
+        """处理 /unfollow 命令"""
+        from shared.protocols.nplt import MessageType
+
+        # 不带参数时停止全部跟踪
+        path = args[0] if args else ""
+        success = await self.client.send_message(
+            MessageType.FOLLOW_STOP,
+            path.encode('utf-8')
+        )
+
+        if not success:
+            self.logger.error("发送停止跟踪请求失败")
+            self.ui.print_error("停止跟踪失败")
+
     async def _command_clear(self):
         """处理 /clear 命令"""
         from shared.protocols.nplt import MessageType
@@ -444,8 +600,8 @@ class ClientMain:
             import json
             from shared.protocols.nplt import MessageType
 
-            # 构造 UDP 端口注册消息
-            port_data = json.dumps({"udp_port": udp_port})
+            # 构造 UDP 端口注册消息（同时声明支持的 RDT 协议版本）
+            port_data = json.dumps({"udp_port": udp_port, "rdt_versions": list(SUPPORTED_VERSIONS)})
             success = await self.client.send_message(
                 MessageType.CLIENT_UDP_PORT,
                 port_data.encode('utf-8')
@@ -472,6 +628,10 @@ class ClientMain:
             download_token = offer_data.get("download_token", "")
             server_host = offer_data.get("server_host", self.host)
             server_port = offer_data.get("server_port", 9998)
+            features = offer_data.get("features", [])
+            rdt_version = offer_data.get("rdt_version", RDT_VERSION_1)
+            transfer_id = offer_data.get("transfer_id", 0)
+            chunk_size = offer_data.get("chunk_size")
 
             # 格式化文件大小
             size_str = self._format_filesize(filesize)
@@ -493,7 +653,11 @@ class ClientMain:
                 checksum=checksum,
                 download_token=download_token,
                 server_host=server_host,
-                server_port=server_port
+                server_port=server_port,
+                selective_ack=FEATURE_SACK in features,
+                rdt_version=rdt_version,
+                transfer_id=transfer_id,
+                chunk_size=chunk_size
             )
 
         except Exception as e:
@@ -507,7 +671,11 @@ class ClientMain:
         checksum: str,
         download_token: str,
         server_host: str,
-        server_port: int
+        server_port: int,
+        selective_ack: bool = False,
+        rdt_version: int = RDT_VERSION_1,
+        transfer_id: int = 0,
+        chunk_size: Optional[int] = None
     ):
         """下载文件
 
@@ -518,6 +686,10 @@ class ClientMain:
             download_token: 下载令牌
             server_host: 服务器地址
             server_port: 服务器端口
+            selective_ack: 服务器是否支持 SACK
+            rdt_version: 协商的 RDT 协议版本
+            transfer_id: 传输 ID（v2）
+            chunk_size: 每包数据长度
         """
         try:
             import time
@@ -526,12 +698,18 @@ class ClientMain:
             self.logger.info(f"开始下载: {filename}")
             self.ui.print_info(f"正在下载: {filename}...")
 
-            # 创建接收会话
+            # 创建接收会话（边接收边写入磁盘，大文件不占用内存）
+            save_path = os.path.join("downloads", filename)
             session = self.rdt_client.create_session(
                 download_token=download_token,
                 filename=filename,
                 file_size=filesize,
-                expected_checksum=checksum
+                expected_checksum=checksum,
+                selective_ack=selective_ack,
+                version=rdt_version,
+                transfer_id=transfer_id,
+                chunk_size=chunk_size,
+                output_path=save_path
             )
 
             # 创建进度条
@@ -557,37 +735,22 @@ class ClientMain:
 
                 async def update_progress():
                     while session.state.value == "receiving":
-                        received = sum(len(data) for data in session.received_packets.values())
-                        progress.update(task_id, completed=received)
+                        progress.update(task_id, completed=session.received_bytes)
                         await asyncio.sleep(0.1)
 
                 progress_task = asyncio.create_task(update_progress())
 
-                # 接收文件
-                file_data = await self.rdt_client.receive_file(download_token)
+                # 接收文件（校验和在接收时累计计算，校验通过后才重命名为正式文件）
+                saved = await self.rdt_client.receive_to_file(download_token)
 
                 # 取消进度更新任务
                 progress_task.cancel()
                 progress.update(task_id, completed=filesize)
 
-            if file_data is None:
-                self.ui.print_error("文件下载失败")
+            if saved is None:
+                self.ui.print_error("文件下载失败（接收超时或校验和不匹配）")
                 return
 
-            # 验证文件完整性
-            import hashlib
-            computed_checksum = hashlib.md5(file_data).hexdigest()
-            if computed_checksum != checksum:
-                self.ui.print_error("文件校验和不匹配，文件可能损坏")
-                return
-
-            # 保存文件
-            save_path = os.path.join("downloads", filename)
-            os.makedirs("downloads", exist_ok=True)
-
-            with open(save_path, 'wb') as f:
-                f.write(file_data)
-
             # 计算统计信息
             elapsed = time.time() - start_time
             speed = filesize / elapsed if elapsed > 0 else 0
@@ -6,11 +6,12 @@ NPLT 客户端模块
 """
 
 import asyncio
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Callable, Optional
 import json
-from shared.protocols.nplt import MessageType, NPLTMessage
+from shared.protocols.nplt import MAX_STREAM_CHUNK, MessageType, NPLTMessage, encode_stream_chunk
 from shared.utils.logger import get_client_logger, get_network_logger
 from .ui import ClientUI
 
@@ -47,6 +48,19 @@ class NPLTClient:
     # 流式输出状态
     is_streaming: bool = False  # 是否正在流式输出
 
+    # 最近一次文件上传的统计（字节数、用时、吞吐）
+    last_upload_stats: Optional[dict] = None
+
+    # 等待服务器续传偏移的上传（upload_id -> Future）
+    upload_offsets: Optional[dict] = None
+
+    # 多路上传的下一个 stream_id（1-65535 循环）
+    next_stream_id: int = 1
+
+    # 文件上传：每帧载荷接近 NPLT v2 上限，发送缓冲区高水位放宽到 1MB 以保持管道充满
+    FILE_CHUNK_SIZE = 64 * 1024 - 1
+    WRITE_BUFFER_HIGH_WATER = 1024 * 1024
+
     # 日志记录器（在 __post_init__ 中初始化）
     logger = None
 
@@ -55,6 +69,7 @@ class NPLTClient:
         if self.ui is None:
             self.ui = ClientUI()
         self.response_event = asyncio.Event()
+        self.upload_offsets = {}
         # 使用 network logger 记录网络通信事件
         self.logger = get_network_logger()
 
@@ -76,6 +91,7 @@ class NPLTClient:
                     self.host,
                     self.port
                 )
+                self.writer.transport.set_write_buffer_limits(high=self.WRITE_BUFFER_HIGH_WATER)
 
                 self.connected = True
                 self.logger.info("连接成功")
@@ -155,7 +171,7 @@ class NPLTClient:
                     content_summary = f", 文件={metadata.get('filename', 'unknown')}, 大小={metadata.get('size', 0)} 字节"
                 except:
                     content_summary = ", 元数据解析失败"
-            elif message_type == MessageType.FILE_DATA:
+            elif message_type in (MessageType.FILE_DATA, MessageType.STREAM_DATA):
                 # 对于文件数据，只记录数据块大小
                 content_summary = f", 数据块={len(data)} 字节"
 
@@ -355,6 +371,16 @@ class NPLTClient:
                             self.ui.update_spinner(content)
                         self.logger.debug(f"Agent 状态: {status_type} - {content}")
 
+                    elif status_type == "log_lines":
+                        # 日志跟踪推送的新增行
+                        self.ui.print_log_lines(status_data.get("path", ""), content)
+
+                    elif status_type == "tool_output":
+                        # 命令执行中的部分输出，显示最后一行
+                        lines = [line for line in content.splitlines() if line.strip()]
+                        if lines:
+                            self.ui.update_spinner(lines[-1][:120])
+
                     else:
                         # 其他类型的状态，直接更新 spinner
                         self.ui.update_spinner(content)
@@ -368,6 +394,14 @@ class NPLTClient:
                     else:
                         self.ui.update_spinner(text)
 
+            elif message.type == MessageType.FILE_OFFSET:
+                # 续传偏移（回复可续传上传的元数据）
+                import json
+                reply = json.loads(message.data.decode('utf-8'))
+                future = self.upload_offsets.pop(reply.get('upload_id'), None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+
             elif message.type == MessageType.DOWNLOAD_OFFER:
                 # 下载提议
                 import json
@@ -406,13 +440,23 @@ class NPLTClient:
         )
 
 
-    async def send_file_metadata(self, filename: str, filesize: int) -> bool:
+    def allocate_stream_id(self) -> int:
+        """分配多路上传的 stream_id"""
+        stream_id = self.next_stream_id
+        self.next_stream_id = stream_id % 0xFFFF + 1
+        return stream_id
+
+    async def send_file_metadata(self, filename: str, filesize: int, upload_id: str = None, sha256: str = None,
+                                 stream_id: int = None) -> bool:
         """发送文件元数据
-        
+
         Args:
             filename: 文件名
             filesize: 文件大小
-            
+            upload_id: 上传 ID（提供时服务器按可续传上传处理）
+            sha256: 整个文件的 SHA-256（服务器接收完成后校验）
+            stream_id: 多路上传的流 ID（提供时数据以带同一 stream_id 前缀的 STREAM_DATA 发送）
+
         Returns:
             是否发送成功
         """
@@ -420,55 +464,125 @@ class NPLTClient:
             "filename": filename,
             "size": filesize
         }
+        if upload_id:
+            metadata["upload_id"] = upload_id
+        if sha256:
+            metadata["sha256"] = sha256
+        if stream_id:
+            metadata["stream_id"] = stream_id
         metadata_json = json.dumps(metadata, ensure_ascii=False)
-        
+
         self.logger.info(f"发送文件元数据: {filename} ({filesize} 字节)")
         return await self.send_message(
             MessageType.FILE_METADATA,
             metadata_json.encode('utf-8')
         )
-    
-    async def send_file_data(self, file_data: bytes, progress=None, task_id=None) -> bool:
+
+    async def begin_upload(self, filename: str, filesize: int, upload_id: str, sha256: str,
+                           timeout: float = 5.0, stream_id: int = None) -> Optional[int]:
+        """开始（或恢复）可续传上传
+
+        发送带 upload_id 的元数据并等待服务器回复已接收的偏移。
+        旧版服务器不回复 FILE_OFFSET，超时后按从头上传处理（与其行为一致）。
+
+        Args:
+            filename: 文件名
+            filesize: 文件大小
+            upload_id: 上传 ID（同一文件重复上传时保持不变）
+            sha256: 整个文件的 SHA-256
+            timeout: 等待偏移回复的超时（秒）
+            stream_id: 多路上传的流 ID（可选）
+
+        Returns:
+            续传起始偏移；服务器拒绝或发送失败时返回 None
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.upload_offsets[upload_id] = future
+
+        if not await self.send_file_metadata(filename, filesize, upload_id=upload_id, sha256=sha256,
+                                             stream_id=stream_id):
+            self.upload_offsets.pop(upload_id, None)
+            return None
+
+        try:
+            reply = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.upload_offsets.pop(upload_id, None)
+            self.logger.warning("服务器未回复续传偏移，从头上传")
+            return 0
+
+        offset = reply.get('offset', 0)
+        if offset < 0:
+            self.logger.error(f"服务器拒绝上传: {reply.get('error')}")
+            self.ui.print_error(f"服务器拒绝上传 {filename}: {reply.get('error')}")
+            return None
+        return offset
+
+    async def send_file_data(self, file_data: bytes, progress=None, task_id=None, chunk_size: int = None,
+                             offset: int = 0, stream_id: int = None) -> bool:
         """分块发送文件数据
-        
+
+        每帧使用接近 NPLT v2 上限（65535 字节）的载荷，由 send_message 中的
+        writer.drain() 提供背压：发送缓冲区积压时自动等待，不再每块固定 sleep。
+        多路上传（提供 stream_id）时每帧发送后让出事件循环，多个上传按帧轮流发送。
+
         Args:
             file_data: 文件数据
             progress: Rich 进度条对象（可选）
             task_id: 进度条任务 ID（可选）
-            
+            chunk_size: 每帧数据大小（默认 NPLT 单帧上限）
+            offset: 起始偏移（续传时为服务器已接收的字节数）
+            stream_id: 多路上传的流 ID（可选）
+
         Returns:
             是否发送成功
         """
-        chunk_size = 200  # 每块 200 字节（NPLT 协议限制）
+        if chunk_size is None:
+            chunk_size = self.FILE_CHUNK_SIZE
+        chunk_size = min(chunk_size, MAX_STREAM_CHUNK if stream_id else NPLTMessage.MAX_DATA_LENGTH)
+
         total_size = len(file_data)
+        view = memoryview(file_data)
         sent = 0
-        
-        self.logger.info(f"开始分块发送文件数据: {total_size} 字节，块大小 {chunk_size} 字节")
-        
+        start_time = time.monotonic()
+
+        self.logger.info(f"开始分块发送文件数据: {total_size} 字节（从偏移 {offset} 开始），块大小 {chunk_size} 字节")
+
         # 分块发送
-        for i in range(0, total_size, chunk_size):
-            chunk = file_data[i:i + chunk_size]
-            
-            # 发送数据块
+        for i in range(offset, total_size, chunk_size):
+            chunk = view[i:i + chunk_size]
+            payload = encode_stream_chunk(stream_id, chunk) if stream_id else bytes(chunk)
+
+            # 发送数据块（drain 在缓冲区超过高水位时挂起）
             success = await self.send_message(
-                MessageType.FILE_DATA,
-                chunk
+                MessageType.STREAM_DATA if stream_id else MessageType.FILE_DATA,
+                payload
             )
-            
+
             if not success:
                 self.logger.error(f"发送文件数据块失败 (偏移: {i})")
                 return False
-            
+
             sent += len(chunk)
-            
+
             # 更新进度条
             if progress and task_id is not None:
                 progress.update(task_id, advance=len(chunk))
-            
-            # 短暂延迟，避免发送过快
-            await asyncio.sleep(0.01)
-        
-        self.logger.info(f"文件数据发送完成: {sent} 字节")
+
+            # 多路上传：让其他上传发送下一帧，公平交错
+            if stream_id:
+                await asyncio.sleep(0)
+
+        elapsed = time.monotonic() - start_time
+        self.last_upload_stats = {
+            "bytes": sent,
+            "seconds": elapsed,
+            "throughput": sent / elapsed if elapsed > 0 else 0.0
+        }
+        self.logger.info(
+            f"文件数据发送完成: {sent} 字节，用时 {elapsed:.2f}s，"
+            f"吞吐 {self.last_upload_stats['throughput'] / 1024 / 1024:.2f} MB/s"
+        )
         return True
 
 
@@ -2,18 +2,29 @@
 RDT 客户端模块
 
 实现 RDT 可靠文件传输的接收方，支持滑动窗口和 ACK 发送。
+按序到达的数据直接写入文件（或内存）并累计 MD5，只缓存乱序到达的包。
 遵循章程：真实实现，不允许虚假实现或占位符
 """
 
 import asyncio
 import hashlib
 import logging
+import os
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Dict, List, Optional, Set
 
-from shared.protocols.rdt import ACKPacket, RDTPacket
+from shared.protocols.rdt import (
+    RDT_VERSION_1,
+    RDT_VERSION_2,
+    ACKPacket,
+    ACKPacketV2,
+    RDTPacket,
+    RDTPacketV2,
+    SACKPacket
+)
 from shared.utils.logger import get_rdt_logger
 
 
@@ -37,17 +48,45 @@ class RDTClientSession:
 
     # 接收窗口
     window_size: int = 5            # 接收窗口大小
-    expected_seq: int = 0           # 期望的序列号
-    received_packets: Dict[int, bytes] = field(default_factory=dict)  # 已接收包
+    expected_seq: int = 0           # 期望的序列号（之前的包均已按序写出）
+    received_packets: Dict[int, bytes] = field(default_factory=dict)  # 乱序到达、尚未写出的包
     acked_seqs: Set[int] = field(default_factory=set)  # 已确认序列号
+    selective_ack: bool = False     # 服务器支持 SACK 时以 SACK 包确认（携带乱序到达的包）
+
+    # 协议版本（DOWNLOAD_OFFER 协商）
+    version: int = RDT_VERSION_1
+    transfer_id: int = 0            # 传输 ID（v2）
+    chunk_size: int = RDTPacket.MAX_DATA_LENGTH  # 每包数据长度
 
     # 统计信息
     total_packets: int = 0          # 总包数
     received_count: int = 0         # 已接收包数
+    received_bytes: int = 0         # 已接收字节数
     duplicate_count: int = 0        # 重复包数
+    last_activity: float = field(default_factory=time.monotonic)  # 最近一次收到新包的时间
+
+    # 按序写出的数据（output_path 为空时保存在内存中）
+    output_path: Optional[str] = None
+    _file: Optional[object] = field(default=None, repr=False)
+    _chunks: List[bytes] = field(default_factory=list, repr=False)
+    _md5: object = field(default_factory=hashlib.md5, repr=False)
+
+    TEMP_SUFFIX = ".part"
+    WRITE_BUFFER = 1024 * 1024
+
+    @property
+    def temp_path(self) -> Optional[str]:
+        """接收中的临时文件路径（校验通过后重命名为 output_path）"""
+        return self.output_path + self.TEMP_SUFFIX if self.output_path else None
+
+    def open_output(self):
+        """创建临时文件（写入磁盘时）"""
+        if self.output_path and self._file is None:
+            os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+            self._file = open(self.temp_path, 'wb', buffering=self.WRITE_BUFFER)
 
     def add_packet(self, seq: int, data: bytes) -> bool:
-        """添加数据包
+        """添加数据包（按序的数据立即写出，乱序的暂存到缺口补齐）
 
         Args:
             seq: 序列号
@@ -56,36 +95,48 @@ class RDTClientSession:
         Returns:
             是否为新包
         """
-        if seq in self.received_packets:
+        if seq < self.expected_seq or seq in self.received_packets:
             # 重复包
             self.duplicate_count += 1
             return False
+        if seq >= self.total_packets:
+            return False
 
-        self.received_packets[seq] = data
         self.received_count += 1
+        self.received_bytes += len(data)
+        self.last_activity = time.monotonic()
+
+        if seq != self.expected_seq:
+            self.received_packets[seq] = data
+            return True
+
+        self._write(data)
+        seq += 1
+        while seq in self.received_packets:
+            self._write(self.received_packets.pop(seq))
+            seq += 1
+        self.expected_seq = seq
         return True
 
+    def _write(self, data: bytes):
+        """按序写出数据并更新 MD5"""
+        self._md5.update(data)
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._chunks.append(data)
+
     def get_next_expected_seq(self) -> int:
         """获取下一个期望的序列号"""
-        # 找到第一个缺失的序列号
-        seq = self.expected_seq
-        while seq in self.received_packets:
-            seq += 1
-        return seq
+        return self.expected_seq
 
     def is_complete(self) -> bool:
         """检查接收是否完成"""
-        if not self.file_size:
-            return False
-
-        # 计算总包数
-        total_packets = (self.file_size + RDTPacket.MAX_DATA_LENGTH - 1) // RDTPacket.MAX_DATA_LENGTH
-
-        # 检查是否收到所有包
-        return len(self.received_packets) >= total_packets
+        # 检查是否收到所有包（空文件没有数据包，创建会话即完成）
+        return self.expected_seq >= self.total_packets
 
     def assemble_file(self) -> bytes:
-        """组装文件数据
+        """组装文件数据（仅内存接收）
 
         Returns:
             完整的文件数据
@@ -95,25 +146,31 @@ class RDTClientSession:
         """
         if not self.is_complete():
             raise ValueError("数据不完整，无法组装文件")
-
-        # 按序列号排序并组装
-        sorted_seqs = sorted(self.received_packets.keys())
-        chunks = [self.received_packets[seq] for seq in sorted_seqs]
-
-        return b''.join(chunks)
+        return b''.join(self._chunks)
 
     def verify_checksum(self) -> bool:
-        """验证文件校验和
+        """验证文件校验和（接收时累计计算，不再重新读取数据）
 
         Returns:
             校验和是否匹配
         """
-        try:
-            file_data = self.assemble_file()
-            computed_checksum = hashlib.md5(file_data).hexdigest()
-            return computed_checksum == self.expected_checksum
-        except ValueError:
-            return False
+        return self.is_complete() and self._md5.hexdigest() == self.expected_checksum
+
+    def finish_output(self):
+        """关闭临时文件并重命名为正式文件名"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.replace(self.temp_path, self.output_path)
+
+    def discard_output(self):
+        """放弃接收：关闭并删除临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self._chunks.clear()
 
 
 @dataclass
@@ -126,6 +183,8 @@ class RDTClient:
 
     # 内部状态
     sessions: Dict[str, RDTClientSession] = field(default_factory=dict)
+    transfers: Dict[int, RDTClientSession] = field(default_factory=dict)  # v2 传输 ID -> 会话
+    linger: float = 5.0  # 接收完成后继续确认重传包的时间（秒），防止最后的 ACK 丢失后发送方一直重传
     transport: Optional[asyncio.DatagramTransport] = None
     protocol: Optional[asyncio.DatagramProtocol] = None
     running: bool = False
@@ -166,6 +225,7 @@ class RDTClient:
 
         # 关闭所有会话
         self.sessions.clear()
+        self.transfers.clear()
 
         # 关闭传输
         if self.transport:
@@ -178,7 +238,12 @@ class RDTClient:
         download_token: str,
         filename: str,
         file_size: int,
-        expected_checksum: str
+        expected_checksum: str,
+        selective_ack: bool = False,
+        version: int = RDT_VERSION_1,
+        transfer_id: int = 0,
+        chunk_size: Optional[int] = None,
+        output_path: Optional[str] = None
     ) -> RDTClientSession:
         """创建接收会话
 
@@ -187,6 +252,11 @@ class RDTClient:
             filename: 文件名
             file_size: 文件大小
             expected_checksum: 预期的校验和
+            selective_ack: 是否使用 SACK 确认（DOWNLOAD_OFFER 声明了 sack 特性时启用）
+            version: 协议版本（DOWNLOAD_OFFER 的 rdt_version）
+            transfer_id: 传输 ID（v2）
+            chunk_size: 每包数据长度（默认为协议版本的最大值）
+            output_path: 保存路径（提供时边接收边写入磁盘，否则保存在内存中）
 
         Returns:
             RDTClientSession 实例
@@ -197,13 +267,23 @@ class RDTClient:
             file_size=file_size,
             expected_checksum=expected_checksum,
             state=RDTClientState.RECEIVING,
-            window_size=self.window_size
+            window_size=self.window_size,
+            selective_ack=selective_ack or version == RDT_VERSION_2,
+            version=version,
+            transfer_id=transfer_id,
+            chunk_size=chunk_size or (
+                RDTPacketV2.MAX_DATA_LENGTH if version == RDT_VERSION_2 else RDTPacket.MAX_DATA_LENGTH
+            ),
+            output_path=output_path
         )
+        session.open_output()
 
         self.sessions[download_token] = session
+        if version == RDT_VERSION_2:
+            self.transfers[transfer_id] = session
 
         # 计算总包数
-        total_packets = (file_size + RDTPacket.MAX_DATA_LENGTH - 1) // RDTPacket.MAX_DATA_LENGTH
+        total_packets = (file_size + session.chunk_size - 1) // session.chunk_size
         session.total_packets = total_packets
 
         self.logger.info(f"创建接收会话: {filename} ({file_size} 字节, {total_packets} 个包)")
@@ -211,57 +291,92 @@ class RDTClient:
         return session
 
     async def receive_file(self, download_token: str, timeout: float = 30.0) -> Optional[bytes]:
-        """接收文件
+        """接收文件到内存
 
         Args:
             download_token: 下载令牌
-            timeout: 超时时间（秒）
+            timeout: 无数据超时时间（秒），连续这么久没有收到新包即判定失败
 
         Returns:
             文件数据，失败返回 None
         """
+        session = await self._wait_for_file(download_token, timeout)
+        return session.assemble_file() if session else None
+
+    async def receive_to_file(self, download_token: str, timeout: float = 30.0) -> Optional[str]:
+        """接收文件并写入 create_session 指定的 output_path
+
+        Args:
+            download_token: 下载令牌
+            timeout: 无数据超时时间（秒），连续这么久没有收到新包即判定失败
+
+        Returns:
+            保存路径，失败返回 None
+        """
+        session = await self._wait_for_file(download_token, timeout)
+        return session.output_path if session else None
+
+    async def _wait_for_file(self, download_token: str, timeout: float) -> Optional[RDTClientSession]:
+        """等待接收完成并校验（超时只按无数据的时间计算，大文件不受总时长限制）
+
+        Returns:
+            接收成功的会话，失败返回 None
+        """
         session = self.sessions.get(download_token)
         if not session:
             self.logger.error(f"会话不存在: {download_token}")
             return None
 
         session.state = RDTClientState.RECEIVING
+        session.last_activity = time.monotonic()
 
         try:
-            # 等待接收完成
-            start_time = asyncio.get_event_loop().time()
-
             while not session.is_complete() and session.state != RDTClientState.FAILED:
                 # 检查超时
-                elapsed = asyncio.get_event_loop().time() - start_time
-                if elapsed > timeout:
-                    self.logger.error(f"接收超时 (token={download_token})")
+                if time.monotonic() - session.last_activity > timeout:
+                    self.logger.error(f"接收超时：{timeout:.0f} 秒内未收到新数据 (token={download_token})")
                     session.state = RDTClientState.FAILED
-                    return None
+                    break
 
                 await asyncio.sleep(0.1)
 
+            if session.state == RDTClientState.FAILED:
+                return None
+
             # 验证校验和
             if not session.verify_checksum():
                 self.logger.error(f"校验和不匹配 (token={download_token})")
                 session.state = RDTClientState.FAILED
                 return None
 
-            # 组装文件
-            file_data = session.assemble_file()
+            session.finish_output()
             session.state = RDTClientState.COMPLETED
 
             self.logger.info(f"文件接收完成: {session.filename}")
             self.logger.info(f"接收统计: {session.received_count}/{session.total_packets} 包, "
                             f"重复: {session.duplicate_count}")
 
-            return file_data
+            return session
 
         except Exception as e:
             self.logger.error(f"接收文件失败: {e}")
             session.state = RDTClientState.FAILED
             return None
 
+        finally:
+            if session.state != RDTClientState.COMPLETED:
+                # 失败或被取消：不再接收后续的包，删除临时文件
+                session.state = RDTClientState.FAILED
+                session.discard_output()
+            # 接收结束后延迟移出分发表：期间到达的重传包仍然回复确认
+            if self.transfers.get(session.transfer_id) is session:
+                asyncio.get_running_loop().call_later(self.linger, self._forget_transfer, session)
+
+    def _forget_transfer(self, session: RDTClientSession):
+        """将已结束的 v2 传输移出分发表"""
+        if self.transfers.get(session.transfer_id) is session:
+            del self.transfers[session.transfer_id]
+
     def handle_packet(self, data: bytes, addr: tuple):
         """处理接收到的数据包
 
@@ -270,20 +385,37 @@ class RDTClient:
             addr: 发送方地址
         """
         try:
-            # 解码数据包
-            packet = RDTPacket.decode(data)
-
-            # 验证数据包
-            if not packet.validate():
-                self.logger.warning(f"收到无效数据包 (seq={packet.seq})")
-                return
-
-            # 查找会话（使用第一个活跃会话）
-            session = None
-            for s in self.sessions.values():
-                if s.state == RDTClientState.RECEIVING:
-                    session = s
-                    break
+            # v2 数据包以版本号开头并带 CRC32，校验通过即按 v2 处理
+            packet = None
+            if data[0] == RDT_VERSION_2 and len(data) >= RDTPacketV2.HEADER_SIZE:
+                packet = RDTPacketV2.decode(data)
+                if not packet.validate():
+                    packet = None
+
+            if packet is None:
+                # 解码数据包
+                packet = RDTPacket.decode(data)
+
+                # 验证数据包
+                if not packet.validate():
+                    self.logger.warning(f"收到无效数据包 (seq={packet.seq})")
+                    return
+
+            # 查找会话（v2 按传输 ID 查表，v1 包不带传输 ID，使用第一个活跃的 v1 会话）
+            if isinstance(packet, RDTPacketV2):
+                session = self.transfers.get(packet.transfer_id)
+                if session is not None and session.state == RDTClientState.COMPLETED:
+                    # 已完成的传输：发送方没收到最后的确认，重复确认让其结束
+                    self._send_ack_v2(session, addr)
+                    return
+                if session is not None and session.state != RDTClientState.RECEIVING:
+                    session = None
+            else:
+                session = None
+                for s in self.sessions.values():
+                    if s.state == RDTClientState.RECEIVING and s.version == RDT_VERSION_1:
+                        session = s
+                        break
 
             if not session:
                 self.logger.warning("无活跃会话")
@@ -292,9 +424,14 @@ class RDTClient:
             # 添加数据包
             is_new = session.add_packet(packet.seq, packet.data)
 
-            # 发送 ACK（累积确认）
+            # 发送 ACK（累积确认；支持时附带乱序到达包的位图）
             expected_seq = session.get_next_expected_seq()
-            self._send_ack(expected_seq, addr)
+            if session.version == RDT_VERSION_2:
+                self._send_ack_v2(session, addr)
+            elif session.selective_ack:
+                self._send_sack(expected_seq, session.received_packets, addr)
+            else:
+                self._send_ack(expected_seq, addr)
 
             if is_new:
                 self.logger.debug(f"收到包 {packet.seq}/{session.total_packets}, "
@@ -321,6 +458,35 @@ class RDTClient:
         self.transport.sendto(encoded, addr)
 
 
+    def _send_ack_v2(self, session: RDTClientSession, addr: tuple):
+        """发送 v2 确认包（累积确认号 + SACK 位图）
+
+        Args:
+            session: 接收会话
+            addr: 目标地址
+        """
+        if not self.transport:
+            raise RuntimeError("RDT 客户端未启动")
+
+        seq = session.get_next_expected_seq()
+        ack = ACKPacketV2.from_received(session.transfer_id, seq, session.received_packets)
+        self.transport.sendto(ack.encode(), addr)
+
+    def _send_sack(self, seq: int, received: Dict[int, bytes], addr: tuple):
+        """发送 SACK 包
+
+        Args:
+            seq: 累积确认号
+            received: 已收到的包（用于构造位图）
+            addr: 目标地址
+        """
+        if not self.transport:
+            raise RuntimeError("RDT 客户端未启动")
+
+        sack = SACKPacket.from_received(seq, received)
+        self.transport.sendto(sack.encode(), addr)
+
+
 class RDTClientProtocol(asyncio.DatagramProtocol):
     """RDT 客户端协议"""
 
@@ -9,6 +9,7 @@
 """
 
 import asyncio
+import os
 import re
 import logging
 from rich.console import Console
@@ -697,6 +698,17 @@ class ClientUI:
         """
         self.console.print(f"[blue]{message}[/blue]")
 
+    def print_log_lines(self, path: str, content: str):
+        """打印日志跟踪推送的新增行
+
+        Args:
+            path: 被跟踪的文件路径
+            content: 新增行（多行文本）
+        """
+        name = os.path.basename(path)
+        for line in content.splitlines():
+            self.console.print(f"[dim]{name}[/dim] ", Text(line), sep="")
+
     def print_success(self, message: str):
         """打印成功消息
 
@@ -716,10 +728,11 @@ class ClientUI:
         help_table.add_column("描述", style="white")
 
         commands = [
-            ("/upload <file>", "上传文件到服务器"),
+            ("/upload <file...>", "上传文件到服务器（支持多个路径和通配符，多个文件并发上传）"),
             ("/model <name>", "切换聊天模型 (glm-4-flash / glm-4.5-flash)"),
             ("/history", "查看对话历史"),
             ("/clear", "清空当前会话历史"),
+            ("/unfollow [file]", "停止日志跟踪（不指定文件时停止全部）"),
             ("/quit", "退出客户端"),
             ("/help", "显示此帮助信息"),
         ]
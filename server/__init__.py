@@ -7,6 +7,7 @@
 from .agent import ReActAgent
 from .nplt_server import NPLTServer, Session, SessionState
 from .rdt_server import RDTServer, RDTSession, RDTState
+from .log_follower import LogFollower
 
 __all__ = [
     'ReActAgent',
@@ -16,4 +17,5 @@ __all__ = [
     'RDTServer',
     'RDTSession',
     'RDTState',
+    'LogFollower',
 ]
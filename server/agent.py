@@ -14,7 +14,8 @@ from typing import Any, Dict, List, Optional
 
 from server.llm.base import LLMProvider, Message
 from server.storage.history import ConversationHistory, ToolCall
-from server.tools.base import Tool, ToolExecutionResult
+from server.tools.base import Tool
+from server.tools.executor import ToolExecutor
 from server.tools.command import CommandTool
 from server.tools.monitor import MonitorTool
 from server.tools.semantic_search import SemanticSearchTool
@@ -36,9 +37,14 @@ class ReActAgent:
     path_validator: Optional[Any] = None  # 路径验证器
     rdt_server: Optional[Any] = None  # RDT服务器实例
     http_base_url: Optional[str] = None  # HTTP下载基础URL
+    tool_workers: int = 8  # 工具执行线程池大小
+    tool_executor: Optional[ToolExecutor] = None  # 工具执行器
 
     def __post_init__(self):
         """初始化工具"""
+        if self.tool_executor is None:
+            self.tool_executor = ToolExecutor(max_workers=self.tool_workers)
+
         # 如果没有提供工具，使用默认工具
         if not self.tools:
             from server.storage.vector_store import VectorStore
@@ -53,7 +59,11 @@ class ReActAgent:
                 self.path_validator = get_path_validator(config.file_access)
 
             # 初始化组件
-            vector_store = VectorStore()
+            vector_store = VectorStore(
+                ann_index_type=config.file_access.vector_index_type,
+                lazy_load=config.file_access.vector_lazy_load,
+                max_resident_bytes=config.file_access.vector_max_resident_mb * 1024 * 1024
+            )
             index_manager = IndexManager(
                 vector_store=vector_store,
                 llm_provider=self.llm_provider,
@@ -66,8 +76,9 @@ class ReActAgent:
                 self.rdt_server = RDTServer(
                     host="0.0.0.0",
                     port=9998,
-                    window_size=5,
-                    timeout=0.1
+                    initial_window=config.server.rdt_initial_window,
+                    max_window=config.server.rdt_max_window,
+                    initial_rto=config.server.rdt_initial_rto
                 )
 
             # 创建工具实例（带路径验证器）
@@ -329,18 +340,9 @@ class ReActAgent:
                 # 发送状态：正在调用工具
                 await self._send_status("tool_call", f"正在调用工具: {tool_name}")
 
-                # 执行工具（带超时控制）
-                start_time = time.time()
-                result = tool.execute(**tool_args)
-                duration = time.time() - start_time
-
-                # 检查超时
-                if duration > self.tool_timeout:
-                    result = ToolExecutionResult(
-                        success=False,
-                        output="",
-                        error=f"工具执行超时（{duration:.2f}s > {self.tool_timeout}s）"
-                    )
+                # 执行工具（线程池执行，截止时间到达即返回超时结果）
+                result = await self.tool_executor.execute(tool, tool_args, timeout=self.tool_timeout)
+                duration = result.duration
 
                 # 记录工具调用
                 tool_call = ToolCall(
@@ -482,18 +484,9 @@ class ReActAgent:
                 # 发送状态：正在调用工具
                 await self._send_status("tool_call", f"正在调用工具: {tool_name}")
 
-                # 执行工具（带超时控制）
-                start_time = time.time()
-                result = tool.execute(**tool_args)
-                duration = time.time() - start_time
-
-                # 检查超时
-                if duration > self.tool_timeout:
-                    result = ToolExecutionResult(
-                        success=False,
-                        output="",
-                        error=f"工具执行超时（{duration:.2f}s > {self.tool_timeout}s）"
-                    )
+                # 执行工具（线程池执行，截止时间到达即返回超时结果）
+                result = await self.tool_executor.execute(tool, tool_args, timeout=self.tool_timeout)
+                duration = result.duration
 
                 # 记录工具调用
                 tool_call = ToolCall(
@@ -571,7 +564,7 @@ class ReActAgent:
 
 ## 核心原则
 
-1. 优先使用sys_monitor进行系统资源查询（CPU、内存、磁盘使用率）
+1. 优先使用sys_monitor进行系统资源查询（CPU、内存、磁盘、网络）
 2. 仅当用户明确使用命令名（如"ls"、"cat"、"free -h"）时才使用command_executor
 3. 抽象的系统状态查询统一使用sys_monitor，具体命令执行使用command_executor
 4. 文件操作（上传、下载、检索）使用专用文件工具
@@ -579,7 +572,7 @@ class ReActAgent:
 ## 决策流程
 
 **步骤1: 识别查询类型**
-- 系统资源查询（CPU/内存/磁盘使用率、系统状态）→ sys_monitor（优先）
+- 系统资源查询（CPU/内存/磁盘使用率、系统状态、哪个进程占用资源最多）→ sys_monitor（优先）
 - 具体命令名执行（ls/cat/grep/head/tail/ps/pwd/whoami/df/free）→ command_executor
 - 文件/文档检索（搜索、找、查找、检索、定位、XX文件在哪里、XX文件位于、查看XX文件）→ semantic_search定位 → command_executor读取完整内容
 - 文件索引管理（查看上传的文件、引用文件）→ file_upload
@@ -649,6 +642,18 @@ ARGS: {"metric": "disk"}
 TOOL: sys_monitor
 ARGS: {"metric": "all"}
 
+用户: 最近5分钟CPU使用率
+TOOL: sys_monitor
+ARGS: {"metric": "cpu", "window": 300}
+
+用户: 网络流量
+TOOL: sys_monitor
+ARGS: {"metric": "network"}
+
+用户: 哪个进程占用内存最多
+TOOL: sys_monitor
+ARGS: {"metric": "process", "sort_by": "memory", "top": 5}
+
 ### semantic_search 示例（混合检索策略）
 
 **关键：所有文件查看必须分两步执行 - semantic_search定位 → command_executor读取**
@@ -939,9 +944,10 @@ ARGS: {"file_path": "storage/uploads/da468689-4b29-434d-b618-c3f58d85f9a8/config
 
                 # 调用command_executor读取文件
                 try:
-                    cmd_result = self.tools["command_executor"].execute(
-                        "cat",
-                        [file_path]
+                    cmd_result = await self.tool_executor.execute(
+                        self.tools["command_executor"],
+                        {"command": "cat", "args": [file_path]},
+                        timeout=self.tool_timeout
                     )
 
                     if cmd_result.success:
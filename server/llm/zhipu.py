@@ -1,21 +1,30 @@
 """
 智谱 AI Provider 实现
 
-使用 zai-sdk 集成智谱 AI API。
+基于 aiohttp 直接调用智谱 AI HTTP API（与 zai-sdk 使用相同的接口和鉴权方式），
+请求全程非阻塞，多个会话可以同时流式输出。所有请求共享一个有上限的
+keep-alive 连接池，TLS 握手只在新建连接时发生；聊天和嵌入分别使用
+MODEL_CONFIGS / EMBED_CONFIG 中的超时。
 遵循章程：真实集成
 """
 
+import asyncio
+import json
 import os
 import logging
+import threading
 import time
 from typing import List, AsyncIterator
-from zai import ZaiClient
+
+import aiohttp
+
 from .base import LLMProvider, Message
 from .models import (
     DEFAULT_CHAT_MODEL,
     AVAILABLE_MODELS,
     EMBED_MODEL,
-    MODEL_CONFIGS
+    MODEL_CONFIGS,
+    EMBED_CONFIG
 )
 from shared.utils.logger import (
     get_llm_logger,
@@ -32,6 +41,9 @@ from shared.utils.logger import (
 logger = logging.getLogger(__name__)
 llm_logger = get_llm_logger()
 
+# 与 zai-sdk 的 ZaiClient 默认地址一致，可通过 ZAI_BASE_URL 覆盖
+DEFAULT_BASE_URL = "https://api.z.ai/api/paas/v4"
+
 
 class ZhipuProvider(LLMProvider):
     """
@@ -40,20 +52,52 @@ class ZhipuProvider(LLMProvider):
     提供聊天和嵌入功能，支持模型切换。
     """
 
-    def __init__(self, api_key: str = None, model: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        model: str = None,
+        base_url: str = None,
+        pool_size: int = 32,
+        keepalive_timeout: float = 60.0,
+        connect_timeout: float = 10.0
+    ):
         """
         初始化智谱 Provider
 
         Args:
             api_key: 智谱 API key（如果为 None，从环境变量读取）
             model: 默认聊天模型（如果为 None，使用 DEFAULT_CHAT_MODEL）
+            base_url: API 地址（如果为 None，从 ZAI_BASE_URL 读取，否则使用默认地址）
+            pool_size: 连接池上限，超出的请求排队等待空闲连接
+            keepalive_timeout: 空闲连接保活时间（秒）
+            connect_timeout: 建立连接（含 TLS 握手）超时（秒）
         """
         self.api_key = api_key or os.getenv('ZHIPU_API_KEY', '')
         if not self.api_key:
             raise ValueError("ZHIPU_API_KEY 未配置")
 
-        self.client = ZaiClient(api_key=self.api_key)
+        self.base_url = (base_url or os.getenv('ZAI_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
         self.current_model = model or DEFAULT_CHAT_MODEL
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+
+        # 连接统计
+        self.connection_stats = {
+            "requests": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "connect_time_ms": 0.0,
+            "queued": 0,
+            "queue_wait_ms": 0.0
+        }
+
+        # HTTP 会话在事件循环内惰性创建，每个事件循环一个（aiohttp 会话绑定到创建它的事件循环）
+        # 事件循环 -> (会话, 负责在该循环上关闭会话的任务)
+        self._sessions: dict[asyncio.AbstractEventLoop, tuple[aiohttp.ClientSession, asyncio.Task]] = {}
+        self._sessions_lock = threading.Lock()
 
         if self.current_model not in AVAILABLE_MODELS:
             raise ValueError(
@@ -61,6 +105,178 @@ class ZhipuProvider(LLMProvider):
                 f"可用模型：{AVAILABLE_MODELS}"
             )
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环上的 HTTP 会话（不存在或已关闭时创建）"""
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            entry = self._sessions.get(loop)
+            if entry is not None and not entry[0].closed:
+                return entry[0]
+            if entry is not None:
+                entry[1].cancel()
+
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[self._make_trace_config()],
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'x-source-channel': 'python-sdk',
+                    'Accept-Language': 'en-US,en'
+                }
+            )
+            closer = loop.create_task(self._hold_session(loop, session))
+            self._sessions[loop] = (session, closer)
+            return session
+
+    async def _hold_session(self, loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession) -> None:
+        """持有会话直到被取消，然后在会话所属的事件循环上关闭它
+
+        close() 会取消该任务；临时事件循环（如工具线程中的 asyncio.run）结束时，
+        asyncio.run 取消剩余任务，会话也随之关闭，不会遗留连接池。
+        """
+        try:
+            await loop.create_future()
+        finally:
+            await self._close_session(loop, session)
+
+    async def _close_session(self, loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession) -> None:
+        """注销并关闭会话（在会话所属的事件循环上调用）"""
+        with self._sessions_lock:
+            entry = self._sessions.get(loop)
+            if entry is not None and entry[0] is session:
+                del self._sessions[loop]
+                if entry[1] is not asyncio.current_task():
+                    entry[1].cancel()
+        await session.close()
+
+    def _make_trace_config(self) -> aiohttp.TraceConfig:
+        """创建连接级统计的 TraceConfig"""
+        stats = self.connection_stats
+
+        async def on_request_start(session, ctx, params):
+            ctx.start = time.monotonic()
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+
+        async def on_request_end(session, ctx, params):
+            stats["in_flight"] -= 1
+
+        async def on_request_exception(session, ctx, params):
+            stats["in_flight"] -= 1
+            stats["failures"] += 1
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued_at = time.monotonic()
+            stats["queued"] += 1
+
+        async def on_queued_end(session, ctx, params):
+            stats["queue_wait_ms"] += (time.monotonic() - ctx.queued_at) * 1000
+
+        async def on_create_start(session, ctx, params):
+            ctx.connect_at = time.monotonic()
+
+        async def on_create_end(session, ctx, params):
+            stats["connections_created"] += 1
+            stats["connect_time_ms"] += (time.monotonic() - ctx.connect_at) * 1000
+
+        async def on_reuse(session, ctx, params):
+            stats["connections_reused"] += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_queued_start.append(on_queued_start)
+        trace_config.on_connection_queued_end.append(on_queued_end)
+        trace_config.on_connection_create_start.append(on_create_start)
+        trace_config.on_connection_create_end.append(on_create_end)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    def _chat_timeout(self, model: str, stream: bool = False) -> aiohttp.ClientTimeout:
+        """聊天请求超时
+
+        非流式请求的总时长和两次读取间隔都不超过模型配置的 timeout；
+        流式请求只限制两次读取间隔，长回复可以持续输出。
+        """
+        timeout = MODEL_CONFIGS.get(model, {}).get('timeout', 300)
+        if stream:
+            return aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=timeout)
+        return aiohttp.ClientTimeout(total=timeout, connect=self.connect_timeout, sock_read=timeout)
+
+    def _embed_timeout(self, model: str) -> aiohttp.ClientTimeout:
+        """嵌入请求超时"""
+        timeout = EMBED_CONFIG.get(model, {}).get('timeout', 30)
+        return aiohttp.ClientTimeout(total=timeout, connect=self.connect_timeout)
+
+    def get_connection_stats(self) -> dict:
+        """连接池统计
+
+        Returns:
+            dict: 请求数、失败数、新建/复用连接数、平均建连耗时、排队等待等
+        """
+        stats = dict(self.connection_stats)
+        created = stats["connections_created"]
+        reused = stats["connections_reused"]
+        stats["pool_size"] = self.pool_size
+        stats["reuse_rate"] = reused / (created + reused) if created + reused else 0.0
+        stats["avg_connect_ms"] = stats["connect_time_ms"] / created if created else 0.0
+        return stats
+
+    async def close(self) -> None:
+        """关闭所有事件循环上的 HTTP 会话（各自在所属的事件循环上关闭）"""
+        with self._sessions_lock:
+            entries = list(self._sessions.items())
+        if not entries:
+            return
+
+        stats = self.get_connection_stats()
+        logger.info(
+            f"LLM 连接池关闭：请求 {stats['requests']} 次，"
+            f"新建连接 {stats['connections_created']} 个，"
+            f"复用率 {stats['reuse_rate']:.1%}，"
+            f"平均建连 {stats['avg_connect_ms']:.1f}ms"
+        )
+
+        current = asyncio.get_running_loop()
+        for loop, (session, _closer) in entries:
+            if loop is current:
+                await self._close_session(loop, session)
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(self._close_session(loop, session), loop)
+                try:
+                    await asyncio.wait_for(asyncio.wrap_future(future), timeout=5)
+                except Exception as e:
+                    logger.warning(f"关闭其他事件循环上的 HTTP 会话失败：{self._describe_error(e)}")
+
+    @staticmethod
+    async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+        """非 2xx 响应时抛出包含 API 错误信息的异常"""
+        if response.status < 400:
+            return
+
+        body = await response.text()
+        try:
+            error = json.loads(body).get('error', {})
+            message = f"{error.get('code', response.status)} {error.get('message', body)}"
+        except (ValueError, AttributeError):
+            message = body
+        raise Exception(f"HTTP {response.status}：{message}")
+
+    @staticmethod
+    def _describe_error(error: Exception) -> str:
+        """生成错误描述（超时异常没有消息文本）"""
+        if isinstance(error, asyncio.TimeoutError):
+            return "请求超时"
+        return str(error) or type(error).__name__
+
     async def chat(
         self,
         messages: List[Message],
@@ -98,15 +314,20 @@ class ZhipuProvider(LLMProvider):
 
         try:
             # 使用非流式输出（简化调用）
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=api_messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=False
-            )
-
-            content = response.choices[0].message.content
+            payload = {
+                'model': model,
+                'messages': api_messages,
+                'temperature': temperature,
+                'max_tokens': max_tokens,
+                'stream': False
+            }
+            async with self._get_session().post(
+                f"{self.base_url}/chat/completions", json=payload, timeout=self._chat_timeout(model)
+            ) as response:
+                await self._raise_for_status(response)
+                data = await response.json()
+
+            content = data['choices'][0]['message']['content']
 
             # 计算耗时
             duration_ms = (time.time() - start_time) * 1000
@@ -128,7 +349,7 @@ class ZhipuProvider(LLMProvider):
                     'message_count': len(messages)
                 }
             )
-            raise Exception(f"智谱 API 调用失败：{str(e)}")
+            raise Exception(f"智谱 API 调用失败：{self._describe_error(e)}")
 
     async def chat_stream(
         self,
@@ -166,35 +387,48 @@ class ZhipuProvider(LLMProvider):
 
         try:
             # 流式输出
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=api_messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=True
-            )
-
-            # 记录流式开始
-            log_llm_stream_start(llm_logger, model)
-
-            # 流式响应是同步迭代器
-            finish_reason = None
-            for chunk in response:
-                if chunk.choices:
-                    choice = chunk.choices[0]
-                    # 检查finish_reason
-                    if choice.finish_reason:
-                        finish_reason = choice.finish_reason
-
-                    if choice.delta.content:
-                        content = choice.delta.content
-                        total_chars += len(content)
-
-                        # 记录数据块（DEBUG级别，可能导致日志过多）
-                        log_llm_stream_chunk(llm_logger, len(content), total_chars)
-
-                        # 在异步生成器中 yield
-                        yield content
+            payload = {
+                'model': model,
+                'messages': api_messages,
+                'temperature': temperature,
+                'max_tokens': max_tokens,
+                'stream': True
+            }
+            async with self._get_session().post(
+                f"{self.base_url}/chat/completions", json=payload, timeout=self._chat_timeout(model, stream=True)
+            ) as response:
+                await self._raise_for_status(response)
+
+                # 记录流式开始
+                log_llm_stream_start(llm_logger, model)
+
+                # 逐行读取 SSE 事件（data: {...}，以 data: [DONE] 结束）
+                finish_reason = None
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        break
+
+                    chunk = json.loads(data)
+                    if chunk.get('choices'):
+                        choice = chunk['choices'][0]
+                        # 检查finish_reason
+                        if choice.get('finish_reason'):
+                            finish_reason = choice['finish_reason']
+
+                        content = (choice.get('delta') or {}).get('content')
+                        if content:
+                            total_chars += len(content)
+
+                            # 记录数据块（DEBUG级别，可能导致日志过多）
+                            log_llm_stream_chunk(llm_logger, len(content), total_chars)
+
+                            # 在异步生成器中 yield
+                            yield content
 
             # 计算总耗时
             duration_ms = (time.time() - start_time) * 1000
@@ -214,7 +448,7 @@ class ZhipuProvider(LLMProvider):
                     'message_count': len(messages)
                 }
             )
-            raise Exception(f"智谱 API 调用失败：{str(e)}")
+            raise Exception(f"智谱 API 调用失败：{self._describe_error(e)}")
 
     async def embed(self, texts: List[str], model: str = None) -> List[List[float]]:
         """
@@ -238,14 +472,17 @@ class ZhipuProvider(LLMProvider):
         start_time = time.time()
 
         try:
-            # embeddings.create 不需要 await（同步调用）
-            response = self.client.embeddings.create(
-                model=model,
-                input=texts
-            )
-
-            # 提取向量
-            embeddings = [item.embedding for item in response.data]
+            async with self._get_session().post(
+                f"{self.base_url}/embeddings",
+                json={'model': model, 'input': texts},
+                timeout=self._embed_timeout(model)
+            ) as response:
+                await self._raise_for_status(response)
+                data = await response.json()
+
+            # 提取向量（按 index 排序，保证与输入顺序一致）
+            items = sorted(data['data'], key=lambda item: item.get('index', 0))
+            embeddings = [item['embedding'] for item in items]
 
             # 计算耗时和维度
             duration_ms = (time.time() - start_time) * 1000
@@ -266,7 +503,7 @@ class ZhipuProvider(LLMProvider):
                     'text_count': len(texts)
                 }
             )
-            raise Exception(f"智谱 Embedding API 调用失败：{str(e)}")
+            raise Exception(f"智谱 Embedding API 调用失败：{self._describe_error(e)}")
 
     def validate_api_key(self) -> bool:
         """
@@ -277,10 +514,13 @@ class ZhipuProvider(LLMProvider):
         Returns:
             bool: API key 是否有效
         """
+        async def _probe():
+            # 临时事件循环结束时 asyncio.run 会取消 _hold_session，关闭本循环的会话
+            await self.embed(["测试"], EMBED_MODEL)
+
         try:
             # 尝试调用嵌入 API（轻量级验证）
-            import asyncio
-            asyncio.run(self.embed(["测试"], EMBED_MODEL))
+            asyncio.run(_probe())
             return True
         except Exception:
             return False
@@ -0,0 +1,241 @@
+"""
+日志跟踪模块
+
+实现类似 tail -f 的文件跟踪：Linux 下用 inotify 唤醒，其他情况按间隔轮询（seek 到上次偏移读取新增内容），
+新增行经限速合并后推送给会话。支持日志轮转（inode 变化）和截断。
+遵循章程：真实实现，不允许虚假实现或占位符
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import sys
+import time
+from typing import Awaitable, Callable, Optional
+
+from server.storage.file_watcher import IN_CLOEXEC, IN_DELETE_SELF, IN_MODIFY, IN_NONBLOCK
+
+logger = logging.getLogger(__name__)
+
+# 跟踪单个文件所需的额外 inotify 事件
+IN_ATTRIB = 0x00000004
+IN_MOVE_SELF = 0x00000800
+
+FOLLOW_MASK = IN_MODIFY | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF
+
+
+class LogFollower:
+    """单个文件的跟踪器
+
+    每个 flush_interval 最多推送一帧；一帧最多 max_lines_per_second * flush_interval 行，
+    超出部分丢弃最旧的行并在帧首注明省略数量，保证推送速度跟得上文件增长。
+    """
+
+    MAX_READ_BYTES = 1024 * 1024   # 单次最多读取的新增字节数（超出部分跳过）
+    MAX_FRAME_BYTES = 32 * 1024    # 单帧最大字节数（NPLT 单条消息上限 64KB）
+    MAX_LINE_LENGTH = 2000         # 单行最大字符数
+
+    def __init__(
+        self,
+        path: str,
+        send: Callable[[str, str], Awaitable[None]],
+        flush_interval: float = 0.5,
+        max_lines_per_second: int = 50,
+        poll_interval: float = 1.0,
+        use_inotify: bool = True
+    ):
+        """初始化跟踪器
+
+        Args:
+            path: 文件路径
+            send: 推送回调 send(path, text)
+            flush_interval: 两次推送的最小间隔（秒）
+            max_lines_per_second: 每秒最多推送的行数
+            poll_interval: 轮询间隔（秒；使用 inotify 时作为兜底检查间隔）
+            use_inotify: 是否尝试使用 inotify
+        """
+        self.path = path
+        self.send = send
+        self.flush_interval = flush_interval
+        self.max_lines_per_frame = max(1, int(max_lines_per_second * flush_interval))
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        # 统计
+        self.lines_sent = 0
+        self.lines_dropped = 0
+        self.frames_sent = 0
+
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._partial = b""
+        self._wake: Optional[asyncio.Event] = None
+        self._libc = None
+        self._inotify_fd: Optional[int] = None
+
+    @property
+    def mode(self) -> str:
+        """当前唤醒方式"""
+        return "inotify" if self._inotify_fd is not None else "polling"
+
+    async def run(self):
+        """跟踪文件直到任务被取消或推送失败"""
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+
+        stat = os.stat(self.path)
+        self._offset = stat.st_size
+        self._inode = stat.st_ino
+
+        if self.use_inotify and self._init_inotify():
+            loop.add_reader(self._inotify_fd, self._drain_inotify)
+
+        logger.info(f"[FOLLOW] 开始跟踪 {self.path} ({self.mode})")
+
+        try:
+            last_flush = 0.0
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+                # 限速：距离上次推送不足 flush_interval 时先等待，期间的新增内容合并到同一帧
+                delay = last_flush + self.flush_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                lines, skipped = self._read_new_lines()
+                if not lines and not skipped:
+                    continue
+
+                await self._send_lines(lines, skipped)
+                last_flush = time.monotonic()
+        finally:
+            self._close_inotify(loop)
+            logger.info(
+                f"[FOLLOW] 停止跟踪 {self.path}: 推送 {self.lines_sent} 行 / {self.frames_sent} 帧，"
+                f"省略 {self.lines_dropped} 行"
+            )
+
+    def _read_new_lines(self) -> tuple[list[str], int]:
+        """读取上次偏移之后的完整行
+
+        Returns:
+            (新增行, 因超出单次读取上限而跳过的字节数)
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # 轮转过程中文件暂时不存在，等待重新创建
+            return [], 0
+
+        if stat.st_ino != self._inode:
+            # 日志轮转：从新文件开头读取
+            logger.info(f"[FOLLOW] 文件已轮转: {self.path}")
+            self._inode = stat.st_ino
+            self._offset = 0
+            self._partial = b""
+            self._rewatch()
+        elif stat.st_size < self._offset:
+            # 文件被截断
+            self._offset = 0
+            self._partial = b""
+
+        available = stat.st_size - self._offset
+        if available <= 0:
+            return [], 0
+
+        skipped = 0
+        if available > self.MAX_READ_BYTES:
+            skipped = available - self.MAX_READ_BYTES
+            self._offset += skipped
+            self._partial = b""
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(stat.st_size - self._offset)
+        self._offset += len(data)
+
+        data = self._partial + data
+        *complete, self._partial = data.split(b"\n")
+        lines = [line.decode('utf-8', errors='replace')[:self.MAX_LINE_LENGTH] for line in complete]
+        return lines, skipped
+
+    async def _send_lines(self, lines: list[str], skipped: int):
+        """限速后推送一帧"""
+        dropped = max(0, len(lines) - self.max_lines_per_frame)
+        if dropped:
+            lines = lines[dropped:]
+
+        text = "\n".join(lines)
+        while len(text.encode('utf-8')) > self.MAX_FRAME_BYTES and len(lines) > 1:
+            cut = max(1, len(lines) // 4)
+            dropped += cut
+            lines = lines[cut:]
+            text = "\n".join(lines)
+
+        notes = []
+        if skipped:
+            notes.append(f"... (跳过 {skipped} 字节)")
+        if dropped:
+            notes.append(f"... (输出过快，省略 {dropped} 行)")
+        if notes:
+            text = "\n".join(notes + ([text] if lines else []))
+
+        await self.send(self.path, text)
+
+        self.lines_sent += len(lines)
+        self.lines_dropped += dropped
+        self.frames_sent += 1
+
+    # ===== inotify =====
+
+    def _init_inotify(self) -> bool:
+        """初始化 inotify（不可用时返回 False，退化为轮询）"""
+        if not sys.platform.startswith("linux"):
+            return False
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+
+        if fd < 0:
+            return False
+
+        self._libc = libc
+        self._inotify_fd = fd
+        self._rewatch()
+        return True
+
+    def _rewatch(self):
+        """为当前路径（可能已轮转为新文件）添加监视"""
+        if self._inotify_fd is None:
+            return
+        wd = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(self.path), FOLLOW_MASK)
+        if wd < 0:
+            logger.warning(f"[FOLLOW] 无法监视 {self.path}: errno={ctypes.get_errno()}")
+
+    def _drain_inotify(self):
+        """读取 inotify 事件并唤醒跟踪循环（事件内容无需解析）"""
+        try:
+            while os.read(self._inotify_fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            logger.warning(f"[FOLLOW] 读取 inotify 事件失败: {e}")
+        self._wake.set()
+
+    def _close_inotify(self, loop: asyncio.AbstractEventLoop):
+        """关闭 inotify"""
+        if self._inotify_fd is None:
+            return
+        loop.remove_reader(self._inotify_fd)
+        os.close(self._inotify_fd)
+        self._inotify_fd = None
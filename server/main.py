@@ -6,22 +6,28 @@
 """
 
 import asyncio
+import os
 import signal
 import sys
 from pathlib import Path
+from typing import Optional
 
 from server.llm.zhipu import ZhipuProvider
 from server.storage.vector_store import VectorStore
+from server.storage.index_manager import IndexManager
+from server.storage.file_watcher import FileWatcher
 from server.storage.history import SessionManager
 from server.tools.command import CommandTool
 from server.tools.monitor import MonitorTool
+from server.tools.system_sampler import SystemSampler
 from server.tools.semantic_search import SemanticSearchTool
 from shared.utils.config import AppConfig
 from shared.utils.logger import get_server_logger
 from shared.protocols.nplt import MessageType
+from shared.protocols.rdt import FEATURE_SACK, RDT_VERSION_1, SUPPORTED_VERSIONS
 from .agent import ReActAgent
 from .nplt_server import NPLTServer, Session
-from .rdt_server import RDTServer
+from .rdt_server import RDTServer, file_checksum
 
 
 class Server:
@@ -45,6 +51,9 @@ class Server:
         # 向量存储
         self.vector_store: VectorStore = None
 
+        # 索引管理器
+        self.index_manager: IndexManager = None
+
         # NPLT 服务器
         self.nplt_server: NPLTServer = None
 
@@ -54,6 +63,12 @@ class Server:
         # 会话管理器（多会话管理）
         self.session_manager: SessionManager = None
 
+        # 白名单文件监视器（auto_index 时启动）
+        self.file_watcher: FileWatcher = None
+
+        # 系统指标采样器（sys_monitor 的数据来源）
+        self.system_sampler: SystemSampler = None
+
         # 运行状态
         self.running = False
 
@@ -71,7 +86,10 @@ class Server:
             self.logger.info("初始化 LLM Provider...")
             self.llm_provider = ZhipuProvider(
                 api_key=self.config.llm.api_key,
-                model=self.config.llm.chat_model
+                model=self.config.llm.chat_model,
+                pool_size=self.config.llm.pool_size,
+                keepalive_timeout=self.config.llm.keepalive_timeout,
+                connect_timeout=self.config.llm.connect_timeout
             )
             self.logger.info("LLM Provider 初始化成功")
 
@@ -81,7 +99,13 @@ class Server:
             storage_path.mkdir(parents=True, exist_ok=True)
             vectors_dir = storage_path / "vectors"
             vectors_dir.mkdir(parents=True, exist_ok=True)
-            self.vector_store = VectorStore(storage_dir=str(vectors_dir))
+            file_access = self.config.file_access
+            self.vector_store = VectorStore(
+                storage_dir=str(vectors_dir),
+                ann_index_type=file_access.vector_index_type,
+                lazy_load=file_access.vector_lazy_load,
+                max_resident_bytes=file_access.vector_max_resident_mb * 1024 * 1024
+            )
             self.logger.info("向量存储初始化成功")
 
             # 初始化 ReAct Agent
@@ -93,13 +117,23 @@ class Server:
             from server.tools.semantic_search import SemanticSearchTool
             from server.tools.file_upload import FileUploadTool
             from server.tools.file_download import FileDownloadTool
-            from server.storage.index_manager import IndexManager
             from shared.utils.path_validator import get_path_validator
 
             path_validator = get_path_validator(self.config.file_access)
 
+            # 启动系统指标采样（sys_monitor 从环形缓冲区读取，不再现场执行命令）
+            try:
+                self.system_sampler = SystemSampler(
+                    interval=self.config.server.monitor_interval,
+                    capacity=self.config.server.monitor_history
+                )
+                self.system_sampler.start()
+            except OSError as e:
+                self.system_sampler = None
+                self.logger.warning(f"系统采样不可用，sys_monitor 将使用即时读取: {e}")
+
             # 初始化索引管理器
-            index_manager = IndexManager(
+            self.index_manager = index_manager = IndexManager(
                 vector_store=self.vector_store,
                 llm_provider=self.llm_provider,
                 path_validator=path_validator,
@@ -113,8 +147,9 @@ class Server:
             self.rdt_server = RDTServer(
                 host="0.0.0.0",
                 port=9998,
-                window_size=5,
-                timeout=0.1
+                initial_window=self.config.server.rdt_initial_window,
+                max_window=self.config.server.rdt_max_window,
+                initial_rto=self.config.server.rdt_initial_rto
             )
 
             # 创建 NPLT 服务器
@@ -138,7 +173,7 @@ class Server:
                         path_validator=path_validator,
                         max_output_size=self.config.file_access.max_output_size
                     ),
-                    "sys_monitor": MonitorTool(),
+                    "sys_monitor": MonitorTool(sampler=self.system_sampler),
                     "semantic_search": SemanticSearchTool(
                         llm_provider=self.llm_provider,
                         vector_store=self.vector_store,
@@ -156,7 +191,8 @@ class Server:
                     )
                 },
                 max_tool_rounds=5,
-                tool_timeout=5
+                tool_timeout=5,
+                tool_workers=8
             )
             self.logger.info("ReAct Agent 初始化成功")
 
@@ -190,6 +226,21 @@ class Server:
             # 启动 RDT 服务器
             await self.rdt_server.start()
 
+            # 启动白名单文件监视（后台索引新增/修改的文件）
+            if self.config.file_access.auto_index:
+                file_access = self.config.file_access
+                self.file_watcher = FileWatcher(
+                    index_manager=index_manager,
+                    allowed_paths=file_access.allowed_paths,
+                    debounce=file_access.watch_debounce,
+                    max_wait=file_access.watch_max_wait,
+                    poll_interval=file_access.watch_poll_interval,
+                    queue_size=file_access.watch_queue_size,
+                    workers=file_access.watch_workers
+                )
+                await self.file_watcher.start()
+                self.logger.info(f"文件监视已启动（{self.file_watcher.mode}）")
+
             self.running = True
             self.logger.info("服务器启动成功")
             self.logger.info(f"监听地址: {self.config.server.host}:{self.config.server.port}")
@@ -314,8 +365,9 @@ class Server:
         self,
         session: Session,
         filename: str,
-        file_data: bytes
-    ) -> bool:
+        file_data: Optional[bytes] = None,
+        file_path: Optional[str] = None
+    ) -> Optional[str]:
         """向客户端提议下载文件
 
         端到端流程中的关键集成点：
@@ -330,15 +382,17 @@ class Server:
         Args:
             session: 客户端会话（包含 client_addr）
             filename: 文件名
-            file_data: 文件数据（完整内容）
+            file_data: 文件数据（完整内容，与 file_path 二选一）
+            file_path: 文件路径（RDT 发送时按需分块读取）
 
         Returns:
-            是否成功发送 DOWNLOAD_OFFER 消息
+            下载令牌，发送 DOWNLOAD_OFFER 失败时返回 None
         """
         try:
             import json
 
-            self.logger.info(f"[{session.session_id[:8]}] 准备发送文件: {filename} ({len(file_data)} 字节)")
+            size = len(file_data) if file_data is not None else os.path.getsize(file_path)
+            self.logger.info(f"[{session.session_id[:8]}] 准备发送文件: {filename} ({size} 字节)")
 
             # 构造客户端 UDP 地址（用于 RDT 传输）
             if session.client_udp_port:
@@ -350,18 +404,27 @@ class Server:
                 client_addr = session.client_addr
                 self.logger.warning(f"[{session.session_id[:8]}] 客户端未注册 UDP 端口，使用 TCP 地址: {client_addr}")
 
-            # 创建 RDT 会话
+            # 协商协议版本：双方都支持的最高版本（旧客户端只支持 v1）
+            version = max(set(SUPPORTED_VERSIONS) & set(session.client_rdt_versions), default=RDT_VERSION_1)
+
+            # 创建 RDT 会话（大文件的校验和在线程中计算，不阻塞事件循环）
+            checksum = None
+            if file_data is None:
+                checksum = await asyncio.to_thread(file_checksum, file_path)
             download_token = self.rdt_server.create_session(
                 filename=filename,
                 file_data=file_data,
-                client_addr=client_addr
+                client_addr=client_addr,
+                file_path=file_path,
+                version=version,
+                checksum=checksum
             )
 
             # 获取 RDT 会话信息
             rdt_session = self.rdt_server.sessions.get(download_token)
             if not rdt_session:
                 self.logger.error(f"创建 RDT 会话失败")
-                return False
+                return None
 
             # 构造下载提议消息
             offer_data = {
@@ -370,7 +433,11 @@ class Server:
                 "checksum": rdt_session.checksum,
                 "download_token": download_token,
                 "server_host": "0.0.0.0",  # RDT 服务器地址
-                "server_port": 9998
+                "server_port": 9998,
+                "features": [FEATURE_SACK],  # 客户端可据此改用 SACK 确认
+                "rdt_version": rdt_session.version,
+                "transfer_id": rdt_session.transfer_id,
+                "chunk_size": rdt_session.chunk_size
             }
 
             offer_json = json.dumps(offer_data, ensure_ascii=False)
@@ -381,12 +448,12 @@ class Server:
                 offer_json.encode('utf-8')
             )
 
-            self.logger.info(f"[{session.session_id[:8]}] 已发送下载提议: {filename}")
-            return True
+            self.logger.info(f"[{session.session_id[:8]}] 已发送下载提议: {filename} (RDT v{version})")
+            return download_token
 
         except Exception as e:
             self.logger.error(f"[{session.session_id[:8]}] 发送下载提议失败: {e}")
-            return False
+            return None
 
     async def _run_forever(self):
         """保持服务器运行"""
@@ -404,6 +471,14 @@ class Server:
         self.logger.info("正在停止服务器...")
         self.running = False
 
+        # 停止文件监视
+        if self.file_watcher:
+            await self.file_watcher.stop()
+
+        # 停止系统采样
+        if self.system_sampler:
+            self.system_sampler.stop()
+
         # 停止 NPLT 服务器
         if self.nplt_server:
             await self.nplt_server.stop()
@@ -412,6 +487,34 @@ class Server:
         if self.rdt_server:
             await self.rdt_server.stop()
 
+        # 关闭工具线程池
+        if self.agent:
+            for tool_name, stats in self.agent.tool_executor.stats().items():
+                self.logger.info(
+                    f"工具 {tool_name}: 调用 {stats['calls']} 次，超时 {stats['timeouts']} 次，"
+                    f"平均耗时 {stats['avg_duration']:.2f}s，最长 {stats['max_duration']:.2f}s"
+                )
+            self.agent.tool_executor.shutdown()
+
+        # 保存尚未写盘的全局向量索引
+        if self.vector_store:
+            await asyncio.to_thread(self.vector_store.flush)
+
+        # 关闭嵌入缓存（写入尚未保存的 LRU 使用时间）
+        embed_cache = self.index_manager.embed_cache if self.index_manager else None
+        if embed_cache:
+            cache_stats = await asyncio.to_thread(embed_cache.stats)
+            self.logger.info(
+                f"嵌入缓存: {cache_stats['entries']}/{cache_stats['max_entries']} 条，"
+                f"命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次，"
+                f"命中率 {cache_stats['hit_rate']:.1%}，淘汰 {cache_stats['evictions']} 条"
+            )
+            await asyncio.to_thread(embed_cache.close)
+
+        # 关闭 LLM HTTP 会话
+        if self.llm_provider:
+            await self.llm_provider.close()
+
         self.logger.info("服务器已停止")
 
     def _show_config(self):
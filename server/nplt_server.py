@@ -7,13 +7,16 @@ NPLT 服务器模块
 
 import asyncio
 import json
+import os
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Callable, Dict, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
-from shared.protocols.nplt import MessageType, NPLTMessage
+from shared.protocols.nplt import MessageType, NPLTMessage, decode_stream_chunk
+from server.log_follower import LogFollower
+from server.storage.files import UploadWriter
 from server.storage.history import ConversationHistory, SessionManager
 
 
@@ -52,19 +55,27 @@ class Session:
     #     "indexed": True
     # }]
 
-    upload_state: Optional[Dict] = field(default_factory=dict)  # 当前上传状态
+    uploads: Dict[int, Dict] = field(default_factory=dict)  # 进行中的上传（stream_id -> 上传状态）
     # {
-    #     "file_id": "abc123",
-    #     "filename": "config.yaml",
-    #     "file_size": 1024,
-    #     "received_data": [],
-    #     "received_size": 0
+    #     1: {
+    #         "filename": "config.yaml",
+    #         "filesize": 1024,
+    #         "writer": UploadWriter,  # 流式写入临时文件
+    #         "chunks_received": 0
+    #     }
     # }
+    # 不带 stream_id 的旧版上传（FILE_DATA）使用 stream_id 0，多路上传的数据为 STREAM_DATA
+    upload_tasks: set = field(default_factory=set)  # 上传完成后的保存/索引任务
 
     client_type: str = "cli"                     # 客户端类型：cli | web | desktop
     client_udp_port: Optional[int] = None        # 客户端 RDT UDP 端口（用于文件下载）
+    client_rdt_versions: List[int] = field(default_factory=lambda: [1])  # 客户端支持的 RDT 协议版本
+
+    follow_tasks: Dict[str, asyncio.Task] = field(default_factory=dict)  # 日志跟踪任务（路径 -> 任务）
 
     HEARTBEAT_TIMEOUT = 180  # 心跳超时时间（秒）- 修复：2倍心跳间隔，避免误杀
+    MAX_FOLLOWS = 4  # 每个会话最多同时跟踪的文件数
+    MAX_UPLOADS = 8  # 每个会话最多同时进行的上传数
 
     def is_timeout(self) -> bool:
         """检查是否超时"""
@@ -149,8 +160,78 @@ class Session:
         """
         await self.send_message(MessageType.AGENT_THOUGHT, status_json.encode('utf-8'))
 
+    async def start_follow(self, path: str) -> tuple[bool, str]:
+        """开始跟踪文件（类似 tail -f），新增行以 AGENT_THOUGHT 推送
+
+        Args:
+            path: 文件路径（调用方负责路径白名单验证）
+
+        Returns:
+            (是否成功, 说明)
+        """
+        path = os.path.abspath(path)
+        if path in self.follow_tasks:
+            return True, f"已在跟踪 {path}"
+        if len(self.follow_tasks) >= self.MAX_FOLLOWS:
+            return False, f"同时跟踪的文件数已达上限（{self.MAX_FOLLOWS}），请先使用 /unfollow 停止"
+        if not os.path.isfile(path):
+            return False, f"文件不存在: {path}"
+
+        follower = LogFollower(path, send=self._send_follow_lines)
+        task = asyncio.create_task(self._run_follow(follower))
+        self.follow_tasks[path] = task
+        return True, f"已开始跟踪 {path}，新增内容将实时推送（/unfollow 停止）"
+
+    async def _run_follow(self, follower: LogFollower):
+        """运行跟踪任务，结束（取消/推送失败）后移除登记"""
+        try:
+            await follower.run()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"[WARN] [SERVER] 日志跟踪结束 {follower.path}: {e}")
+        finally:
+            # 同一路径可能已被重新跟踪：只移除仍指向本任务的登记
+            if self.follow_tasks.get(follower.path) is asyncio.current_task():
+                del self.follow_tasks[follower.path]
+
+    async def _send_follow_lines(self, path: str, text: str):
+        """推送跟踪到的新增行"""
+        status_msg = json.dumps({
+            "type": "log_lines",
+            "path": path,
+            "content": text
+        }, ensure_ascii=False)
+        await self.send_message(MessageType.AGENT_THOUGHT, status_msg.encode('utf-8'))
+
+    async def stop_follow(self, path: Optional[str] = None) -> list:
+        """停止跟踪
+
+        Args:
+            path: 文件路径（None 表示停止全部）
+
+        Returns:
+            已停止跟踪的路径列表
+        """
+        if path:
+            paths = [os.path.abspath(path)]
+        else:
+            paths = list(self.follow_tasks)
+
+        stopped = []
+        for item in paths:
+            task = self.follow_tasks.pop(item, None)
+            if task:
+                task.cancel()
+                stopped.append(item)
+        return stopped
+
     async def close(self):
         """关闭会话"""
+        # 断开时停止全部日志跟踪；未完成的上传可续传时保留，否则清理
+        await self.stop_follow()
+        for stream_id in list(self.uploads):
+            self.release_upload(stream_id)
         try:
             self.writer.close()
             await self.writer.wait_closed()
@@ -158,6 +239,30 @@ class Session:
             pass
         self.state = SessionState.DISCONNECTED
 
+    def abort_upload(self, stream_id: int = 0):
+        """放弃未完成的上传（删除临时文件）"""
+        upload_state = self.uploads.pop(stream_id, None)
+        if upload_state and upload_state.get('writer'):
+            print(f"[WARN] [SERVER] 放弃未完成的上传: {upload_state['filename']}")
+            upload_state['writer'].abort()
+
+    def release_upload(self, stream_id: int = 0):
+        """结束当前会话对未完成上传的占用：可续传的保留已接收数据，否则删除"""
+        upload_state = self.uploads.pop(stream_id, None)
+        if not upload_state or not upload_state.get('writer'):
+            return
+
+        writer = upload_state['writer']
+        if writer.resumable:
+            print(f"[INFO] [SERVER] 上传中断，已保留 {writer.received_size}/{writer.expected_size} 字节: "
+                  f"{upload_state['filename']} (上传ID: {writer.upload_id})")
+        else:
+            print(f"[WARN] [SERVER] 放弃未完成的上传: {upload_state['filename']}")
+        try:
+            writer.suspend()
+        except OSError as e:
+            print(f"[ERROR] [SERVER] 保存上传进度失败: {e}")
+
     # ===== 文件索引管理方法（Constitution v1.5.1） =====
 
     def get_last_uploaded_file(self) -> Optional[dict]:
@@ -242,6 +347,11 @@ class NPLTServer:
         addr = self.server.sockets[0].getsockname()
         print(f"[INFO] [SERVER] NPLT 服务器启动在 {addr[0]}:{addr[1]}")
 
+        # 清理超过保留时间仍未完成的上传
+        removed = UploadWriter.cleanup_stale("storage/uploads")
+        if removed:
+            print(f"[INFO] [SERVER] 已清理 {removed} 个过期的未完成上传")
+
         # 启动心跳检查任务
         asyncio.create_task(self._heartbeat_checker())
 
@@ -433,7 +543,7 @@ class NPLTServer:
                 # 文件元数据
                 await self._handle_file_metadata(session, message)
 
-            elif message.type == MessageType.FILE_DATA:
+            elif message.type in (MessageType.FILE_DATA, MessageType.STREAM_DATA):
                 # 文件数据
                 await self._handle_file_data(session, message)
 
@@ -469,6 +579,10 @@ class NPLTServer:
                 # 客户端 UDP 端口注册
                 await self._handle_client_udp_port(session, message)
 
+            elif message.type == MessageType.FOLLOW_STOP:
+                # 停止日志跟踪
+                await self._handle_follow_stop(session, message)
+
             else:
                 print(f"[WARN] [SERVER] 未知消息类型: {message.type}")
 
@@ -520,116 +634,204 @@ class NPLTServer:
                 print(f"[ERROR] [SERVER] 超时检查失败: {e}")
 
     async def _handle_file_metadata(self, session: Session, message: NPLTMessage):
-        """处理文件元数据"""
+        """处理文件元数据（创建或恢复上传临时文件）
+
+        元数据携带 upload_id 时为可续传上传：服务器以 FILE_OFFSET 回复已接收的字节数，
+        客户端从该偏移继续发送 FILE_DATA。
+        元数据携带 stream_id 时为多路上传：同一会话可同时进行多个上传，
+        数据以 STREAM_DATA 发送，载荷的 stream_id 前缀区分所属上传。
+        """
         try:
             metadata = json.loads(message.data.decode('utf-8'))
             filename = metadata['filename']
             filesize = metadata['size']
-            
-            print(f"[INFO] [SERVER] 开始接收文件: {filename} ({filesize} 字节)")
-            
-            # 初始化上传状态
-            session.upload_state = {
-                'filename': filename,
-                'filesize': filesize,
-                'received_data': b'',
-                'chunks_received': 0
-            }
-            
+            upload_id = metadata.get('upload_id')
+            sha256 = metadata.get('sha256')
+            stream_id = int(metadata.get('stream_id', 0))
+            if not 0 <= stream_id <= 0xFFFF:
+                raise ValueError(f"stream_id 超出范围: {stream_id}")
         except Exception as e:
             print(f"[ERROR] [SERVER] 解析文件元数据失败: {e}")
-    
+            return
+
+        # 同一流上的上一个上传尚未完成即开始新上传：释放未完成的部分
+        session.release_upload(stream_id)
+
+        error = None
+        if len(session.uploads) >= session.MAX_UPLOADS:
+            error = f"同时进行的上传过多（最多 {session.MAX_UPLOADS} 个）"
+        elif upload_id and any(
+            state['writer'].upload_id == upload_id for state in session.uploads.values()
+        ):
+            error = "同一文件正在上传中"
+
+        # 同一上传仍被旧连接占用（旧连接断开尚未被检测到）：先让旧连接落盘并释放
+        if upload_id and error is None:
+            for other in list(self.sessions.values()):
+                if other is session:
+                    continue
+                for other_stream_id, state in list(other.uploads.items()):
+                    if state['writer'].upload_id == upload_id:
+                        other.release_upload(other_stream_id)
+
+        print(f"[INFO] [SERVER] 开始接收文件: {filename} ({filesize} 字节)")
+
+        writer = None
+        if error is None:
+            try:
+                writer = await asyncio.to_thread(
+                    UploadWriter,
+                    filename=filename,
+                    size=filesize,
+                    storage_dir="storage/uploads",
+                    upload_id=upload_id,
+                    sha256=sha256
+                )
+            except (ValueError, OSError) as e:
+                error = str(e)
+
+        if error is not None:
+            print(f"[ERROR] [SERVER] 无法接收文件: {error}")
+            if upload_id:
+                await self._send_upload_offset(session, upload_id, -1, stream_id, error)
+            await session.send_message(
+                MessageType.CHAT_TEXT,
+                f"文件上传失败: {filename}: {error}".encode('utf-8')
+            )
+            return
+
+        # 初始化上传状态（数据直接写入临时文件，不在内存中累积）
+        session.uploads[stream_id] = {
+            'filename': filename,
+            'filesize': filesize,
+            'writer': writer,
+            'chunks_received': 0
+        }
+
+        if writer.resumable:
+            if writer.received_size:
+                print(f"[INFO] [SERVER] 续传上传: {filename} 从 {writer.received_size} 字节继续 (上传ID: {upload_id})")
+            await self._send_upload_offset(session, upload_id, writer.received_size, stream_id)
+
+        if writer.complete:
+            # 空文件或之前已全部接收：不会再收到 FILE_DATA
+            self._complete_upload(session, stream_id)
+
+    @staticmethod
+    async def _send_upload_offset(session: Session, upload_id: str, offset: int,
+                                  stream_id: int = 0, error: str = None):
+        """回复续传偏移（offset < 0 表示无法接收）"""
+        reply = {"upload_id": upload_id, "offset": offset}
+        if stream_id:
+            reply["stream_id"] = stream_id
+        if error:
+            reply["error"] = error
+        await session.send_message(
+            MessageType.FILE_OFFSET,
+            json.dumps(reply, ensure_ascii=False).encode('utf-8')
+        )
+
     async def _handle_file_data(self, session: Session, message: NPLTMessage):
-        """处理文件数据"""
-        from server.storage.files import UploadedFile
-        
+        """处理文件数据（FILE_DATA 为旧版单文件上传，STREAM_DATA 带 stream_id 前缀）"""
+        stream_id = 0
         try:
-            if not session.upload_state:
-                print("[WARN] [SERVER] 收到文件数据但没有元数据")
+            data = message.data
+            if message.type == MessageType.STREAM_DATA:
+                stream_id, data = decode_stream_chunk(data)
+
+            upload_state = session.uploads.get(stream_id)
+            if not upload_state:
+                print(f"[WARN] [SERVER] 收到文件数据但没有元数据 (stream_id={stream_id})")
                 return
-            
-            # 追加数据
-            session.upload_state['received_data'] += message.data
-            session.upload_state['chunks_received'] += 1
-            
+
+            # 追加写入临时文件
+            writer = upload_state['writer']
+            writer.write(data)
+            upload_state['chunks_received'] += 1
+
+            # 可续传上传定期落盘进度（fsync 放到工作线程，不阻塞其他会话）
+            if writer.checkpoint_due and not writer.complete:
+                await asyncio.to_thread(writer.checkpoint)
+
             # 检查是否接收完成
-            received = len(session.upload_state['received_data'])
-            expected = session.upload_state['filesize']
-            
-            if received >= expected:
-                # 接收完成，保存文件
-                filename = session.upload_state['filename']
-                file_data = session.upload_state['received_data']
-                
-                print(f"[INFO] [SERVER] 文件接收完成: {filename} ({received} 字节)")
-                
-                # 保存文件到 storage
-                try:
-                    uploaded_file = UploadedFile.create_from_content(
-                        content=file_data.decode('utf-8', errors='ignore'),
-                        filename=filename,
-                        storage_dir="storage/uploads"
-                    )
+            if writer.complete:
+                self._complete_upload(session, stream_id)
 
-                    print(f"[INFO] [SERVER] 文件已保存: {uploaded_file.file_id}")
+        except Exception as e:
+            print(f"[ERROR] [SERVER] 处理文件数据失败: {e}")
+            session.abort_upload(stream_id)
 
-                    # 将文件元数据添加到 session 和 conversation_history
-                    file_info = {
-                        "file_id": uploaded_file.file_id,
-                        "filename": uploaded_file.filename,
-                        "file_path": uploaded_file.storage_path,
-                        "uploaded_at": uploaded_file.uploaded_at,
-                        "size": uploaded_file.size,
-                        "indexed": False  # 尚未索引
-                    }
+    def _complete_upload(self, session: Session, stream_id: int):
+        """上传接收完成：在后台任务中保存和索引，不阻塞同一连接上其他上传的数据接收"""
+        upload_state = session.uploads.pop(stream_id)
+        task = asyncio.create_task(self._save_upload(session, upload_state))
+        session.upload_tasks.add(task)
+        task.add_done_callback(session.upload_tasks.discard)
 
-                    # 添加到 session
-                    session.add_uploaded_file(file_info)
+    async def _save_upload(self, session: Session, upload_state: Dict):
+        """落盘、注册到会话并索引"""
+        filename = upload_state['filename']
+        writer = upload_state['writer']
 
-                    # 同步到 conversation_history（持久化）
-                    if session.conversation_history:
-                        session.conversation_history.add_uploaded_file(file_info)
-                        print(f"[INFO] [SERVER] 文件元数据已持久化到 conversation_history: {session.session_id}")
+        print(f"[INFO] [SERVER] 文件接收完成: {filename} ({writer.received_size} 字节，{upload_state['chunks_received']} 个分块)")
 
-                    print(f"[INFO] [SERVER] 文件元数据已注册到 session: {session.session_id}")
+        # 保存文件到 storage（fsync + 原子重命名）
+        try:
+            uploaded_file = await asyncio.to_thread(writer.finish)
+
+            print(f"[INFO] [SERVER] 文件已保存: {uploaded_file.file_id}")
+
+            # 将文件元数据添加到 session 和 conversation_history
+            file_info = {
+                "file_id": uploaded_file.file_id,
+                "filename": uploaded_file.filename,
+                "file_path": uploaded_file.storage_path,
+                "uploaded_at": uploaded_file.uploaded_at,
+                "size": uploaded_file.size,
+                "indexed": False  # 尚未索引
+            }
 
-                    # 自动索引文件（如果 index_manager 可用）
-                    if self.index_manager:
-                        try:
-                            print(f"[INFO] [SERVER] 开始索引文件: {uploaded_file.storage_path}")
-                            success, msg = await self.index_manager.ensure_indexed(
-                                file_path=uploaded_file.storage_path
-                            )
-                            if success:
-                                # 更新 indexed 状态
-                                file_info["indexed"] = True
-                                print(f"[INFO] [SERVER] 文件索引成功: {filename}")
-                            else:
-                                print(f"[WARN] [SERVER] 文件索引失败: {msg}")
-                        except Exception as e:
-                            print(f"[ERROR] [SERVER] 索引文件失败: {e}")
-                    else:
-                        print(f"[WARN] [SERVER] index_manager 未初始化，文件未被索引")
+            # 添加到 session
+            session.add_uploaded_file(file_info)
+
+            # 同步到 conversation_history（持久化）
+            if session.conversation_history:
+                session.conversation_history.add_uploaded_file(file_info)
+                print(f"[INFO] [SERVER] 文件元数据已持久化到 conversation_history: {session.session_id}")
+
+            print(f"[INFO] [SERVER] 文件元数据已注册到 session: {session.session_id}")
 
-                    # 发送成功确认
-                    await session.send_message(
-                        MessageType.CHAT_TEXT,
-                        f"文件上传成功: {filename} (ID: {uploaded_file.file_id})".encode('utf-8')
+            # 自动索引文件（如果 index_manager 可用）
+            if self.index_manager:
+                try:
+                    print(f"[INFO] [SERVER] 开始索引文件: {uploaded_file.storage_path}")
+                    success, msg = await self.index_manager.ensure_indexed(
+                        file_path=uploaded_file.storage_path
                     )
-                    
+                    if success:
+                        # 更新 indexed 状态
+                        file_info["indexed"] = True
+                        print(f"[INFO] [SERVER] 文件索引成功: {filename}")
+                    else:
+                        print(f"[WARN] [SERVER] 文件索引失败: {msg}")
                 except Exception as e:
-                    print(f"[ERROR] [SERVER] 保存文件失败: {e}")
-                    await session.send_message(
-                        MessageType.CHAT_TEXT,
-                        f"文件保存失败: {str(e)}".encode('utf-8')
-                    )
-                
-                # 清除上传状态
-                session.upload_state = None
-                
+                    print(f"[ERROR] [SERVER] 索引文件失败: {e}")
+            else:
+                print(f"[WARN] [SERVER] index_manager 未初始化，文件未被索引")
+
+            # 发送成功确认
+            await session.send_message(
+                MessageType.CHAT_TEXT,
+                f"文件上传成功: {filename} (ID: {uploaded_file.file_id})".encode('utf-8')
+            )
+
         except Exception as e:
-            print(f"[ERROR] [SERVER] 处理文件数据失败: {e}")
-            session.upload_state = None
+            print(f"[ERROR] [SERVER] 保存文件失败: {e}")
+            writer.abort()
+            await session.send_message(
+                MessageType.CHAT_TEXT,
+                f"文件保存失败: {str(e)}".encode('utf-8')
+            )
 
 
     def get_session(self, session_id: str) -> Optional[Session]:
@@ -761,6 +963,22 @@ class NPLTServer:
                 f"清空失败: {str(e)}".encode('utf-8')
             )
 
+    async def _handle_follow_stop(self, session: Session, message: NPLTMessage):
+        """处理停止日志跟踪请求"""
+        path = message.data.decode('utf-8', errors='ignore').strip() or None
+        stopped = await session.stop_follow(path)
+
+        if stopped:
+            response = "已停止跟踪: " + ", ".join(stopped)
+        else:
+            response = f"未在跟踪: {path}" if path else "当前没有正在跟踪的文件"
+
+        await session.send_message(
+            MessageType.CHAT_TEXT,
+            response.encode('utf-8')
+        )
+        print(f"[INFO] [SERVER] 停止日志跟踪: {session.session_id[:8]} {stopped}")
+
     async def _handle_session_list(self, session: Session, message: NPLTMessage):
         """处理会话列表请求"""
         try:
@@ -969,9 +1187,11 @@ class NPLTServer:
                 print(f"[WARN] [SERVER] 客户端未提供 UDP 端口")
                 return
 
-            # 存储 UDP 端口到会话
+            # 存储 UDP 端口到会话（旧客户端不声明协议版本，只支持 v1）
             session.client_udp_port = udp_port
-            print(f"[INFO] [SERVER] [{session.session_id[:8]}] 客户端 UDP 端口: {udp_port}")
+            session.client_rdt_versions = [int(v) for v in port_data.get('rdt_versions', [1])]
+            print(f"[INFO] [SERVER] [{session.session_id[:8]}] 客户端 UDP 端口: {udp_port} "
+                  f"(RDT 版本: {session.client_rdt_versions})")
 
         except Exception as e:
             print(f"[ERROR] [SERVER] 处理客户端 UDP 端口注册失败: {e}")
@@ -0,0 +1,129 @@
+"""
+RDT 拥塞控制模块
+
+为 RDT 发送方提供自适应超时和拥塞窗口：
+- 超时：Jacobson/Karels 算法（RFC 6298）由 ACK 往返时间估计 SRTT/RTTVAR，连续超时指数退避，
+  收到新数据的确认即取消退避（同 QUIC，RFC 9002），高丢包率下不会被退避拖垮；
+- 窗口：慢启动 + 拥塞避免（AIMD，同 TCP Reno），丢包时乘性减半，超时时回到 1 个包。
+遵循章程：真实实现，不允许虚假实现或占位符
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class CongestionController:
+    """单个传输会话的 RTT 估计与拥塞窗口（窗口以包为单位）"""
+
+    initial_window: int = 10        # 初始拥塞窗口（RFC 6928）
+    max_window: int = 1024          # 拥塞窗口上限
+    initial_rto: float = 1.0        # 尚无 RTT 采样时的超时时间（秒）
+    min_rto: float = 0.2            # 超时下限（秒）
+    max_rto: float = 10.0           # 超时上限（秒）
+
+    # RTT 估计
+    srtt: Optional[float] = None    # 平滑 RTT（秒）
+    rttvar: float = 0.0             # RTT 偏差（秒）
+    backoff: int = 0                # 连续超时的退避次数
+
+    # 拥塞窗口
+    cwnd: float = 10.0
+    ssthresh: float = float("inf")
+    recovery_point: Optional[int] = None  # 快速恢复结束的序列号（此前发出的包全部确认后退出）
+    loss_epoch_end: int = 0         # 上次减窗时的 next_seq：此前发出的包再丢失不重复减窗
+
+    # 统计
+    losses: int = 0
+    timeouts: int = 0
+
+    # RFC 6298 参数
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    CLOCK_GRANULARITY = 0.001
+
+    def __post_init__(self):
+        self.cwnd = float(min(self.initial_window, self.max_window))
+
+    @property
+    def rto(self) -> float:
+        """当前超时时间（秒，含退避）"""
+        if self.srtt is None:
+            rto = self.initial_rto
+        else:
+            rto = max(self.min_rto, self.srtt + max(self.CLOCK_GRANULARITY, self.K * self.rttvar))
+        return min(self.max_rto, rto * (2 ** self.backoff))
+
+    @property
+    def window(self) -> int:
+        """当前可用的发送窗口（包数）"""
+        return max(1, min(int(self.cwnd), self.max_window))
+
+    @property
+    def in_recovery(self) -> bool:
+        """是否处于快速恢复阶段"""
+        return self.recovery_point is not None
+
+    def on_rtt_sample(self, rtt: float):
+        """用一次 RTT 采样更新超时时间（调用方需按 Karn 算法排除重传过的包）"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+
+    def on_ack(self, acked: int, send_base: int):
+        """新确认了 acked 个包
+
+        Args:
+            acked: 新确认的包数
+            send_base: 确认后的发送基序列号
+        """
+        if acked > 0:
+            self.backoff = 0
+
+        if self.recovery_point is not None:
+            if send_base < self.recovery_point:
+                # 快速恢复期间不增长窗口
+                return
+            self.recovery_point = None
+
+        if self.cwnd < self.ssthresh:
+            # 慢启动：每确认一个包窗口加一（每个 RTT 翻倍）
+            self.cwnd += acked
+        else:
+            # 拥塞避免：每个 RTT 窗口加一
+            self.cwnd += acked / self.cwnd
+        self.cwnd = min(self.cwnd, float(self.max_window))
+
+    def on_loss(self, seq: int, in_flight: int, next_seq: int) -> bool:
+        """检测到丢包（三次重复 ACK 或 SACK 空洞）
+
+        Args:
+            seq: 丢失的序列号
+            in_flight: 已发送未确认的包数
+            next_seq: 下一个待发送的序列号
+
+        Returns:
+            是否进入新的快速恢复（同一窗口内的多次丢包只减窗一次）
+        """
+        if seq < self.loss_epoch_end:
+            return False
+        self.losses += 1
+        self.ssthresh = max(in_flight / 2, 2.0)
+        self.cwnd = self.ssthresh
+        self.recovery_point = next_seq
+        self.loss_epoch_end = next_seq
+        return True
+
+    def on_timeout(self, in_flight: int, next_seq: int):
+        """重传超时：窗口回到 1 个包（重新慢启动）并退避超时时间"""
+        self.timeouts += 1
+        self.ssthresh = max(in_flight / 2, 2.0)
+        self.cwnd = 1.0
+        self.recovery_point = None
+        self.loss_epoch_end = next_seq
+        if self.rto < self.max_rto:
+            self.backoff += 1
@@ -2,19 +2,48 @@
 RDT 服务器模块
 
 实现 RDT 可靠文件传输的发送方，支持滑动窗口和超时重传。
+发送循环由事件驱动：ACK 到达或重传定时器（loop.call_at）触发时唤醒，空闲时不占用 CPU。
+接收方发送 SACK 时切换为选择重传：只重传位图中缺失的包，而不是整个窗口。
+窗口大小和超时时间由 CongestionController 按 ACK 往返时间和丢包自适应调整。
+v2 协议（32 位序列号、传输 ID、1400 字节分片）按客户端声明的版本协商；
+文件按需从磁盘分块读取，内存中只保留在途的包。
+同一个 UDP 套接字上的多个传输按 (客户端地址, 传输 ID) 查表分发 ACK，互不干扰。
 遵循章程：真实实现，不允许虚假实现或占位符
 """
 
 import asyncio
 import hashlib
 import math
+import os
+import secrets
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Dict, List, Optional, Tuple
 
-from shared.protocols.rdt import ACKPacket, RDTPacket
+from shared.protocols.rdt import (
+    RDT_VERSION_1,
+    RDT_VERSION_2,
+    ACKPacket,
+    ACKPacketV2,
+    RDTPacket,
+    RDTPacketV2,
+    SACKPacket
+)
+from .rdt_congestion import CongestionController
+
+
+def file_checksum(path: str, block_size: int = 1024 * 1024) -> str:
+    """分块计算文件 MD5（不整体载入内存）"""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            md5.update(block)
+    return md5.hexdigest()
 
 
 class RDTState(Enum):
@@ -35,60 +64,229 @@ class RDTSession:
     file_size: int                  # 文件大小
     download_token: str             # 下载令牌
     state: RDTState                 # 传输状态
-    window_size: int = 5            # 滑动窗口大小
     send_base: int = 0              # 发送基序列号
     next_seq: int = 0               # 下一个序列号
-    packets: Dict[int, RDTPacket] = field(default_factory=dict)  # 已发送包
-    acked_packets: set = field(default_factory=set)  # 已确认包
-    timeout_start: Optional[float] = None  # 超时计时起点
-    timeout_duration: float = 0.1   # 超时时间（秒）
-
-    # 文件数据
+    high_seq: int = 0               # 已发送过的最大序列号 + 1（超时回退后 next_seq 会小于它）
+    packets: Dict[int, bytes] = field(default_factory=dict)  # 已发送未确认的包（编码后，用于重传）
+    acked_packets: set = field(default_factory=set)  # 窗口内已确认的包（send_base 之前的不再保留）
+    client_addr: Optional[Tuple[str, int]] = None  # 接收方地址
+
+    # 协议版本
+    version: int = RDT_VERSION_1
+    transfer_id: int = 0            # 传输 ID（v2）
+    chunk_size: int = RDTPacket.MAX_DATA_LENGTH  # 每包数据长度
+    total_packets: int = 0          # 总包数
+
+    # 拥塞控制（窗口大小和超时时间）
+    congestion: CongestionController = field(default_factory=CongestionController)
+    send_times: Dict[int, float] = field(default_factory=dict)  # 首次发送时间（用于 RTT 采样）
+    retransmitted: set = field(default_factory=set)  # 重传过的包（Karn 算法：不参与 RTT 采样）
+    retransmit_pending: set = field(default_factory=set)  # 待重传的包（重复 ACK / 部分确认触发）
+    dup_acks: int = 0                                # 连续重复 ACK 次数
+    retransmissions: int = 0                         # 累计重传次数
+
+    # 事件驱动状态（send_file 中初始化）
+    wakeup: Optional[asyncio.Event] = None          # ACK 到达或定时器到期时唤醒发送循环
+    timer: Optional[asyncio.TimerHandle] = None     # SendBase 的重传定时器
+    timer_expired: bool = False                     # 定时器已到期，等待发送循环重传
+    timeouts: int = 0                               # 连续超时次数（收到新确认时清零）
+
+    # 选择重传（收到第一个 SACK 包后启用）
+    selective_ack: bool = False
+    fast_retransmitted: set = field(default_factory=set)  # 已因 SACK 空洞快速重传过的包（超时后清空）
+
+    # 文件数据（内存中的数据或磁盘文件路径，二选一）
     file_data: Optional[bytes] = None
+    file_path: Optional[str] = None
     checksum: str = ""              # 文件校验和
+    _fd: Optional[int] = None
+    _block: bytes = b""             # 当前块
+    _block_start: int = 0           # 当前块在文件中的偏移
+    _prefetch: Optional[asyncio.Task] = None  # 正在线程中读取的下一块
+    _prefetch_start: int = 0
+
+    READ_AHEAD = 256 * 1024         # 从磁盘读取时的预读块大小
+
+    # 重复 ACK 次数 / 一个包之后被选择确认的包数达到该值时判定丢包（同 TCP）
+    DUP_THRESHOLD = 3
 
     def can_send(self) -> bool:
-        """检查是否可以发送新包"""
-        return self.next_seq < self.send_base + self.window_size
+        """检查是否可以发送新包（受拥塞窗口限制）"""
+        # 受限发送（RFC 3042）：前两个重复 ACK 各允许多发一个新包，使小窗口也能凑齐重复 ACK
+        limited_transmit = min(self.dup_acks, 2) if not self.congestion.in_recovery else 0
+        return self.next_seq < self.send_base + self.congestion.window + limited_transmit
+
+    @property
+    def dup_threshold(self) -> int:
+        """丢包判定门限（提前重传，RFC 5827：在途包太少、凑不齐 3 个重复 ACK 时降低门限）"""
+        return max(1, min(self.DUP_THRESHOLD, self.in_flight - 1))
+
+    @property
+    def in_flight(self) -> int:
+        """已发送未确认的包数"""
+        return self.next_seq - self.send_base
+
+    def sample_rtt(self, seq: int):
+        """以 seq 的确认时间更新 RTT 估计（重传过的包不采样）"""
+        sent_at = self.send_times.get(seq)
+        if sent_at is None or seq in self.retransmitted:
+            return
+        self.congestion.on_rtt_sample(asyncio.get_running_loop().time() - sent_at)
 
     def is_complete(self) -> bool:
-        """检查传输是否完成"""
-        if not self.file_data:
+        """检查传输是否完成（全部包均已被累积确认）"""
+        return self.send_base >= self.total_packets
+
+    def open(self):
+        """打开文件（从磁盘发送时）"""
+        if self.file_data is None and self._fd is None:
+            self._fd = os.open(self.file_path, os.O_RDONLY)
+
+    def close(self):
+        """关闭文件并释放缓存"""
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            if self._prefetch is not None and not self._prefetch.done():
+                # 线程中的预读结束后再关闭，避免读到被复用的文件描述符
+                self._prefetch.add_done_callback(lambda _: os.close(fd))
+            else:
+                os.close(fd)
+        self._prefetch = None
+        self._block = b""
+        self.packets.clear()
+
+    async def read_chunk(self, seq: int) -> bytes:
+        """读取第 seq 个分片的数据
+
+        从磁盘发送时按块读取，读取在线程中进行，并在发送当前块期间预读下一块，
+        事件循环不会因磁盘 IO 阻塞。
+        """
+        start = seq * self.chunk_size
+        end = min(start + self.chunk_size, self.file_size)
+        if self.file_data is not None:
+            return self.file_data[start:end]
+
+        if not (self._block_start <= start and end <= self._block_start + len(self._block)):
+            # 块按分片对齐，顺序发送时每块只读一次磁盘
+            block_size = max(self.chunk_size, self.READ_AHEAD // self.chunk_size * self.chunk_size)
+            if self._prefetch is not None and self._prefetch_start == start:
+                self._block = await self._prefetch
+            else:
+                self._block = await asyncio.to_thread(os.pread, self._fd, block_size, start)
+            self._block_start = start
+
+            next_start = start + len(self._block)
+            if next_start < self.file_size:
+                self._prefetch = asyncio.ensure_future(asyncio.to_thread(os.pread, self._fd, block_size, next_start))
+                self._prefetch_start = next_start
+            else:
+                self._prefetch = None
+        offset = start - self._block_start
+        return self._block[offset:offset + end - start]
+
+    def encode_packet(self, seq: int, data: bytes) -> bytes:
+        """按协商的协议版本编码数据包"""
+        if self.version == RDT_VERSION_2:
+            return RDTPacketV2(transfer_id=self.transfer_id, seq=seq, data=data).encode()
+        return RDTPacket(seq=seq, checksum=0, data=data).encode()
+
+    def apply_sack(self, seqs: List[int]) -> bool:
+        """记录选择确认的包
+
+        Args:
+            seqs: SACK 位图中标记为已收到的序列号
+
+        Returns:
+            是否有新确认的包
+        """
+        newest = None
+        newly_acked = 0
+        for seq in seqs:
+            if self.send_base <= seq < self.high_seq and seq not in self.acked_packets:
+                self.acked_packets.add(seq)
+                newest = seq
+                newly_acked += 1
+        if newest is None:
             return False
-        total_packets = math.ceil(len(self.file_data) / RDTPacket.MAX_DATA_LENGTH)
-        return len(self.acked_packets) >= total_packets
+        self.timeouts = 0
+        self.sample_rtt(newest)
+        self.congestion.on_ack(newly_acked, self.send_base)
+        return True
+
+    def detect_losses(self) -> List[int]:
+        """根据 SACK 空洞判定丢失且尚未快速重传过的包"""
+        lost = []
+        acked_above = 0
+        threshold = self.dup_threshold
+        for seq in range(self.next_seq - 1, self.send_base - 1, -1):
+            if seq in self.acked_packets:
+                acked_above += 1
+            elif acked_above >= threshold and seq not in self.fast_retransmitted:
+                lost.append(seq)
+        lost.reverse()
+        return lost
 
     def start_timeout_timer(self):
-        """启动超时计时器（仅对 SendBase 计时）"""
+        """启动（或重启）超时定时器（仅对 SendBase 计时）"""
+        self.stop_timeout_timer()
         if self.send_base < self.next_seq:
-            self.timeout_start = asyncio.get_event_loop().time()
-
-    def is_timeout(self) -> bool:
-        """检查是否超时"""
-        if self.timeout_start is None:
-            return False
-        elapsed = asyncio.get_event_loop().time() - self.timeout_start
-        return elapsed >= self.timeout_duration
+            loop = asyncio.get_running_loop()
+            self.timer = loop.call_at(loop.time() + self.congestion.rto, self._on_timeout)
+
+    def stop_timeout_timer(self):
+        """取消超时定时器"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _on_timeout(self):
+        """定时器到期：标记需要重传并唤醒发送循环"""
+        self.timer = None
+        self.timer_expired = True
+        self.timeouts += 1
+        self.wake()
+
+    def wake(self):
+        """唤醒发送循环"""
+        if self.wakeup is not None:
+            self.wakeup.set()
 
     def slide_window(self, ack_seq: int):
         """滑动窗口
 
         Args:
-            ack_seq: 确认的序列号
+            ack_seq: 累积确认号（接收方期望的下一个序列号，之前的包均已收到）
         """
-        # 更新已确认包
-        for seq in range(self.send_base, ack_seq + 1):
-            self.acked_packets.add(seq)
+        # 更新已确认包（SACK 已确认过的包不重复计入拥塞窗口增长）
+        newly_acked = 0
+        for seq in range(self.send_base, ack_seq):
+            if seq not in self.acked_packets:
+                self.acked_packets.add(seq)
+                newly_acked += 1
 
         # 滑动窗口
-        if ack_seq >= self.send_base:
-            self.send_base = ack_seq + 1
+        if ack_seq > self.send_base:
+            # 确认范围内有重传过的包时，累积确认的到达时间取决于重传，不能用于 RTT 采样
+            if not any(seq in self.retransmitted for seq in range(self.send_base, ack_seq)):
+                self.sample_rtt(ack_seq - 1)
+            # 释放已确认包的状态，长时间传输时内存只与窗口大小有关
+            for seq in range(self.send_base, ack_seq):
+                self.send_times.pop(seq, None)
+                self.packets.pop(seq, None)
+                self.acked_packets.discard(seq)
+                self.retransmitted.discard(seq)
+                self.fast_retransmitted.discard(seq)
+            self.send_base = ack_seq
+            self.next_seq = max(self.next_seq, ack_seq)
+            self.timeouts = 0
+            self.dup_acks = 0
+            self.congestion.on_ack(newly_acked, self.send_base)
 
         # 重置超时计时器
         if self.send_base < self.next_seq:
             self.start_timeout_timer()
         else:
-            self.timeout_start = None
+            self.stop_timeout_timer()
 
 
 @dataclass
@@ -97,11 +295,14 @@ class RDTServer:
 
     host: str = "0.0.0.0"
     port: int = 9998  # UDP 端口
-    window_size: int = 5
-    timeout: float = 0.1  # 超时时间（秒）
+    initial_window: int = 10  # 初始拥塞窗口（包数）
+    max_window: int = 1024  # 拥塞窗口上限（包数）
+    initial_rto: float = 1.0  # 尚无 RTT 采样时的超时时间（秒）
+    max_timeouts: int = 10  # 连续超时（无任何新确认，超时时间逐次翻倍）达到该次数时判定接收方已失联
 
     # 内部状态
     sessions: Dict[str, RDTSession] = field(default_factory=dict)
+    transfers: Dict[Tuple[Tuple[str, int], int], RDTSession] = field(default_factory=dict)  # 发送中的传输（按 ACK 来源分发）
     transport: Optional[asyncio.DatagramTransport] = None
     protocol: Optional[asyncio.DatagramProtocol] = None
     running: bool = False
@@ -123,8 +324,14 @@ class RDTServer:
         """停止 RDT 服务器"""
         self.running = False
 
-        # 关闭所有会话
+        # 关闭所有会话（取消重传定时器并唤醒仍在等待的发送循环）
+        for session in self.sessions.values():
+            session.stop_timeout_timer()
+            if session.state in [RDTState.SENDING, RDTState.WAITING_ACK]:
+                session.state = RDTState.FAILED
+                session.wake()
         self.sessions.clear()
+        self.transfers.clear()
 
         # 关闭传输
         if self.transport:
@@ -135,21 +342,48 @@ class RDTServer:
     def create_session(
         self,
         filename: str,
-        file_data: bytes,
-        client_addr: Tuple[str, int]
+        file_data: Optional[bytes] = None,
+        client_addr: Optional[Tuple[str, int]] = None,
+        file_path: Optional[str] = None,
+        version: int = RDT_VERSION_1,
+        checksum: Optional[str] = None
     ) -> str:
         """创建 RDT 传输会话
 
         Args:
             filename: 文件名
-            file_data: 文件数据
-            client_addr: 客户端地址
+            file_data: 文件数据（与 file_path 二选一）
+            client_addr: 客户端 UDP 地址
+            file_path: 文件路径（发送时按需分块读取，不整体载入内存）
+            version: 协议版本（v1 仅支持 65535 个包以内的文件）
+            checksum: 文件 MD5（未提供时计算；大文件可由调用方在线程中预先计算）
 
         Returns:
             下载令牌
+
+        Raises:
+            ValueError: 文件超出协议版本支持的大小
         """
+        if file_data is None and file_path is None:
+            raise ValueError("必须提供 file_data 或 file_path")
+
+        file_size = len(file_data) if file_data is not None else os.path.getsize(file_path)
+        if version == RDT_VERSION_2:
+            chunk_size = RDTPacketV2.MAX_DATA_LENGTH
+            max_packets = RDTPacketV2.MAX_SEQ
+        else:
+            chunk_size = RDTPacket.MAX_DATA_LENGTH
+            max_packets = 0xFFFF  # 16 位序列号，累积确认号最大为 65535
+        total_packets = math.ceil(file_size / chunk_size)
+        if total_packets > max_packets:
+            raise ValueError(
+                f"文件过大：RDT v{version} 最多支持 {max_packets * chunk_size} 字节，"
+                f"当前 {file_size} 字节"
+            )
+
         # 计算校验和
-        checksum = hashlib.md5(file_data).hexdigest()
+        if checksum is None:
+            checksum = hashlib.md5(file_data).hexdigest() if file_data is not None else file_checksum(file_path)
 
         # 创建会话
         session_id = str(uuid.uuid4())
@@ -158,27 +392,36 @@ class RDTServer:
         session = RDTSession(
             session_id=session_id,
             filename=filename,
-            file_size=len(file_data),
+            file_size=file_size,
             download_token=download_token,
             state=RDTState.WAITING_ACK,
-            window_size=self.window_size,
-            timeout_duration=self.timeout,
+            client_addr=client_addr,
+            version=version,
+            transfer_id=self._new_transfer_id() if version == RDT_VERSION_2 else 0,
+            chunk_size=chunk_size,
+            total_packets=total_packets,
+            congestion=CongestionController(
+                initial_window=self.initial_window,
+                max_window=self.max_window,
+                initial_rto=self.initial_rto
+            ),
             file_data=file_data,
+            file_path=file_path,
             checksum=checksum
         )
 
         self.sessions[download_token] = session
 
-        print(f"[INFO] [RDT] 创建传输会话: {filename} ({len(file_data)} 字节)")
+        print(f"[INFO] [RDT] 创建传输会话: {filename} ({file_size} 字节, v{version})")
 
         return download_token
 
-    async def send_file(self, download_token: str, client_addr: Tuple[str, int]) -> bool:
+    async def send_file(self, download_token: str, client_addr: Optional[Tuple[str, int]] = None) -> bool:
         """发送文件
 
         Args:
             download_token: 下载令牌
-            client_addr: 客户端地址
+            client_addr: 客户端 UDP 地址（默认使用创建会话时登记的地址）
 
         Returns:
             是否成功
@@ -188,64 +431,123 @@ class RDTServer:
             print(f"[ERROR] [RDT] 会话不存在: {download_token}")
             return False
 
-        if not session.file_data:
+        if session.file_data is None and session.file_path is None:
             print(f"[ERROR] [RDT] 文件数据不存在")
+            self._discard_session(download_token, session)
+            return False
+
+        if client_addr is None:
+            client_addr = session.client_addr
+        if client_addr is None:
+            print(f"[ERROR] [RDT] 缺少客户端地址: {session.filename}")
+            self._discard_session(download_token, session)
             return False
 
+        # 注册到分发表（v1 包不带传输 ID，同一客户端地址同时只能有一个 v1 传输）
+        key = self._transfer_key(client_addr, session.transfer_id)
+        if key in self.transfers:
+            print(f"[ERROR] [RDT] 该客户端已有进行中的 v{session.version} 传输，无法同时发送: {session.filename}")
+            self._discard_session(download_token, session)
+            return False
+        self.transfers[key] = session
+
         session.state = RDTState.SENDING
+        session.client_addr = client_addr
+        session.wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
 
         try:
-            # 分片文件
-            data = session.file_data
-            chunk_size = RDTPacket.MAX_DATA_LENGTH
-            total_chunks = math.ceil(len(data) / chunk_size)
+            session.open()
+            total_chunks = session.total_packets
 
             print(f"[INFO] [RDT] 开始发送文件: {session.filename} ({total_chunks} 个包)")
 
             # 发送数据包
             while not session.is_complete() and session.state != RDTState.FAILED:
                 # 检查超时
-                if session.is_timeout():
-                    print(f"[WARN] [RDT] 超时，重传包 {session.send_base}")
-                    # 重传 SendBase 包
-                    if session.send_base in session.packets:
-                        packet = session.packets[session.send_base]
-                        await self._send_packet(packet, client_addr)
-                        session.start_timeout_timer()
+                if session.timer_expired:
+                    session.timer_expired = False
+                    if session.timeouts >= self.max_timeouts:
+                        print(f"[ERROR] [RDT] 连续 {session.timeouts} 次超时，放弃发送: {session.filename}")
+                        session.state = RDTState.FAILED
+                        return False
+
+                    # 窗口回到 1 个包、超时时间翻倍，next_seq 回退到 SendBase（同 TCP 超时后的 snd_nxt），
+                    # 未确认的包视为全部丢失，由下面的发送循环在慢启动中依次重传（跳过已被 SACK 的包）。
+                    # 窗口尾部整段丢失时没有后续 SACK 能暴露空洞，不回退的话每个包都要等一次超时
+                    session.congestion.on_timeout(session.in_flight, session.next_seq)
+                    session.fast_retransmitted.clear()
+                    session.retransmit_pending.clear()
+                    print(f"[WARN] [RDT] 超时，从包 {session.send_base} 开始重传（RTO={session.congestion.rto:.3f}s）")
+                    session.next_seq = session.send_base
+
+                # 快速重传
+                if session.selective_ack:
+                    # SACK 空洞（每个包在一次超时前只快速重传一次，每轮不超过拥塞窗口）
+                    lost = session.detect_losses()
+                    if lost:
+                        session.congestion.on_loss(lost[0], session.in_flight, session.next_seq)
+                    for seq in lost[:session.congestion.window]:
+                        print(f"[DEBUG] [RDT] SACK 判定丢失，快速重传包 {seq}")
+                        await self._retransmit(session, seq)
+                        session.fast_retransmitted.add(seq)
+                else:
+                    # 三次重复 ACK / 快速恢复期间的部分确认
+                    for seq in sorted(session.retransmit_pending):
+                        if seq >= session.send_base and seq not in session.acked_packets:
+                            print(f"[DEBUG] [RDT] 快速重传包 {seq}")
+                            await self._retransmit(session, seq)
+                    session.retransmit_pending.clear()
 
                 # 发送新包（如果窗口允许）
                 while session.can_send() and session.next_seq < total_chunks:
-                    # 计算分片
-                    start = session.next_seq * chunk_size
-                    end = min(start + chunk_size, len(data))
-                    chunk = data[start:end]
-
-                    # 创建数据包
-                    packet = RDTPacket(
-                        seq=session.next_seq,
-                        checksum=0,  # 将在 encode 中计算
-                        data=chunk
-                    )
-
-                    # 编码并发送
+                    seq = session.next_seq
+                    if seq < session.high_seq:
+                        # 超时回退后的重发
+                        session.next_seq += 1
+                        if seq not in session.acked_packets:
+                            await self._retransmit(session, seq)
+                        if session.timer is None:
+                            session.start_timeout_timer()
+                        continue
+
+                    # 读取分片并编码
+                    packet = session.encode_packet(seq, await session.read_chunk(seq))
+
+                    # 发送
                     await self._send_packet(packet, client_addr)
 
                     # 保存包
-                    session.packets[session.next_seq] = packet
-                    session.next_seq += 1
+                    session.packets[seq] = packet
+                    session.send_times[seq] = loop.time()
+                    session.next_seq = session.high_seq = seq + 1
 
                     # 如果是第一个包，启动超时计时器
-                    if session.send_base == session.next_seq - 1:
+                    if session.timer is None:
                         session.start_timeout_timer()
 
-                    print(f"[DEBUG] [RDT] 发送包 {packet.seq}/{total_chunks}")
+                if session.is_complete():
+                    break
+
+                # 等待 ACK 或定时器到期（不再轮询）
+                await session.wakeup.wait()
+                session.wakeup.clear()
 
-                # 等待 ACK 或超时
-                await asyncio.sleep(0.01)
+            if session.state == RDTState.FAILED:
+                print(f"[WARN] [RDT] 传输已中止: {session.filename}")
+                return False
 
             # 传输完成
             session.state = RDTState.COMPLETED
-            print(f"[INFO] [RDT] 文件发送完成: {session.filename}")
+            congestion = session.congestion
+            elapsed = max(loop.time() - started_at, 1e-6)
+            srtt = f"{congestion.srtt * 1000:.1f}ms" if congestion.srtt is not None else "-"
+            print(
+                f"[INFO] [RDT] 文件发送完成: {session.filename} "
+                f"({session.file_size / elapsed / 1024 / 1024:.2f} MB/s, SRTT={srtt}, "
+                f"重传 {session.retransmissions} 次, 丢包事件 {congestion.losses}, 超时 {congestion.timeouts})"
+            )
             return True
 
         except Exception as e:
@@ -253,46 +555,108 @@ class RDTServer:
             session.state = RDTState.FAILED
             return False
 
-    async def _send_packet(self, packet: RDTPacket, addr: Tuple[str, int]):
+        finally:
+            session.stop_timeout_timer()
+            session.close()
+            session.wakeup = None
+            # 传输结束：移出分发表并释放会话（含内存中的文件数据）
+            if self.transfers.get(key) is session:
+                del self.transfers[key]
+            self.sessions.pop(download_token, None)
+
+    def _discard_session(self, download_token: str, session: RDTSession):
+        """未开始发送就放弃的会话：标记失败并释放（含内存中的文件数据）"""
+        session.state = RDTState.FAILED
+        if self.sessions.get(download_token) is session:
+            del self.sessions[download_token]
+
+    async def _retransmit(self, session: RDTSession, seq: int):
+        """重传已发送过的包"""
+        session.retransmitted.add(seq)
+        session.retransmissions += 1
+        await self._send_packet(session.packets[seq], session.client_addr)
+
+    async def _send_packet(self, packet: bytes, addr: Tuple[str, int]):
         """发送数据包
 
         Args:
-            packet: RDT 数据包
+            packet: 编码后的数据包
             addr: 目标地址
         """
         if not self.transport:
             raise RuntimeError("RDT 服务器未启动")
 
-        # 编码数据包
-        encoded = packet.encode()
+        self.transport.sendto(packet, addr)
+
+    @staticmethod
+    def _transfer_key(addr: Tuple, transfer_id: int) -> Tuple[Tuple[str, int], int]:
+        """分发表键（IPv6 地址元组只取主机和端口）"""
+        return (addr[0], addr[1]), transfer_id
 
-        # 发送
-        self.transport.sendto(encoded, addr)
+    def _new_transfer_id(self) -> int:
+        """分配未被占用的非零传输 ID"""
+        used = {session.transfer_id for session in self.sessions.values()}
+        while True:
+            transfer_id = secrets.randbits(32)
+            if transfer_id and transfer_id not in used:
+                return transfer_id
 
     def handle_ack(self, data: bytes, addr: Tuple[str, int]):
-        """处理 ACK 包
+        """处理 ACK 包（包括 SACK 包）
 
         Args:
             data: ACK 数据
             addr: 发送方地址
         """
         try:
-            # 解码 ACK 包
-            ack = ACKPacket.decode(data)
+            # 解码 ACK 包（按长度区分 v1 ACK、v1 SACK 和 v2 确认包；v1 的传输 ID 视为 0）
+            transfer_id = 0
+            if len(data) == ACKPacketV2.HEADER_SIZE:
+                ack = ACKPacketV2.decode(data)
+                sacked = ack.received_seqs()
+                transfer_id = ack.transfer_id
+            elif len(data) == SACKPacket.HEADER_SIZE:
+                ack = SACKPacket.decode(data)
+                sacked = ack.received_seqs()
+            else:
+                ack = ACKPacket.decode(data)
+                sacked = None
 
             # 验证 ACK 包
             if not ack.validate():
                 print(f"[WARN] [RDT] 无效 ACK 包")
                 return
 
-            # 查找会话
-            for token, session in self.sessions.items():
-                if session.state in [RDTState.SENDING, RDTState.WAITING_ACK]:
-                    # 滑动窗口
-                    if ack.seq >= session.send_base:
-                        old_base = session.send_base
-                        session.slide_window(ack.seq)
-                        print(f"[DEBUG] [RDT] 收到 ACK={ack.seq}, 窗口滑动: {old_base} -> {session.send_base}")
+            # 查找会话：按 (来源地址, 传输 ID) 查表，其他客户端或其他传输的 ACK 不会影响本会话
+            session = self.transfers.get(self._transfer_key(addr, transfer_id))
+            if session is None or session.state != RDTState.SENDING:
+                return
+            if not session.send_base <= ack.seq <= session.high_seq:
+                return
+
+            updated = False
+            if sacked is not None:
+                session.selective_ack = True
+                updated = session.apply_sack(sacked)
+
+            # 滑动窗口（ACK 为累积确认号，等于 send_base 时表示没有新确认）
+            if ack.seq > session.send_base:
+                session.slide_window(ack.seq)
+                updated = True
+                if (not session.selective_ack and session.congestion.in_recovery
+                        and session.send_base < session.next_seq):
+                    # 快速恢复期间的部分确认：下一个缺口同样已丢失
+                    session.retransmit_pending.add(session.send_base)
+            elif sacked is None and session.send_base < session.next_seq:
+                # 重复 ACK：达到门限时快速重传 SendBase
+                session.dup_acks += 1
+                if session.dup_acks == session.dup_threshold:
+                    session.congestion.on_loss(session.send_base, session.in_flight, session.next_seq)
+                    session.retransmit_pending.add(session.send_base)
+                    updated = True
+
+            if updated:
+                session.wake()
 
         except Exception as e:
             print(f"[ERROR] [RDT] 处理 ACK 失败: {e}")
@@ -311,7 +675,7 @@ class RDTServerProtocol(asyncio.DatagramProtocol):
     def datagram_received(self, data, addr):
         """接收数据报"""
         # 判断是 ACK 包还是数据包
-        if len(data) == ACKPacket.HEADER_SIZE:
+        if len(data) in (ACKPacket.HEADER_SIZE, SACKPacket.HEADER_SIZE, ACKPacketV2.HEADER_SIZE):
             # ACK 包
             self.server.handle_ack(data, addr)
         else:
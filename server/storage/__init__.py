@@ -2,17 +2,25 @@
 存储模块
 """
 
-from .vector_store import VectorStore, VectorIndex, SearchResult
+from .vector_store import VectorStore, VectorIndex, IndexManifest, SearchResult
+from .ann_index import ANNIndex
+from .embedding_cache import EmbeddingCache
 from .history import ConversationHistory, SessionManager
-from .files import UploadedFile
+from .files import UploadedFile, UploadWriter
 from .index_manager import IndexManager
+from .file_watcher import FileWatcher
 
 __all__ = [
     'VectorStore',
     'VectorIndex',
+    'IndexManifest',
     'SearchResult',
+    'ANNIndex',
+    'EmbeddingCache',
     'ConversationHistory',
     'SessionManager',
     'UploadedFile',
+    'UploadWriter',
     'IndexManager',
+    'FileWatcher',
 ]
@@ -0,0 +1,336 @@
+"""
+全局 ANN 索引模块
+
+基于 FAISS 为所有文件的分块向量维护一个统一索引，替代逐文件检索再合并。
+遵循章程：数据持久化到 storage/vectors/ 目录
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Iterable, List, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ANNIndex:
+    """全局 ANN 索引
+
+    行 ID 按文件连续分配：file_id -> (起始 ID, 分块数)，
+    因此任意一行都可以映射回 (file_id, 分块位置)。
+
+    索引类型：
+    - flat: 精确内积检索（向量已归一化，内积即余弦相似度）
+    - ivf:  倒排索引，适合大规模语料
+    - hnsw: 图索引，不支持物理删除，删除的行以墓碑标记并在检索时过滤
+    - auto: 向量数低于 ivf_threshold 时使用 flat，否则在重建时切换为 ivf
+
+    IVF 需要足够的训练样本（每个聚类约 39 个），向量数不足 IVF_MIN_VECTORS 时
+    ivf/auto 模式都先使用 flat，达到后在重建时切换。
+    """
+
+    INDEX_TYPES = ("auto", "flat", "ivf", "hnsw")
+
+    # IVF 至少的聚类数，聚类太少时 IVF 只是更慢的 flat
+    IVF_MIN_NLIST = 64
+    IVF_MIN_VECTORS = 39 * IVF_MIN_NLIST
+
+    INDEX_FILE = "global.index"
+    MAPPING_FILE = "mapping.json"
+
+    def __init__(
+        self,
+        storage_dir: str,
+        index_type: str = "auto",
+        ivf_threshold: int = 100000,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        max_tombstone_ratio: float = 0.2
+    ):
+        """初始化全局索引
+
+        Args:
+            storage_dir: 持久化目录
+            index_type: 索引类型（auto/flat/ivf/hnsw）
+            ivf_threshold: auto 模式下切换到 IVF 的向量数阈值
+            nprobe: IVF 检索时探查的聚类数
+            hnsw_m: HNSW 每个节点的邻居数
+            max_tombstone_ratio: 墓碑比例超过该值时需要重建
+        """
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型：{index_type}，可用类型：{self.INDEX_TYPES}")
+
+        self.storage_dir = storage_dir
+        self.index_type = index_type
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.max_tombstone_ratio = max_tombstone_ratio
+
+        self.index = None
+        self.kind: str | None = None        # 实际使用的索引类型
+        self.dim: int | None = None
+        self.next_id = 0
+        self.files: dict[str, Tuple[int, int]] = {}    # file_id -> (起始 ID, 分块数)
+        self.id_map: dict[int, Tuple[str, int]] = {}   # 行 ID -> (file_id, 分块位置)
+        self.tombstones: set[int] = set()
+        self.dirty = False          # 内存中的索引是否有尚未保存的修改
+
+        self._lock = threading.Lock()
+
+    @property
+    def ntotal(self) -> int:
+        """有效向量数"""
+        return len(self.id_map)
+
+    def _resolve_kind(self, n: int) -> str:
+        """根据配置和向量数决定索引类型"""
+        if self.index_type == "auto":
+            return "ivf" if n >= max(self.ivf_threshold, self.IVF_MIN_VECTORS) else "flat"
+        if self.index_type == "ivf":
+            return "ivf" if n >= self.IVF_MIN_VECTORS else "flat"
+        return self.index_type
+
+    def _create_index(self, kind: str, dim: int, train_data: np.ndarray | None = None):
+        """创建空的 FAISS 索引
+
+        Args:
+            kind: 索引类型
+            dim: 向量维度
+            train_data: IVF 训练数据
+
+        Returns:
+            FAISS 索引实例
+        """
+        if kind == "ivf":
+            n = len(train_data) if train_data is not None else 0
+            # 经验值：nlist ≈ 4·sqrt(n)，且每个聚类至少有 39 个训练样本
+            nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+            index = faiss.index_factory(dim, f"IVF{nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+            index.train(train_data)
+            index.nprobe = min(self.nprobe, nlist)
+            return index
+
+        if kind == "hnsw":
+            return faiss.index_factory(dim, f"IDMap2,HNSW{self.hnsw_m}", faiss.METRIC_INNER_PRODUCT)
+
+        return faiss.index_factory(dim, "IDMap2,Flat", faiss.METRIC_INNER_PRODUCT)
+
+    def _register(self, file_id: str, count: int) -> np.ndarray:
+        """为文件分配连续行 ID"""
+        start = self.next_id
+        self.next_id += count
+        self.files[file_id] = (start, count)
+        for position in range(count):
+            self.id_map[start + position] = (file_id, position)
+        return np.arange(start, start + count, dtype=np.int64)
+
+    def rebuild(self, items: Iterable[Tuple[str, np.ndarray]]):
+        """从全部文件的嵌入矩阵重建索引
+
+        Args:
+            items: (file_id, 归一化嵌入矩阵) 序列
+        """
+        items = [(file_id, matrix) for file_id, matrix in items if len(matrix) > 0]
+
+        with self._lock:
+            self.index = None
+            self.kind = None
+            self.dim = None
+            self.next_id = 0
+            self.files = {}
+            self.id_map = {}
+            self.tombstones = set()
+            self.dirty = True
+
+            if not items:
+                return
+
+            self.dim = items[0][1].shape[1]
+            skipped = [file_id for file_id, matrix in items if matrix.shape[1] != self.dim]
+            if skipped:
+                logger.warning(f"全局 ANN 索引重建跳过 {len(skipped)} 个维度不是 {self.dim} 的文件：{skipped}")
+                items = [(file_id, matrix) for file_id, matrix in items if matrix.shape[1] == self.dim]
+            data = np.ascontiguousarray(np.vstack([matrix for _, matrix in items]), dtype=np.float32)
+
+            self.kind = self._resolve_kind(len(data))
+            self.index = self._create_index(self.kind, self.dim, train_data=data)
+
+            ids = np.concatenate([self._register(file_id, len(matrix)) for file_id, matrix in items])
+            self.index.add_with_ids(data, ids)
+
+        logger.info(f"全局 ANN 索引重建完成：{self.kind}, {len(data)} 个向量, {len(items)} 个文件")
+
+    def add(self, file_id: str, embeddings: np.ndarray):
+        """增量添加一个文件的嵌入矩阵（已存在则先删除）
+
+        Args:
+            file_id: 文件 ID
+            embeddings: 归一化嵌入矩阵 (n, dim)
+        """
+        if len(embeddings) == 0:
+            self.remove(file_id)
+            return
+
+        with self._lock:
+            self._remove_locked(file_id)
+
+            if self.index is None:
+                self.dim = embeddings.shape[1]
+                # IVF 需要训练数据，首个文件通常太小，先以 flat 起步
+                self.kind = "flat" if self.index_type in ("auto", "ivf") else self.index_type
+                self.index = self._create_index(self.kind, self.dim)
+
+            if embeddings.shape[1] != self.dim:
+                raise ValueError(f"向量维度不匹配：{embeddings.shape[1]} != {self.dim}")
+
+            ids = self._register(file_id, len(embeddings))
+            self.index.add_with_ids(np.ascontiguousarray(embeddings, dtype=np.float32), ids)
+            self.dirty = True
+
+    def remove(self, file_id: str):
+        """删除一个文件的全部向量
+
+        Args:
+            file_id: 文件 ID
+        """
+        with self._lock:
+            self._remove_locked(file_id)
+
+    def _remove_locked(self, file_id: str):
+        """删除文件向量（调用方需持有锁）"""
+        if file_id not in self.files:
+            return
+
+        start, count = self.files.pop(file_id)
+        ids = np.arange(start, start + count, dtype=np.int64)
+        for row_id in ids:
+            self.id_map.pop(int(row_id), None)
+
+        if self.kind == "hnsw":
+            # HNSW 不支持物理删除
+            self.tombstones.update(int(row_id) for row_id in ids)
+        else:
+            self.index.remove_ids(ids)
+        self.dirty = True
+
+    def needs_rebuild(self) -> bool:
+        """是否需要重建（索引类型应升级，或墓碑过多）"""
+        if self.index is None:
+            return False
+        if self._resolve_kind(self.ntotal) != self.kind:
+            return True
+        total = self.ntotal + len(self.tombstones)
+        return total > 0 and len(self.tombstones) / total > self.max_tombstone_ratio
+
+    def search(self, query_embedding: List[float], top_k: int = 3) -> List[Tuple[str, int, float]]:
+        """全局向量检索
+
+        Args:
+            query_embedding: 查询向量
+            top_k: 返回前 k 个结果
+
+        Returns:
+            [(file_id, 分块位置, 相似度)]，按相似度降序
+        """
+        with self._lock:
+            if self.index is None or self.ntotal == 0 or top_k <= 0:
+                return []
+
+            # 复制一份：normalize_L2 原地修改，不能作用于调用方的数组（可能是只读内存映射）
+            query = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+            if query.shape[1] != self.dim:
+                raise ValueError(f"查询向量维度不匹配：{query.shape[1]} != {self.dim}")
+            faiss.normalize_L2(query)
+
+            # 为被墓碑过滤的行预留余量
+            k = min(top_k + len(self.tombstones), self.ntotal + len(self.tombstones))
+            scores, ids = self.index.search(query, k)
+
+            results = []
+            for score, row_id in zip(scores[0], ids[0]):
+                entry = self.id_map.get(int(row_id))
+                if entry is None:
+                    continue
+                results.append((entry[0], entry[1], float(score)))
+                if len(results) >= top_k:
+                    break
+
+            return results
+
+    def save(self):
+        """持久化索引和行映射（会写出整个索引，应批量修改后再调用）"""
+        with self._lock:
+            self.dirty = False
+            os.makedirs(self.storage_dir, exist_ok=True)
+            index_path = os.path.join(self.storage_dir, self.INDEX_FILE)
+            mapping_path = os.path.join(self.storage_dir, self.MAPPING_FILE)
+
+            if self.index is None:
+                for path in (index_path, mapping_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                return
+
+            # 先写临时文件再替换，避免中途崩溃留下不一致的索引
+            faiss.write_index(self.index, index_path + ".tmp")
+            mapping = {
+                "kind": self.kind,
+                "dim": self.dim,
+                "next_id": self.next_id,
+                "files": self.files,
+                "tombstones": sorted(self.tombstones)
+            }
+            with open(mapping_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(mapping, f)
+
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(mapping_path + ".tmp", mapping_path)
+
+    def load(self) -> bool:
+        """从磁盘加载索引
+
+        Returns:
+            是否加载成功
+        """
+        index_path = os.path.join(self.storage_dir, self.INDEX_FILE)
+        mapping_path = os.path.join(self.storage_dir, self.MAPPING_FILE)
+
+        if not (os.path.exists(index_path) and os.path.exists(mapping_path)):
+            return False
+
+        try:
+            with open(mapping_path, 'r', encoding='utf-8') as f:
+                mapping = json.load(f)
+            index = faiss.read_index(index_path)
+        except Exception as e:
+            logger.warning(f"加载全局 ANN 索引失败：{e}")
+            return False
+
+        with self._lock:
+            self.index = index
+            self.kind = mapping["kind"]
+            self.dim = mapping["dim"]
+            self.next_id = mapping["next_id"]
+            self.files = {}
+            self.id_map = {}
+            for file_id, (start, count) in mapping["files"].items():
+                self.files[file_id] = (start, count)
+                for position in range(count):
+                    self.id_map[start + position] = (file_id, position)
+            self.tombstones = set(mapping.get("tombstones", []))
+            self.dirty = False
+
+            if self.kind == "ivf":
+                ivf = faiss.extract_index_ivf(self.index)
+                ivf.nprobe = min(self.nprobe, ivf.nlist)
+
+        return True
+
+    def file_ids(self) -> set[str]:
+        """已收录的文件 ID 集合"""
+        return set(self.files)
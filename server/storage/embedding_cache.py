@@ -0,0 +1,179 @@
+"""
+嵌入向量缓存模块
+
+按 (嵌入模型, 分块文本 SHA256) 缓存嵌入向量，避免重复调用嵌入 API。
+遵循章程：数据持久化到 storage/vectors/ 目录
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """持久化嵌入向量缓存（SQLite，LRU 淘汰）
+
+    方法均为同步调用，异步代码中应通过 asyncio.to_thread 调用。
+    命中条目的使用时间先记在内存中，随下一次写入（或积累到 TOUCH_FLUSH_SIZE 条时）
+    在同一个事务中批量更新，查询本身不写库。
+    """
+
+    TOUCH_FLUSH_SIZE = 10000  # 内存中积累的待更新使用时间条数上限
+
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        """初始化缓存
+
+        Args:
+            db_path: SQLite 数据库路径
+            max_entries: 最大缓存条目数，超出后淘汰最久未使用的条目
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # 待写入的使用时间：key -> last_used
+        self._touched: dict[str, float] = {}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """生成缓存键：模型名 + 文本 SHA256"""
+        return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """批量查询缓存
+
+        Args:
+            model: 嵌入模型名称
+            texts: 文本列表
+
+        Returns:
+            与 texts 一一对应的向量（未命中为 None）
+        """
+        if not texts:
+            return []
+
+        keys = [self.make_key(model, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        found: dict[str, np.ndarray] = {}
+
+        with self._lock:
+            # SQLite 默认变量上限为 999，分段查询
+            for i in range(0, len(unique_keys), 500):
+                part = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            # 记录命中条目的使用时间（LRU），延迟到下一次写事务中批量更新
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if len(self._touched) >= self.TOUCH_FLUSH_SIZE:
+                    self._flush_touched_locked()
+                    self._conn.commit()
+
+        results = [found.get(key) for key in keys]
+        hits = sum(1 for result in results if result is not None)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """批量写入缓存
+
+        Args:
+            model: 嵌入模型名称
+            texts: 文本列表
+            embeddings: 对应的嵌入向量
+        """
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+        with self._lock:
+            self._flush_touched_locked()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def _flush_touched_locked(self):
+        """写入积累的使用时间（调用方需持有锁并负责提交）"""
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+            [(last_used, key) for key, last_used in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def _evict_locked(self):
+        """淘汰超出上限的最久未使用条目（调用方需持有锁）"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        """写入积累的使用时间并关闭数据库连接"""
+        with self._lock:
+            self._flush_touched_locked()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,442 @@
+"""
+白名单文件监视模块
+
+在后台监视 file_access.allowed_paths 中的目录，文件新增或修改后自动（增量）索引，
+使语义检索不必在查询时同步等待索引。
+Linux 下使用 inotify，其他平台或 inotify 不可用时退化为轮询。
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import fnmatch
+import glob
+import logging
+import os
+import struct
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+@dataclass
+class WatchTarget:
+    """监视目标（一个白名单条目展开后的目录）"""
+    directory: str              # 监视的目录
+    pattern: Optional[str]      # 文件名匹配模式（None 表示目录下所有文件）
+    recursive: bool             # 是否递归监视子目录
+
+
+class FileWatcher:
+    """白名单目录监视器
+
+    事件经过防抖后放入有界队列，由固定数量的工作协程调用 IndexManager 索引。
+    队列满时防抖任务阻塞（背压），期间同一文件的重复事件在防抖表中合并。
+    """
+
+    # 忽略的临时文件（*.part 为上传中的文件，见 UploadWriter）
+    IGNORED_PATTERNS = ("*.tmp", "*.swp", "*~", "*.part", ".*")
+
+    def __init__(
+        self,
+        index_manager,
+        allowed_paths: list[str],
+        debounce: float = 2.0,
+        max_wait: float = 30.0,
+        poll_interval: float = 10.0,
+        queue_size: int = 256,
+        workers: int = 2,
+        use_inotify: bool = True
+    ):
+        """初始化监视器
+
+        Args:
+            index_manager: 索引管理器
+            allowed_paths: 白名单路径（目录或 glob 模式）
+            debounce: 防抖时间（秒），文件在此时间内无新事件才会被索引
+            max_wait: 最长等待时间（秒），持续写入的文件（如日志）自首个事件起最迟在此时间后索引
+            poll_interval: 轮询模式的扫描间隔（秒）
+            queue_size: 待索引队列容量
+            workers: 索引工作协程数
+            use_inotify: 是否优先使用 inotify
+        """
+        self.index_manager = index_manager
+        self.allowed_paths = allowed_paths
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self.use_inotify = use_inotify
+
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.targets = self._expand_targets(allowed_paths)
+
+        # 防抖表：路径 -> 到期时间（loop.time()）
+        self._pending: dict[str, float] = {}
+        # 路径 -> 本轮首个事件的时间，到期时间不晚于它加 max_wait
+        self._first_seen: dict[str, float] = {}
+        self._pending_event = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._running = False
+        # 事件回调中启动的后台扫描任务
+        self._scan_tasks: set[asyncio.Task] = set()
+        self._rescan_task: Optional[asyncio.Task] = None
+        self._rescan_again = False
+
+        # inotify 状态
+        self._inotify_fd: Optional[int] = None
+        self._libc = None
+        self._wd_targets: dict[int, tuple[str, WatchTarget]] = {}
+
+        # 轮询状态：路径 -> (mtime, size)
+        self._snapshot: dict[str, tuple[float, int]] = {}
+
+        # 统计
+        self.stats = {"events": 0, "indexed": 0, "removed": 0, "failed": 0}
+
+    @property
+    def mode(self) -> str:
+        """当前监视模式"""
+        return "inotify" if self._inotify_fd is not None else "polling"
+
+    @staticmethod
+    def _expand_targets(allowed_paths: list[str]) -> list[WatchTarget]:
+        """将白名单条目展开为监视目标
+
+        - 目录：递归监视
+        - glob 模式（如 /var/log/*.log）：监视模式所在目录（目录部分含通配符时按启动时的匹配结果展开）
+        - 单个文件：监视其所在目录，只匹配该文件名
+        """
+        targets = []
+        for entry in allowed_paths:
+            if any(ch in entry for ch in '*?['):
+                directory, pattern = os.path.split(entry)
+                for match in glob.glob(directory) if any(ch in directory for ch in '*?[') else [directory]:
+                    if os.path.isdir(match):
+                        targets.append(WatchTarget(directory=match, pattern=pattern, recursive=False))
+            elif os.path.isdir(entry):
+                targets.append(WatchTarget(directory=entry, pattern=None, recursive=True))
+            elif os.path.isfile(entry):
+                directory, name = os.path.split(entry)
+                targets.append(WatchTarget(directory=directory or ".", pattern=name, recursive=False))
+        return targets
+
+    def _matches(self, target: WatchTarget, path: str) -> bool:
+        """文件是否属于监视目标（临时文件和隐藏目录中的文件除外）"""
+        name = os.path.basename(path)
+        if any(fnmatch.fnmatch(name, pattern) for pattern in self.IGNORED_PATTERNS):
+            return False
+        if self._is_hidden_dir(target, os.path.dirname(path)):
+            return False
+        return target.pattern is None or fnmatch.fnmatch(name, target.pattern)
+
+    @staticmethod
+    def _is_hidden_dir(target: WatchTarget, directory: str) -> bool:
+        """目录相对监视目标是否位于隐藏目录中（如上传续传进度目录 .partial）"""
+        relative = os.path.relpath(directory, target.directory)
+        return any(part.startswith('.') and part not in ('.', '..') for part in Path(relative).parts)
+
+    @staticmethod
+    def _walk_dirs(directory: str):
+        """递归遍历目录（跳过隐藏目录），产出 (目录, 文件名列表)"""
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            yield root, files
+
+    async def start(self):
+        """启动监视（首次扫描 + 事件源 + 防抖 + 工作协程）"""
+        if self._running:
+            return
+        self._running = True
+
+        if self.use_inotify and self._init_inotify():
+            loop = asyncio.get_running_loop()
+            loop.add_reader(self._inotify_fd, self._read_inotify_events)
+            # 遍历目录树可能很慢，放到线程中执行
+            for target in self.targets:
+                await asyncio.to_thread(self._add_watch_tree, target.directory, target)
+        else:
+            self._tasks.append(asyncio.create_task(self._poll_loop()))
+
+        self._tasks.append(asyncio.create_task(self._debounce_loop()))
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+        # 首次扫描：已存在但尚未索引（或已变化）的文件也进入队列
+        for path in await asyncio.to_thread(self._scan_files):
+            self._schedule(path, delay=0)
+
+        logger.info(
+            f"[WATCH] 文件监视已启动：mode={self.mode} targets={len(self.targets)} "
+            f"debounce={self.debounce}s max_wait={self.max_wait}s workers={self.workers}"
+        )
+
+    async def stop(self):
+        """停止监视"""
+        if not self._running:
+            return
+        self._running = False
+
+        if self._inotify_fd is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._inotify_fd)
+            except Exception:
+                pass
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+            self._wd_targets.clear()
+
+        tasks = [*self._tasks, *self._scan_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._scan_tasks.clear()
+
+        logger.info(f"[WATCH] 文件监视已停止：{self.stats}")
+
+    # ===== 防抖与队列 =====
+
+    def _schedule(self, path: str, delay: Optional[float] = None):
+        """登记文件变化，重复事件推迟到期时间（但不超过首个事件后 max_wait）"""
+        self.stats["events"] += 1
+        now = asyncio.get_running_loop().time()
+        first_seen = self._first_seen.setdefault(path, now)
+        deadline = now + (self.debounce if delay is None else delay)
+        self._pending[path] = min(deadline, first_seen + self.max_wait)
+        self._pending_event.set()
+
+    async def _debounce_loop(self):
+        """把到期的文件放入待索引队列（队列满时阻塞，形成背压）"""
+        loop = asyncio.get_running_loop()
+        while self._running:
+            if not self._pending:
+                self._pending_event.clear()
+                await self._pending_event.wait()
+                continue
+
+            now = loop.time()
+            due = [path for path, deadline in self._pending.items() if deadline <= now]
+            for path in due:
+                # 等待期间可能又有新事件推迟了到期时间
+                if self._pending.get(path, now + 1) > loop.time():
+                    continue
+                del self._pending[path]
+                self._first_seen.pop(path, None)
+                await self.queue.put(path)
+
+            if self._pending:
+                next_deadline = min(self._pending.values())
+                await asyncio.sleep(max(0.05, next_deadline - loop.time()))
+
+    async def _worker(self):
+        """从队列取出文件并索引（文件已删除则清除其索引）"""
+        while True:
+            path = await self.queue.get()
+            try:
+                if os.path.isfile(path):
+                    success, msg = await self.index_manager.ensure_indexed(path)
+                    if success:
+                        self.stats["indexed"] += 1
+                        logger.debug(f"[WATCH] {msg}")
+                    else:
+                        self.stats["failed"] += 1
+                        logger.info(f"[WATCH] 索引跳过/失败: {msg}")
+                elif not os.path.exists(path):
+                    if self.index_manager.clear_index(path):
+                        self.stats["removed"] += 1
+                        logger.info(f"[WATCH] 文件已删除，清除索引: {path}")
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"[WATCH] 处理文件失败 {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    # ===== inotify =====
+
+    def _init_inotify(self) -> bool:
+        """初始化 inotify（不可用时返回 False）"""
+        if not sys.platform.startswith("linux"):
+            return False
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logger.info(f"[WATCH] inotify 不可用，使用轮询: {e}")
+            return False
+
+        if fd < 0:
+            logger.info(f"[WATCH] inotify 初始化失败，使用轮询: errno={ctypes.get_errno()}")
+            return False
+
+        self._libc = libc
+        self._inotify_fd = fd
+        return True
+
+    def _add_watch_tree(self, directory: str, target: WatchTarget) -> list[str]:
+        """为目录（递归目标则包括其子目录）添加 inotify 监视
+
+        会遍历整个目录树，应在线程中执行。
+
+        Returns:
+            这些目录中已有的匹配文件
+        """
+        if self._is_hidden_dir(target, directory):
+            return []
+
+        walk = self._walk_dirs(directory) if target.recursive else [(directory, [])]
+        files = []
+        for path, names in walk:
+            fd = self._inotify_fd
+            if fd is None:
+                # 监视已停止
+                break
+            wd = self._libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                logger.warning(f"[WATCH] 无法监视目录 {path}: errno={ctypes.get_errno()}")
+                continue
+            self._wd_targets[wd] = (path, target)
+            files.extend(
+                child for child in (os.path.join(path, name) for name in names)
+                if self._matches(target, child)
+            )
+        return files
+
+    def _spawn_scan(self, coro):
+        """在后台运行事件回调触发的扫描（stop 时取消）"""
+        task = asyncio.create_task(coro)
+        self._scan_tasks.add(task)
+        task.add_done_callback(self._scan_tasks.discard)
+        return task
+
+    async def _watch_new_directory(self, directory: str, target: WatchTarget):
+        """监视新建/移入的子目录，并登记其中已有的文件"""
+        try:
+            files = await asyncio.to_thread(self._add_watch_tree, directory, target)
+        except Exception as e:
+            logger.warning(f"[WATCH] 监视新目录失败 {directory}: {e}")
+            return
+        for path in files:
+            self._schedule(path)
+
+    async def _rescan(self):
+        """inotify 溢出后重新扫描全部目标（扫描期间再次溢出则再扫一遍）"""
+        while self._running:
+            self._rescan_again = False
+            try:
+                files = await asyncio.to_thread(self._scan_files)
+            except Exception as e:
+                logger.warning(f"[WATCH] 重新扫描失败: {e}")
+                return
+            for path in files:
+                self._schedule(path)
+            if not self._rescan_again:
+                return
+
+    def _read_inotify_events(self):
+        """读取并分发 inotify 事件（事件循环回调）"""
+        try:
+            data = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            logger.warning(f"[WATCH] 读取 inotify 事件失败: {e}")
+            return
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，可能丢失事件：重新扫描全部目标
+                logger.warning("[WATCH] inotify 事件溢出，重新扫描")
+                if self._rescan_task is None or self._rescan_task.done():
+                    self._rescan_task = self._spawn_scan(self._rescan())
+                else:
+                    self._rescan_again = True
+                continue
+
+            if mask & IN_IGNORED:
+                self._wd_targets.pop(wd, None)
+                continue
+
+            watched = self._wd_targets.get(wd)
+            if watched is None or not name:
+                continue
+            directory, target = watched
+            path = os.path.join(directory, name)
+
+            if mask & IN_ISDIR:
+                # 递归目标中新建/移入的子目录：补充监视并扫描已有文件
+                if target.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._spawn_scan(self._watch_new_directory(path, target))
+                continue
+
+            if self._matches(target, path):
+                self._schedule(path)
+
+    # ===== 轮询 =====
+
+    def _scan_files(self) -> dict[str, tuple[float, int]]:
+        """扫描所有监视目标，返回 {路径: (mtime, size)}"""
+        files = {}
+        for target in self.targets:
+            if target.recursive:
+                candidates = (
+                    os.path.join(root, name)
+                    for root, names in self._walk_dirs(target.directory)
+                    for name in names
+                )
+            else:
+                candidates = (str(p) for p in Path(target.directory).glob(target.pattern or '*'))
+
+            for path in candidates:
+                try:
+                    if not self._matches(target, path) or not os.path.isfile(path):
+                        continue
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (stat.st_mtime, stat.st_size)
+        return files
+
+    async def _poll_loop(self):
+        """轮询模式：周期性比较文件快照"""
+        self._snapshot = await asyncio.to_thread(self._scan_files)
+        while self._running:
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(self._scan_files)
+
+            for path, state in current.items():
+                if self._snapshot.get(path) != state:
+                    self._schedule(path)
+            for path in self._snapshot.keys() - current.keys():
+                self._schedule(path)
+
+            self._snapshot = current
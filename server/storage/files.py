@@ -5,8 +5,13 @@
 遵循章程：数据持久化到 storage/uploads/ 目录，文件大小限制 10MB
 """
 
+import hashlib
 import json
 import os
+import re
+import shutil
+import threading
+import time
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
@@ -23,6 +28,7 @@ class UploadedFile:
     storage_path: str     # 存储路径
     uploaded_at: datetime # 上传时间
     vector_index_id: Optional[str] = None  # 关联的向量索引 ID
+    sha256: Optional[str] = None  # 文件内容哈希（流式上传时计算）
 
     MAX_SIZE = 10 * 1024 * 1024  # 10MB
 
@@ -107,7 +113,8 @@ class UploadedFile:
             "content_type": self.content_type,
             "storage_path": self.storage_path,
             "uploaded_at": self.uploaded_at.isoformat(),
-            "vector_index_id": self.vector_index_id
+            "vector_index_id": self.vector_index_id,
+            "sha256": self.sha256
         }
 
         with open(metadata_path, 'w', encoding='utf-8') as f:
@@ -139,7 +146,8 @@ class UploadedFile:
             content_type=data["content_type"],
             storage_path=data["storage_path"],
             uploaded_at=datetime.fromisoformat(data["uploaded_at"]),
-            vector_index_id=data.get("vector_index_id")
+            vector_index_id=data.get("vector_index_id"),
+            sha256=data.get("sha256")
         )
 
     @classmethod
@@ -188,7 +196,6 @@ class UploadedFile:
 
         # 复制文件到存储目录
         target_path = os.path.join(target_dir, filename)
-        import shutil
         shutil.copy2(file_path, target_path)
 
         # 更新 storage_path
@@ -277,3 +284,287 @@ class UploadedFile:
         dir_path = os.path.join(storage_dir, self.file_id)
         if os.path.exists(dir_path) and not os.listdir(dir_path):
             os.rmdir(dir_path)
+
+
+class UploadWriter:
+    """流式上传写入器
+
+    分块到达的数据直接追加写入 storage/uploads/<file_id>/<filename>.part，同时计算 SHA-256，
+    接收完成后 fsync 并原子重命名为正式文件名。内存占用只与单个分块有关。
+
+    可续传上传（客户端提供 upload_id）：已接收的字节区间定期落盘到
+    storage/uploads/.partial/<upload_id>.json，连接断开时保留临时文件；
+    客户端重连后以相同 upload_id 重新发送元数据即可从已接收的偏移继续。
+    上传按顺序写入，已接收区间始终是 [0, received)。
+    不可续传的上传在中途失败或断开时直接删除临时文件。
+    """
+
+    TEMP_SUFFIX = ".part"
+    PARTIAL_DIR = ".partial"
+    CHECKPOINT_BYTES = 1024 * 1024      # 每接收 1MB 落盘一次进度
+    PARTIAL_TTL = 24 * 60 * 60          # 未完成上传的保留时间（秒）
+    UPLOAD_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+    def __init__(
+        self,
+        filename: str,
+        size: int,
+        storage_dir: str = "storage/uploads",
+        upload_id: Optional[str] = None,
+        sha256: Optional[str] = None
+    ):
+        """创建（或恢复）上传临时文件
+
+        Args:
+            filename: 原始文件名
+            size: 声明的文件大小（字节）
+            storage_dir: 存储目录
+            upload_id: 客户端生成的上传 ID（提供时可续传）
+            sha256: 客户端声明的整个文件的 SHA-256（提供时完成后校验）
+
+        Raises:
+            ValueError: 文件名、大小或上传 ID 验证失败
+        """
+        if upload_id is not None and not self.UPLOAD_ID_PATTERN.fullmatch(upload_id):
+            raise ValueError(f"上传 ID 非法: {upload_id}")
+
+        self.storage_dir = storage_dir
+        self.upload_id = upload_id
+        self.expected_sha256 = sha256.lower() if sha256 else None
+        self.file = UploadedFile(
+            file_id=str(uuid.uuid4()),
+            filename=filename,
+            size=size,
+            content_type='text/plain',
+            storage_path="",  # 完成后设置
+            uploaded_at=datetime.now()
+        )
+
+        # 接收数据前先验证，避免写入超限或路径非法的文件
+        is_valid, error_msg = self.file.validate()
+        if not is_valid:
+            raise ValueError(f"文件验证失败：{error_msg}")
+
+        self.expected_size = size
+        self.received_size = 0
+        self._hash = hashlib.sha256()
+        self._checkpointed = 0
+        self._checkpoint_lock = threading.Lock()  # checkpoint 可能在工作线程中执行
+
+        state = self._load_state()
+        if state is not None:
+            self.file.file_id = state["file_id"]
+        self._set_paths()
+
+        if state is not None and os.path.exists(self.temp_path):
+            self._resume(state["received"])
+        else:
+            os.makedirs(self.target_dir, exist_ok=True)
+            self._fp = open(self.temp_path, 'wb')
+            if self.resumable:
+                self.checkpoint()
+
+    @property
+    def resumable(self) -> bool:
+        """是否为可续传上传"""
+        return self.upload_id is not None
+
+    @property
+    def checkpoint_due(self) -> bool:
+        """是否需要落盘进度（可续传上传每接收 CHECKPOINT_BYTES 落盘一次）"""
+        return self.resumable and self.received_size - self._checkpointed >= self.CHECKPOINT_BYTES
+
+    @property
+    def complete(self) -> bool:
+        """是否已收到声明大小的全部数据"""
+        return self.received_size >= self.expected_size
+
+    def _set_paths(self):
+        """根据 file_id 计算目标路径"""
+        self.target_dir = os.path.join(self.storage_dir, self.file.file_id)
+        self.target_path = os.path.join(self.target_dir, self.file.filename)
+        self.temp_path = self.target_path + self.TEMP_SUFFIX
+
+    @classmethod
+    def _state_path(cls, storage_dir: str, upload_id: str) -> str:
+        """续传进度文件路径"""
+        return os.path.join(storage_dir, cls.PARTIAL_DIR, f"{upload_id}.json")
+
+    def _load_state(self) -> Optional[dict]:
+        """读取与本次元数据一致的续传进度（不一致时视为新上传）"""
+        if not self.resumable:
+            return None
+
+        try:
+            with open(self._state_path(self.storage_dir, self.upload_id), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if (state.get("filename") != self.file.filename
+                or state.get("size") != self.expected_size
+                or state.get("sha256") != self.expected_sha256):
+            return None
+        return state
+
+    def _resume(self, received: int):
+        """从已落盘的偏移恢复：截断未确认的尾部并重新计算前缀哈希"""
+        self._fp = open(self.temp_path, 'r+b')
+        received = min(received, os.fstat(self._fp.fileno()).st_size, self.expected_size)
+        self._fp.truncate(received)
+
+        while self._fp.tell() < received:
+            block = self._fp.read(min(1024 * 1024, received - self._fp.tell()))
+            if not block:
+                break
+            self._hash.update(block)
+
+        self.received_size = self._fp.tell()
+        self._checkpointed = self.received_size
+
+    def write(self, chunk: bytes) -> int:
+        """写入一个分块（超出声明大小的部分被丢弃）
+
+        不做 fsync：调用方在 checkpoint_due 时于工作线程中调用 checkpoint()，避免阻塞事件循环。
+
+        Args:
+            chunk: 数据分块
+
+        Returns:
+            实际写入的字节数
+        """
+        remaining = self.expected_size - self.received_size
+        if len(chunk) > remaining:
+            chunk = memoryview(chunk)[:remaining]
+
+        self._fp.write(chunk)
+        self._hash.update(chunk)
+        self.received_size += len(chunk)
+        return len(chunk)
+
+    def checkpoint(self):
+        """落盘已接收的数据和进度（先 fsync 数据，再原子替换进度文件）"""
+        with self._checkpoint_lock:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        """checkpoint 的实现（调用方持有锁）"""
+        received = self.received_size
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+
+        state_path = self._state_path(self.storage_dir, self.upload_id)
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        state = {
+            "upload_id": self.upload_id,
+            "file_id": self.file.file_id,
+            "filename": self.file.filename,
+            "size": self.expected_size,
+            "sha256": self.expected_sha256,
+            "received": received,
+            "updated_at": datetime.now().isoformat()
+        }
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+        self._checkpointed = received
+
+    def finish(self) -> UploadedFile:
+        """落盘并原子重命名为正式文件
+
+        Returns:
+            UploadedFile 实例（已保存元数据）
+
+        Raises:
+            ValueError: 数据不完整或哈希不一致
+        """
+        if not self.complete:
+            self.abort()
+            raise ValueError(f"文件数据不完整（{self.received_size}/{self.expected_size} 字节）")
+
+        digest = self._hash.hexdigest()
+        if self.expected_sha256 and digest != self.expected_sha256:
+            self.abort()
+            raise ValueError(f"文件哈希不一致（期望 {self.expected_sha256[:16]}…，实际 {digest[:16]}…）")
+
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._fp.close()
+        os.replace(self.temp_path, self.target_path)
+        self._remove_state()
+
+        self.file.size = self.received_size
+        self.file.storage_path = self.target_path
+        self.file.sha256 = digest
+        self.file.save_metadata(self.storage_dir)
+        return self.file
+
+    def suspend(self):
+        """连接断开：可续传上传保留已接收的数据，否则放弃"""
+        if not self.resumable:
+            self.abort()
+            return
+        if not self._fp.closed:
+            self.checkpoint()
+            self._fp.close()
+
+    def abort(self):
+        """放弃上传，删除临时文件、续传进度和空目录"""
+        if not self._fp.closed:
+            self._fp.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        if os.path.isdir(self.target_dir) and not os.listdir(self.target_dir):
+            os.rmdir(self.target_dir)
+        self._remove_state()
+
+    def _remove_state(self):
+        """删除续传进度文件"""
+        if self.resumable:
+            try:
+                os.remove(self._state_path(self.storage_dir, self.upload_id))
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def cleanup_stale(cls, storage_dir: str = "storage/uploads", max_age: float = None) -> int:
+        """清理超过保留时间仍未完成的上传
+
+        Args:
+            storage_dir: 存储目录
+            max_age: 保留时间（秒），默认 PARTIAL_TTL
+
+        Returns:
+            清理的上传数
+        """
+        if max_age is None:
+            max_age = cls.PARTIAL_TTL
+
+        partial_dir = os.path.join(storage_dir, cls.PARTIAL_DIR)
+        try:
+            entries = os.listdir(partial_dir)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        now = time.time()
+        for entry in entries:
+            state_path = os.path.join(partial_dir, entry)
+            try:
+                if now - os.path.getmtime(state_path) < max_age:
+                    continue
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            target_dir = os.path.join(storage_dir, state.get("file_id", ""))
+            temp_path = os.path.join(target_dir, state.get("filename", "") + cls.TEMP_SUFFIX)
+            if state.get("file_id") and os.path.exists(temp_path):
+                os.remove(temp_path)
+                if not os.listdir(target_dir):
+                    os.rmdir(target_dir)
+            os.remove(state_path)
+            removed += 1
+        return removed
@@ -6,11 +6,18 @@
 
 import asyncio
 import hashlib
+import logging
+import os
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+from server.llm.models import EMBED_MODEL
 from shared.utils.path_validator import PathValidator
+from .embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
 
 
 class IndexManager:
@@ -29,10 +36,38 @@ class IndexManager:
         self.llm_provider = llm_provider
         self.path_validator = path_validator
         self.config = config
-        self._index_lock = asyncio.Lock()
+
+        # 每个文件一把锁：同一文件不会重复索引，不同文件可以并发索引
+        # 锁按使用者计数，无人持有或等待时移除，长期运行时不随文件数增长
+        self._file_locks: dict[str, asyncio.Lock] = {}
+        self._file_lock_users: dict[str, int] = {}
+
+        # 嵌入流水线：按批次拆分请求，跨文件共享并发上限
+        self.embed_batch_size = config.embed_batch_size
+        self.embed_concurrency = config.embed_concurrency
+        self.embed_max_retries = config.embed_max_retries
+        self._embed_semaphore = asyncio.Semaphore(self.embed_concurrency)
+
+        # 内容寻址的嵌入缓存：相同文本（同一模型）只嵌入一次
+        self.embed_model = EMBED_MODEL
+        self.embed_cache: Optional[EmbeddingCache] = None
+        if config.embed_cache_enabled:
+            self.embed_cache = EmbeddingCache(
+                db_path=os.path.join(vector_store.storage_dir, "embed_cache.sqlite3"),
+                max_entries=config.embed_cache_max_entries
+            )
+
+        # 嵌入统计
+        self.embed_stats = {
+            "chunks": 0,        # 已嵌入的分块数
+            "batches": 0,       # 成功的批次数
+            "retries": 0,       # 重试次数
+            "failures": 0,      # 最终失败的批次数
+            "seconds": 0.0      # 嵌入请求累计耗时（墙钟，按文件计）
+        }
 
     async def ensure_indexed(self, file_path: str) -> tuple[bool, str]:
-        """确保文件已索引，如果未索引则自动创建索引
+        """确保文件已索引且为最新，未索引则创建索引，已变化则增量更新
 
         Args:
             file_path: 文件路径
@@ -48,20 +83,53 @@ class IndexManager:
         # 2. 生成文件唯一标识（基于路径的 hash）
         file_id = self._generate_file_id(file_path)
 
-        # 3. 检查是否已索引
-        if file_id in self.vector_store.list_files():
+        # 3. 检查是否已索引且未变化（只比较 mtime/size，不读取文件）
+        entry = self.vector_store.get_manifest(file_id)
+        if entry and self._is_up_to_date(file_path, entry.source_info):
             return True, f"文件已索引: {file_path}"
 
-        # 4. 创建索引
-        async with self._index_lock:
-            # 双重检查（防止并发重复索引）
-            if file_id in self.vector_store.list_files():
-                return True, f"文件已索引: {file_path}"
+        # 4. 创建或更新索引
+        lock = self._file_locks.setdefault(file_id, asyncio.Lock())
+        self._file_lock_users[file_id] = self._file_lock_users.get(file_id, 0) + 1
+        try:
+            async with lock:
+                # 双重检查（防止并发重复索引）
+                entry = self.vector_store.get_manifest(file_id)
+                if entry and self._is_up_to_date(file_path, entry.source_info):
+                    return True, f"文件已索引: {file_path}"
+
+                try:
+                    # 懒加载模式下可能需要从磁盘加载原有索引
+                    previous = await asyncio.to_thread(self.vector_store.get_index, file_id) if entry else None
+                    return await self._create_index(file_path, file_id, previous)
+                except Exception as e:
+                    return False, f"索引创建失败: {str(e)}"
+        finally:
+            self._file_lock_users[file_id] -= 1
+            if self._file_lock_users[file_id] == 0:
+                del self._file_lock_users[file_id]
+                del self._file_locks[file_id]
+
+    @staticmethod
+    def _is_up_to_date(file_path: str, source_info: dict) -> bool:
+        """根据 mtime 和 size 判断索引是否为最新
 
-            try:
-                return await self._create_index(file_path, file_id)
-            except Exception as e:
-                return False, f"索引创建失败: {str(e)}"
+        Args:
+            file_path: 文件路径
+            source_info: 索引记录的源文件状态
+
+        Returns:
+            是否为最新（文件已不存在时沿用现有索引）
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return True
+
+        return (
+            source_info.get("size") == stat.st_size and
+            source_info.get("mtime") == stat.st_mtime
+        )
 
     def _generate_file_id(self, file_path: str) -> str:
         """基于文件路径生成唯一标识
@@ -76,44 +144,160 @@ class IndexManager:
         normalized_path = str(Path(file_path).resolve())
         return hashlib.sha256(normalized_path.encode()).hexdigest()[:32]
 
-    async def _create_index(self, file_path: str, file_id: str) -> tuple[bool, str]:
-        """为文件创建向量索引
+    # 用于识别追加写入的末尾指纹长度（字节）
+    TAIL_FINGERPRINT_SIZE = 4096
+
+    @classmethod
+    def _tail_hash(cls, f, size: int) -> str:
+        """计算文件前 size 字节中末尾一段的 SHA256
+
+        Args:
+            f: 以二进制方式打开的文件
+            size: 截止位置
+
+        Returns:
+            十六进制摘要
+        """
+        f.seek(max(0, size - cls.TAIL_FINGERPRINT_SIZE))
+        return hashlib.sha256(f.read(min(size, cls.TAIL_FINGERPRINT_SIZE))).hexdigest()
+
+    def _is_append(self, f, size: int, source_info: dict) -> bool:
+        """判断文件自上次索引后是否只发生了追加写入
+
+        Args:
+            f: 以二进制方式打开的文件
+            size: 当前文件大小
+            source_info: 索引记录的源文件状态
+
+        Returns:
+            是否为追加写入
+        """
+        if "resume_offset" not in source_info or not source_info.get("tail_hash"):
+            return False
+
+        old_size = source_info.get("size", 0)
+        if size <= old_size:
+            return False
+
+        # 原末尾指纹不变，视为只在末尾追加了内容
+        return self._tail_hash(f, old_size) == source_info["tail_hash"]
+
+    def _read_source(self, file_path: str, previous=None) -> dict:
+        """读取待索引的文件内容（追加写入时只读取末尾）
+
+        阻塞调用，在线程中执行。
+
+        Args:
+            file_path: 文件路径
+            previous: 现有的向量索引（None 表示首次索引）
+
+        Returns:
+            {content, size, mtime, base_offset, kept_chunks, content_hash, tail_hash}
+        """
+        source_info = previous.source_info if previous else {}
+
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            mtime = os.fstat(f.fileno()).st_mtime
+
+            if previous and self._is_append(f, size, source_info):
+                base_offset = source_info["resume_offset"]
+                kept_chunks = previous.chunks[:-1]
+                content_hash = ""
+                f.seek(base_offset)
+                data = f.read(size - base_offset)
+            else:
+                base_offset = 0
+                kept_chunks = []
+                data = f.read(size)
+                content_hash = hashlib.sha256(data).hexdigest()
+
+            tail_hash = self._tail_hash(f, size)
+
+        return {
+            "content": data.decode('utf-8'),
+            "size": size,
+            "mtime": mtime,
+            "base_offset": base_offset,
+            "kept_chunks": kept_chunks,
+            "content_hash": content_hash,
+            "tail_hash": tail_hash
+        }
+
+    async def _create_index(self, file_path: str, file_id: str, previous=None) -> tuple[bool, str]:
+        """为文件创建（或增量更新）向量索引
+
+        已有索引时：
+        - 内容哈希未变化：只更新记录的 mtime/size
+        - 只在末尾追加：只读取并重新分块最后一个分块起始位置之后的内容
+        - 其他修改：重新分块全文
+        内容未变化的分块直接复用原有向量，只为新的分块计算嵌入。
 
         Args:
             file_path: 文件路径
             file_id: 文件 ID
+            previous: 现有的向量索引（None 表示首次索引）
 
         Returns:
             (是否成功, 消息)
         """
         from .vector_store import VectorIndex
 
-        # 1. 读取文件内容
+        source_info = previous.source_info if previous else {}
+
+        # 1. 读取文件内容（磁盘读取和哈希计算放到线程中，不阻塞事件循环）
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            source = await asyncio.to_thread(self._read_source, file_path, previous)
         except Exception as e:
             return False, f"读取文件失败: {str(e)}"
 
+        content = source["content"]
+        size, mtime = source["size"], source["mtime"]
+        base_offset, kept_chunks = source["base_offset"], source["kept_chunks"]
+        content_hash, tail_hash = source["content_hash"], source["tail_hash"]
+
         # 2. 验证内容类型
         if not self.path_validator.validate_content_type(file_path):
             return False, f"不支持的文件类型（仅支持文本文件）: {file_path}"
 
+        # 内容未变化（如仅 touch），只更新记录的文件状态
+        if previous and content_hash and content_hash == source_info.get("hash"):
+            await asyncio.to_thread(
+                self.vector_store.update_source_info, file_id, {**source_info, "mtime": mtime, "size": size}
+            )
+            return True, f"文件内容未变化: {file_path}"
+
         # 3. 文本分块
-        chunks = self.vector_store.chunk_text(
+        pieces = self.vector_store.chunk_text_with_offsets(
             content,
             chunk_size=self.config.chunk_size,
             overlap=self.config.chunk_overlap
         )
+        chunks = kept_chunks + [chunk for _, chunk in pieces]
 
         if not chunks:
             return False, f"文件内容为空或分块失败: {file_path}"
 
-        # 4. 计算嵌入向量
+        # 下次追加时从最后一个分块的起始位置重新分块
+        resume_offset = base_offset + len(content[:pieces[-1][0]].encode('utf-8')) if pieces else base_offset
+
+        # 4. 计算嵌入向量：复用未变化分块的向量，其余分批并发计算
+        reusable = {}
+        if previous:
+            for chunk, embedding in zip(previous.chunks, previous.embeddings):
+                reusable.setdefault(chunk, embedding)
+        new_chunks = [chunk for chunk in chunks if chunk not in reusable]
+
+        embed_start = time.time()
         try:
-            embeddings = await self.llm_provider.embed(chunks)
+            computed = dict(zip(new_chunks, await self._embed_chunks(new_chunks))) if new_chunks else {}
         except Exception as e:
             return False, f"嵌入向量计算失败: {str(e)}"
+        embed_duration = time.time() - embed_start
+        self.embed_stats["seconds"] += embed_duration
+        throughput = len(new_chunks) / embed_duration if embed_duration > 0 else 0.0
+
+        embeddings = [reusable[chunk] if chunk in reusable else computed[chunk] for chunk in chunks]
 
         # 5. 创建向量索引
         index = VectorIndex(
@@ -130,13 +314,117 @@ class IndexManager:
                 }
                 for i in range(len(chunks))
             ],
-            created_at=datetime.now()
+            created_at=datetime.now(),
+            source_info={
+                "mtime": mtime,
+                "size": size,
+                "hash": content_hash,
+                "tail_hash": tail_hash,
+                "resume_offset": resume_offset
+            }
+        )
+
+        # 6. 保存索引（替换原有索引），写盘放到线程中
+        await asyncio.to_thread(self.vector_store.add_index, index)
+
+        logger.info(
+            f"[INDEX] file={file_path} chunks={len(chunks)} embedded={len(new_chunks)} "
+            f"reused={len(chunks) - len(new_chunks)} incremental={bool(kept_chunks)} "
+            f"duration={embed_duration:.2f}s throughput={throughput:.1f} chunks/s"
         )
+        if previous:
+            return True, (
+                f"索引更新成功: {file_path} ({len(chunks)} 个分块, "
+                f"重新嵌入 {len(new_chunks)} 个, {throughput:.1f} 分块/秒)"
+            )
+        return True, f"索引创建成功: {file_path} ({len(chunks)} 个分块, {throughput:.1f} 分块/秒)"
 
-        # 6. 保存索引
-        self.vector_store.add_index(index)
+    async def _embed_chunks(self, chunks: list[str]) -> list[list[float]]:
+        """按 Provider 批次上限拆分分块并发计算嵌入向量
 
-        return True, f"索引创建成功: {file_path} ({len(chunks)} 个分块)"
+        先查嵌入缓存，只为未命中且去重后的文本调用 Provider。
+
+        Args:
+            chunks: 文本分块
+
+        Returns:
+            与 chunks 一一对应的嵌入向量列表
+        """
+        # 缓存读写为 SQLite 同步调用，放到线程中执行，不阻塞事件循环
+        if self.embed_cache:
+            embeddings = await asyncio.to_thread(self.embed_cache.get_many, self.embed_model, chunks)
+        else:
+            embeddings = [None] * len(chunks)
+
+        # 未命中的文本去重（同一文件中重复的样板内容只嵌入一次）
+        missing = list(dict.fromkeys(chunk for chunk, emb in zip(chunks, embeddings) if emb is None))
+
+        if missing:
+            batch_size = max(1, self.embed_batch_size)
+            batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+
+            # 等待全部批次结束：某个批次最终失败时，已成功的批次仍写入缓存，重新索引时不必再次请求
+            results = await asyncio.gather(
+                *(self._embed_batch(batch) for batch in batches),
+                return_exceptions=True
+            )
+
+            computed = {}
+            error = None
+            for batch, batch_embeddings in zip(batches, results):
+                if isinstance(batch_embeddings, BaseException):
+                    error = error or batch_embeddings
+                    continue
+                computed.update(zip(batch, batch_embeddings))
+
+            # 成功的批次在一个事务中写入缓存
+            if self.embed_cache and computed:
+                await asyncio.to_thread(
+                    self.embed_cache.put_many, self.embed_model, list(computed), list(computed.values())
+                )
+            if error is not None:
+                raise error
+
+            embeddings = [
+                emb if emb is not None else computed[chunk]
+                for chunk, emb in zip(chunks, embeddings)
+            ]
+
+        return embeddings
+
+    async def _embed_batch(self, batch: list[str]) -> list[list[float]]:
+        """计算单个批次的嵌入向量，失败时只重试该批次（指数退避）
+
+        Args:
+            batch: 一个批次的文本分块
+
+        Returns:
+            嵌入向量列表
+        """
+        for attempt in range(self.embed_max_retries + 1):
+            try:
+                async with self._embed_semaphore:
+                    embeddings = await self.llm_provider.embed(batch)
+
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"嵌入向量数量不匹配：{len(embeddings)} != {len(batch)}")
+
+                self.embed_stats["chunks"] += len(batch)
+                self.embed_stats["batches"] += 1
+                return embeddings
+
+            except Exception as e:
+                if attempt >= self.embed_max_retries:
+                    self.embed_stats["failures"] += 1
+                    raise
+
+                self.embed_stats["retries"] += 1
+                delay = 0.5 * (2 ** attempt)
+                logger.warning(
+                    f"[INDEX] 嵌入批次失败（{len(batch)} 个分块），{delay:.1f}s 后重试 "
+                    f"({attempt + 1}/{self.embed_max_retries}): {e}"
+                )
+                await asyncio.sleep(delay)
 
     async def batch_index(self, directory: str, pattern: str = "*") -> dict[str, tuple[bool, str]]:
         """批量索引目录中的文件
@@ -150,14 +438,40 @@ class IndexManager:
         """
         import glob
 
-        results = {}
         glob_pattern = str(Path(directory) / pattern)
-        files = glob.glob(glob_pattern, recursive=True)
-
-        for file_path in files:
-            if Path(file_path).is_file():
-                success, msg = await self.ensure_indexed(file_path)
-                results[file_path] = (success, msg)
+        files = [f for f in glob.glob(glob_pattern, recursive=True) if Path(f).is_file()]
+
+        # 文件级并发略高于请求并发，使读取/分块与嵌入请求重叠；
+        # 实际的 API 并发由 _embed_semaphore 限制
+        file_semaphore = asyncio.Semaphore(max(1, self.embed_concurrency * 2))
+
+        async def index_one(file_path: str) -> tuple[bool, str]:
+            async with file_semaphore:
+                return await self.ensure_indexed(file_path)
+
+        start_time = time.time()
+        start_chunks = self.embed_stats["chunks"]
+
+        outcomes = await asyncio.gather(*(index_one(f) for f in files))
+        results = dict(zip(files, outcomes))
+
+        # 全局 ANN 索引在整批完成后保存一次
+        await asyncio.to_thread(self.vector_store.flush)
+
+        duration = time.time() - start_time
+        chunks = self.embed_stats["chunks"] - start_chunks
+        throughput = chunks / duration if duration > 0 else 0.0
+        cache_info = ""
+        if self.embed_cache:
+            cache_stats = await asyncio.to_thread(self.embed_cache.stats)
+            cache_info = (
+                f" cache_hits={cache_stats['hits']} cache_misses={cache_stats['misses']} "
+                f"cache_hit_rate={cache_stats['hit_rate']:.1%}"
+            )
+        logger.info(
+            f"[INDEX] batch directory={directory} files={len(files)} chunks={chunks} "
+            f"duration={duration:.2f}s throughput={throughput:.1f} chunks/s{cache_info}"
+        )
 
         return results
 
@@ -220,12 +534,14 @@ class IndexManager:
             状态信息字典
         """
         file_id = self._generate_file_id(file_path)
-        indexed = file_id in self.vector_store.list_files()
+        entry = self.vector_store.get_manifest(file_id)
+        indexed = entry is not None
 
         status = {
             "file_path": file_path,
             "file_id": file_id,
             "indexed": indexed,
+            "up_to_date": indexed and self._is_up_to_date(file_path, entry.source_info),
             "allowed": False
         }
 
@@ -234,12 +550,10 @@ class IndexManager:
         status["allowed"] = allowed
 
         if indexed:
-            index = self.vector_store.get_index(file_id)
-            if index:
-                status.update({
-                    "chunks_count": len(index.chunks),
-                    "created_at": index.created_at.isoformat()
-                })
+            status.update({
+                "chunks_count": entry.chunk_count,
+                "created_at": entry.created_at.isoformat()
+            })
 
         return status
 
@@ -5,15 +5,21 @@
 遵循章程：数据持久化到 storage/vectors/ 目录
 """
 
+import heapq
 import json
 import os
+import sys
+import threading
 import uuid
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List
 
 import numpy as np
 
+from .ann_index import ANNIndex
+
 
 @dataclass
 class SearchResult:
@@ -23,21 +29,69 @@ class SearchResult:
     metadata: dict          # 元数据（文件名、位置等）
 
 
+@dataclass
+class IndexManifest:
+    """向量索引清单项（常驻内存的轻量信息，不含分块和向量）"""
+    file_id: str            # 文件唯一标识
+    filename: str           # 文件名
+    filepath: str           # 文件路径
+    chunk_count: int        # 分块数
+    created_at: datetime    # 创建时间
+    source_info: dict = field(default_factory=dict)  # 源文件状态（见 VectorIndex.source_info）
+
+
 @dataclass
 class VectorIndex:
     """向量索引"""
     file_id: str                    # 文件唯一标识
     filename: str                   # 文件名
     chunks: List[str]               # 文本分块
-    embeddings: List[List[float]]   # 嵌入向量
+    embeddings: np.ndarray          # 嵌入矩阵 (n_chunks, dim)，float32，行已 L2 归一化
     chunk_metadata: List[dict]      # 分块元数据
     created_at: datetime            # 创建时间
+    source_info: dict = field(default_factory=dict)  # 源文件状态（用于增量索引）
+    # {
+    #     "mtime": 1735603200.0,      # 索引时的修改时间
+    #     "size": 1024,               # 索引时的字节数
+    #     "hash": "sha256...",        # 全文 SHA256（追加索引后未知，为空串）
+    #     "tail_hash": "sha256...",   # 末尾 4KB 的 SHA256（用于识别追加写入）
+    #     "resume_offset": 512,       # 最后一个分块在文件中的起始字节偏移
+    # }
+
+    # 相似度阈值（低于此值的结果被过滤）
+    SIMILARITY_THRESHOLD = 0.3
 
     def __post_init__(self):
         """初始化验证"""
-        # 确保 embeddings 是 numpy 数组
-        if self.embeddings and not isinstance(self.embeddings[0], np.ndarray):
-            self.embeddings = [np.array(emb) for emb in self.embeddings]
+        # 二进制格式中保存的矩阵已归一化，内存映射直接使用，不读入内存
+        if isinstance(self.embeddings, np.memmap):
+            return
+
+        # 将嵌入向量整理为连续的 float32 矩阵，并预先归一化
+        # 检索时余弦相似度即退化为一次矩阵-向量乘法
+        self.embeddings = self.normalize_matrix(self.embeddings)
+
+    @staticmethod
+    def normalize_matrix(embeddings) -> np.ndarray:
+        """转换为按行 L2 归一化的连续 float32 矩阵
+
+        Args:
+            embeddings: 嵌入向量（列表或数组）
+
+        Returns:
+            形状为 (n, dim) 的 float32 矩阵
+        """
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.size == 0:
+            return matrix.reshape(0, matrix.shape[-1] if matrix.ndim == 2 else 0)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # 零向量保持为零，避免除零
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        return matrix
 
     def search(self, query_embedding: List[float], top_k: int = 3) -> List[SearchResult]:
         """向量检索
@@ -49,31 +103,26 @@ class VectorIndex:
         Returns:
             检索结果列表
         """
-        if not self.embeddings:
+        if len(self.embeddings) == 0 or top_k <= 0:
             return []
 
-        query_emb = np.array(query_embedding)
-
-        # 计算余弦相似度
-        similarities = []
-        for emb in self.embeddings:
-            emb_array = np.array(emb)
-            # 余弦相似度 = (A · B) / (||A|| * ||B||)
-            similarity = np.dot(query_emb, emb_array) / (
-                np.linalg.norm(query_emb) * np.linalg.norm(emb_array)
-            )
-            similarities.append(similarity)
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
 
-        similarities = np.array(similarities)
+        # 行向量已归一化：余弦相似度 = E · (q / ||q||)
+        similarities = self.embeddings @ (query / query_norm)
 
-        # 获取 top_k 索引（按相似度降序）
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # argpartition 取 top_k（O(n)），再对这 k 个结果排序
+        k = min(top_k, len(similarities))
+        top_indices = np.argpartition(similarities, -k)[-k:]
+        top_indices = top_indices[np.argsort(similarities[top_indices])[::-1]]
 
         # 过滤低于阈值的结果
-        threshold = 0.3
         results = []
         for i in top_indices:
-            if similarities[i] >= threshold:
+            if similarities[i] >= self.SIMILARITY_THRESHOLD:
                 results.append(SearchResult(
                     chunk=self.chunks[i],
                     similarity=float(similarities[i]),
@@ -82,33 +131,131 @@ class VectorIndex:
 
         return results
 
+    @property
+    def filepath(self) -> str:
+        """源文件路径（取自第一个分块的元数据）"""
+        return self.chunk_metadata[0].get('filepath', '') if self.chunk_metadata else ''
+
+    def manifest(self) -> IndexManifest:
+        """生成清单项"""
+        return IndexManifest(
+            file_id=self.file_id,
+            filename=self.filename,
+            filepath=self.filepath,
+            chunk_count=len(self.chunks),
+            created_at=self.created_at,
+            source_info=self.source_info
+        )
+
+    def resident_bytes(self) -> int:
+        """估算完整加载后占用的内存字节数（向量矩阵 + 分块文本）"""
+        return int(self.embeddings.nbytes) + sum(sys.getsizeof(chunk) for chunk in self.chunks)
+
+    # 磁盘格式：<file_id>.npy 存放归一化的 float32 嵌入矩阵，
+    # <file_id>.meta.json 存放清单信息，<file_id>.chunks.json 存放分块文本和元数据；
+    # <file_id>.json 为旧版 JSON 格式（版本 1，加载时迁移）
+    FORMAT_VERSION = 2
+    EMBEDDINGS_SUFFIX = ".npy"
+    META_SUFFIX = ".meta.json"
+    CHUNKS_SUFFIX = ".chunks.json"
+    LEGACY_SUFFIX = ".json"
+
+    @classmethod
+    def paths(cls, file_id: str, storage_dir: str) -> tuple[str, str, str]:
+        """返回 (嵌入矩阵路径, 清单路径, 分块路径)"""
+        return (
+            os.path.join(storage_dir, f"{file_id}{cls.EMBEDDINGS_SUFFIX}"),
+            os.path.join(storage_dir, f"{file_id}{cls.META_SUFFIX}"),
+            os.path.join(storage_dir, f"{file_id}{cls.CHUNKS_SUFFIX}")
+        )
+
     def save(self, storage_dir: str = "storage/vectors"):
-        """保存向量索引到磁盘
+        """保存向量索引到磁盘（二进制格式）
 
         Args:
             storage_dir: 存储目录
         """
         os.makedirs(storage_dir, exist_ok=True)
+        embeddings_path, meta_path, chunks_path = self.paths(self.file_id, storage_dir)
 
-        # 保存向量数据
-        data = {
+        # 清单 sidecar：只含轻量信息，懒加载模式启动时只读取它
+        meta = {
+            "version": self.FORMAT_VERSION,
             "file_id": self.file_id,
             "filename": self.filename,
+            "filepath": self.filepath,
+            "count": len(self.chunks),
+            "dim": int(self.embeddings.shape[1]) if self.embeddings.ndim == 2 else 0,
+            "created_at": self.created_at.isoformat(),
+            "source": self.source_info
+        }
+        chunks = {
             "chunks": self.chunks,
-            "embeddings": [emb.tolist() if isinstance(emb, np.ndarray) else emb
-                          for emb in self.embeddings],
-            "chunk_metadata": self.chunk_metadata,
-            "created_at": self.created_at.isoformat()
+            "chunk_metadata": self.chunk_metadata
         }
 
-        filepath = os.path.join(storage_dir, f"{self.file_id}.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 先写临时文件再原子替换，避免读到写了一半的索引；清单最后替换
+        with open(embeddings_path + ".tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        with open(chunks_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(chunks, f, ensure_ascii=False, separators=(',', ':'))
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+
+        os.replace(embeddings_path + ".tmp", embeddings_path)
+        os.replace(chunks_path + ".tmp", chunks_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def _read_meta(cls, file_id: str, storage_dir: str) -> dict:
+        """读取清单 sidecar"""
+        _, meta_path, _ = cls.paths(file_id, storage_dir)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @classmethod
+    def load_manifest(cls, file_id: str, storage_dir: str = "storage/vectors") -> IndexManifest:
+        """只加载清单信息（不读取分块和向量）
+
+        Args:
+            file_id: 文件 ID
+            storage_dir: 存储目录
+
+        Returns:
+            IndexManifest 实例
+        """
+        meta = cls._read_meta(file_id, storage_dir)
+
+        return IndexManifest(
+            file_id=meta["file_id"],
+            filename=meta["filename"],
+            filepath=meta["filepath"],
+            chunk_count=meta["count"],
+            created_at=datetime.fromisoformat(meta["created_at"]),
+            source_info=meta.get("source", {})
+        )
+
+    @classmethod
+    def load_embeddings(cls, file_id: str, storage_dir: str = "storage/vectors") -> np.ndarray:
+        """以只读内存映射方式打开嵌入矩阵
+
+        Args:
+            file_id: 文件 ID
+            storage_dir: 存储目录
+
+        Returns:
+            归一化的 float32 矩阵（np.memmap）
+        """
+        embeddings_path, _, _ = cls.paths(file_id, storage_dir)
+        return np.load(embeddings_path, mmap_mode='r')
 
     @classmethod
     def load(cls, file_id: str, storage_dir: str = "storage/vectors") -> 'VectorIndex':
         """从磁盘加载向量索引
 
+        嵌入矩阵以只读内存映射方式打开，检索时才按需读入页面。
+        如果只有旧版 JSON 文件，则按旧格式解析。
+
         Args:
             file_id: 文件 ID
             storage_dir: 存储目录
@@ -116,7 +263,41 @@ class VectorIndex:
         Returns:
             VectorIndex 实例
         """
-        filepath = os.path.join(storage_dir, f"{file_id}.json")
+        embeddings_path, meta_path, chunks_path = cls.paths(file_id, storage_dir)
+
+        if not os.path.exists(meta_path):
+            return cls.load_legacy(file_id, storage_dir)
+
+        meta = cls._read_meta(file_id, storage_dir)
+        with open(chunks_path, 'r', encoding='utf-8') as f:
+            chunks = json.load(f)
+
+        embeddings = cls.load_embeddings(file_id, storage_dir)
+        if len(embeddings) != meta["count"]:
+            raise ValueError(f"向量索引损坏：{embeddings_path} 行数 {len(embeddings)} != {meta['count']}")
+
+        return cls(
+            file_id=meta["file_id"],
+            filename=meta["filename"],
+            chunks=chunks["chunks"],
+            embeddings=embeddings,
+            chunk_metadata=chunks["chunk_metadata"],
+            created_at=datetime.fromisoformat(meta["created_at"]),
+            source_info=meta.get("source", {})
+        )
+
+    @classmethod
+    def load_legacy(cls, file_id: str, storage_dir: str = "storage/vectors") -> 'VectorIndex':
+        """从旧版 JSON 文件加载向量索引
+
+        Args:
+            file_id: 文件 ID
+            storage_dir: 存储目录
+
+        Returns:
+            VectorIndex 实例
+        """
+        filepath = os.path.join(storage_dir, f"{file_id}{cls.LEGACY_SUFFIX}")
 
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"向量索引不存在：{filepath}")
@@ -137,16 +318,59 @@ class VectorIndex:
 class VectorStore:
     """向量存储管理器"""
 
-    def __init__(self, storage_dir: str = "storage/vectors"):
+    # 全局 ANN 索引的持久化子目录
+    ANN_DIR = "faiss"
+    # 全局 ANN 索引修改后延迟保存的时间（秒），期间的修改合并为一次写盘
+    ANN_SAVE_DELAY = 5.0
+
+    def __init__(
+        self,
+        storage_dir: str = "storage/vectors",
+        ann_index_type: str = "auto",
+        lazy_load: bool = False,
+        max_resident_bytes: int = 256 * 1024 * 1024
+    ):
         """初始化向量存储
 
         Args:
             storage_dir: 存储目录
+            ann_index_type: 全局 ANN 索引类型（auto/flat/ivf/hnsw）
+            lazy_load: 懒加载模式（启动时只加载清单，索引在首次使用时加载）。
+                全局 ANN 索引需要把全部向量常驻内存，懒加载模式下不使用，
+                检索时逐个文件内存映射向量矩阵计算
+            max_resident_bytes: 懒加载模式下常驻索引的内存上限（按 LRU 淘汰）
         """
         self.storage_dir = storage_dir
-        self.indices: dict[str, VectorIndex] = {}
+        self.lazy_load = lazy_load
+        self.max_resident_bytes = max_resident_bytes
+
+        # 清单：所有已索引文件的轻量信息（始终完整）
+        self.manifest: dict[str, IndexManifest] = {}
+        # 常驻索引：非懒加载模式下为全部索引，懒加载模式下为 LRU 缓存
+        self.indices: OrderedDict[str, VectorIndex] = OrderedDict()
+        self.resident_bytes = 0
+        # 保护清单和常驻缓存（add_index 等会在 IndexManager 的工作线程中调用）
+        self._residency_lock = threading.RLock()
+
+        # 全局 ANN 索引的延迟保存定时器
+        self._ann_save_timer: threading.Timer | None = None
+        self._ann_save_lock = threading.Lock()
+
         self._load_all_indices()
 
+        ann_index = ANNIndex(
+            storage_dir=os.path.join(storage_dir, self.ANN_DIR),
+            index_type=ann_index_type
+        )
+        if lazy_load:
+            # 懒加载期间索引变化不会同步到全局索引，删除旧的持久化文件，
+            # 之后切回全量模式时会重建
+            self.ann_index = None
+            ann_index.save()
+        else:
+            self.ann_index = ann_index
+            self._load_ann_index()
+
 
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> list[str]:
@@ -160,6 +384,23 @@ class VectorStore:
         Returns:
             文本块列表
         """
+        return [chunk for _, chunk in VectorStore.chunk_text_with_offsets(text, chunk_size, overlap)]
+
+    @staticmethod
+    def chunk_text_with_offsets(text: str, chunk_size: int = 500, overlap: int = 50) -> list[tuple[int, str]]:
+        """将文本分成重叠的块，并返回每块的起始字符偏移
+
+        分块只依赖起始位置之后的文本，因此从任一分块的起始偏移重新分块，
+        得到的后续分块与全文分块完全一致（增量索引依赖此性质）。
+
+        Args:
+            text: 待分块的文本
+            chunk_size: 每块大小（字符数）
+            overlap: 重叠大小（字符数）
+
+        Returns:
+            [(起始字符偏移, 文本块)]
+        """
         if not text:
             return []
 
@@ -182,7 +423,7 @@ class VectorStore:
 
             chunk = text[start:end].strip()
             if chunk:
-                chunks.append(chunk)
+                chunks.append((start, chunk))
 
             # 移动到下一块（考虑重叠）
             start = end - overlap if end < text_length else text_length
@@ -190,19 +431,146 @@ class VectorStore:
         return chunks
 
     def _load_all_indices(self):
-        """加载所有已保存的向量索引"""
+        """加载所有已保存的向量索引（旧版 JSON 索引会被迁移为二进制格式）
+
+        懒加载模式下只读取清单 sidecar。
+        """
         os.makedirs(self.storage_dir, exist_ok=True)
 
+        legacy_ids = []
         for filename in os.listdir(self.storage_dir):
-            if filename.endswith('.json'):
-                file_id = filename[:-5]  # 移除 .json
-                try:
-                    index = VectorIndex.load(file_id, self.storage_dir)
-                    self.indices[file_id] = index
-                except Exception as e:
-                    print(f"警告：加载向量索引失败 {filename}: {e}")
+            if filename.endswith(VectorIndex.META_SUFFIX):
+                file_id = filename[:-len(VectorIndex.META_SUFFIX)]
+            elif filename.endswith(VectorIndex.CHUNKS_SUFFIX):
+                continue
+            elif filename.endswith(VectorIndex.LEGACY_SUFFIX):
+                legacy_ids.append(filename[:-len(VectorIndex.LEGACY_SUFFIX)])
+                continue
+            else:
+                continue
+
+            try:
+                if self.lazy_load:
+                    self.manifest[file_id] = VectorIndex.load_manifest(file_id, self.storage_dir)
+                else:
+                    self._make_resident(VectorIndex.load(file_id, self.storage_dir))
+            except Exception as e:
+                print(f"警告：加载向量索引失败 {filename}: {e}")
+
+        for file_id in legacy_ids:
+            if file_id in self.manifest:
+                # 已迁移过（上次迁移后未能删除旧文件）
+                self._remove_legacy_file(file_id)
+                continue
+            self._migrate_legacy_index(file_id)
+
+        mode = "懒加载" if self.lazy_load else "全量加载"
+        print(f"向量索引加载完成：{len(self.manifest)} 个文件（{mode}）")
+
+    def _migrate_legacy_index(self, file_id: str):
+        """将旧版 JSON 索引迁移为二进制格式
 
-        print(f"向量索引加载完成：{len(self.indices)} 个文件")
+        Args:
+            file_id: 文件 ID
+        """
+        try:
+            index = VectorIndex.load_legacy(file_id, self.storage_dir)
+            index.save(self.storage_dir)
+            self._remove_legacy_file(file_id)
+            if self.lazy_load:
+                self.manifest[file_id] = index.manifest()
+            else:
+                self._make_resident(VectorIndex.load(file_id, self.storage_dir))
+            print(f"向量索引已迁移为二进制格式：{file_id}")
+        except Exception as e:
+            print(f"警告：迁移向量索引失败 {file_id}: {e}")
+
+    def _remove_legacy_file(self, file_id: str):
+        """删除旧版 JSON 索引文件"""
+        legacy_path = os.path.join(self.storage_dir, f"{file_id}{VectorIndex.LEGACY_SUFFIX}")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def _make_resident(self, index: VectorIndex):
+        """将索引放入常驻缓存并更新清单，必要时按 LRU 淘汰
+
+        Args:
+            index: 向量索引
+        """
+        with self._residency_lock:
+            self._evict(index.file_id)
+            self.manifest[index.file_id] = index.manifest()
+            self.indices[index.file_id] = index
+            self.resident_bytes += index.resident_bytes()
+
+            if not self.lazy_load:
+                return
+
+            # 至少保留刚加入的索引
+            while self.resident_bytes > self.max_resident_bytes and len(self.indices) > 1:
+                oldest_id = next(iter(self.indices))
+                self._evict(oldest_id)
+
+    def _evict(self, file_id: str):
+        """将索引移出常驻缓存（清单保留）"""
+        with self._residency_lock:
+            index = self.indices.pop(file_id, None)
+            if index is not None:
+                self.resident_bytes -= index.resident_bytes()
+
+    def _load_ann_index(self):
+        """加载全局 ANN 索引，与分文件索引不一致时重建"""
+        expected = {file_id: entry.chunk_count for file_id, entry in self.manifest.items() if entry.chunk_count}
+        if self.ann_index.load():
+            loaded = {file_id: count for file_id, (_, count) in self.ann_index.files.items()}
+            if loaded == expected and not self.ann_index.needs_rebuild():
+                return
+
+        self._rebuild_ann_index()
+        self.ann_index.save()
+
+    def _iter_embeddings(self):
+        """逐个产出 (file_id, 嵌入矩阵)，未常驻的索引只映射其向量文件"""
+        with self._residency_lock:
+            file_ids = list(self.manifest)
+        for file_id in file_ids:
+            with self._residency_lock:
+                index = self.indices.get(file_id)
+            if index is not None:
+                yield file_id, index.embeddings
+                continue
+            try:
+                yield file_id, VectorIndex.load_embeddings(file_id, self.storage_dir)
+            except Exception as e:
+                print(f"警告：读取向量失败 {file_id}: {e}")
+
+    def _rebuild_ann_index(self):
+        """从全部分文件索引重建全局 ANN 索引（不立即保存）"""
+        self.ann_index.rebuild(self._iter_embeddings())
+
+    def _update_ann_index(self):
+        """全局 ANN 索引修改后：必要时重建，并安排延迟保存"""
+        if self.ann_index.needs_rebuild():
+            self._rebuild_ann_index()
+
+        with self._ann_save_lock:
+            if self._ann_save_timer is None:
+                self._ann_save_timer = threading.Timer(self.ANN_SAVE_DELAY, self.flush)
+                self._ann_save_timer.daemon = True
+                self._ann_save_timer.start()
+
+    def flush(self):
+        """保存尚未写盘的全局 ANN 索引
+
+        分文件索引在 add_index 时已经写盘；全局索引只在批量索引结束、延迟保存
+        到期和关闭时写出。即使未能保存，下次启动时也会发现它与清单不一致并重建。
+        """
+        with self._ann_save_lock:
+            if self._ann_save_timer is not None:
+                self._ann_save_timer.cancel()
+                self._ann_save_timer = None
+        if self.ann_index is not None and self.ann_index.dirty:
+            self.ann_index.save()
 
     def add_index(self, index: VectorIndex):
         """添加向量索引
@@ -210,11 +578,17 @@ class VectorStore:
         Args:
             index: 向量索引
         """
-        self.indices[index.file_id] = index
         index.save(self.storage_dir)
+        self._make_resident(index)
+
+        if self.ann_index is None:
+            return
+
+        self.ann_index.add(index.file_id, index.embeddings)
+        self._update_ann_index()
 
     def get_index(self, file_id: str) -> VectorIndex | None:
-        """获取向量索引
+        """获取向量索引（懒加载模式下按需从磁盘加载）
 
         Args:
             file_id: 文件 ID
@@ -222,28 +596,125 @@ class VectorStore:
         Returns:
             VectorIndex 实例或 None
         """
-        return self.indices.get(file_id)
+        with self._residency_lock:
+            index = self.indices.get(file_id)
+            if index is not None:
+                self.indices.move_to_end(file_id)
+                return index
+
+            if file_id not in self.manifest:
+                return None
+
+            try:
+                index = VectorIndex.load(file_id, self.storage_dir)
+            except Exception as e:
+                print(f"警告：加载向量索引失败 {file_id}: {e}")
+                return None
+
+            self._make_resident(index)
+            return index
+
+    def update_source_info(self, file_id: str, source_info: dict):
+        """只更新索引记录的源文件状态（内容未变化时使用，不重写向量）
+
+        Args:
+            file_id: 文件 ID
+            source_info: 新的源文件状态
+        """
+        with self._residency_lock:
+            entry = self.manifest.get(file_id)
+            if entry is None:
+                return
+
+            meta = VectorIndex._read_meta(file_id, self.storage_dir)
+            meta["source"] = source_info
+            _, meta_path, _ = VectorIndex.paths(file_id, self.storage_dir)
+            with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(meta_path + ".tmp", meta_path)
+
+            entry.source_info = source_info
+            index = self.indices.get(file_id)
+            if index is not None:
+                index.source_info = source_info
+
+    def get_manifest(self, file_id: str) -> IndexManifest | None:
+        """获取索引清单项（不会触发加载）
+
+        Args:
+            file_id: 文件 ID
+
+        Returns:
+            IndexManifest 实例或 None
+        """
+        with self._residency_lock:
+            return self.manifest.get(file_id)
 
     def search_all(self, query_embedding: List[float], top_k: int = 3) -> List[SearchResult]:
         """在所有向量索引中搜索
 
         Args:
             query_embedding: 查询向量
-            top_k: 每个索引返回前 k 个结果
+            top_k: 返回前 k 个结果
 
         Returns:
             所有检索结果列表（按相似度降序）
         """
-        all_results = []
+        if self.ann_index is None:
+            hits = self._scan_all(query_embedding, top_k)
+        else:
+            # 在全局 ANN 索引中一次检索
+            hits = self.ann_index.search(query_embedding, top_k)
 
-        for index in self.indices.values():
-            results = index.search(query_embedding, top_k)
-            all_results.extend(results)
+        # 映射回文件分块
+        results = []
+        for file_id, position, similarity in hits:
+            if similarity < VectorIndex.SIMILARITY_THRESHOLD:
+                break
 
-        # 按相似度降序排序
-        all_results.sort(key=lambda r: r.similarity, reverse=True)
+            index = self.get_index(file_id)
+            if index is None:
+                continue
 
-        return all_results[:top_k]
+            results.append(SearchResult(
+                chunk=index.chunks[position],
+                similarity=similarity,
+                metadata=index.chunk_metadata[position]
+            ))
+
+        return results
+
+    def _scan_all(self, query_embedding: List[float], top_k: int) -> List[tuple[str, int, float]]:
+        """逐个文件精确检索（懒加载模式）
+
+        未常驻的文件只内存映射其向量矩阵，不加载分块，也不进入常驻缓存。
+
+        Returns:
+            [(file_id, 分块位置, 相似度)]，按相似度降序
+        """
+        if top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        query = query / query_norm
+
+        hits = []
+        for file_id, embeddings in self._iter_embeddings():
+            if len(embeddings) == 0:
+                continue
+            if embeddings.shape[1] != len(query):
+                print(f"警告：向量维度不匹配，跳过 {file_id}: {embeddings.shape[1]} != {len(query)}")
+                continue
+
+            similarities = embeddings @ query
+            k = min(top_k, len(similarities))
+            for position in np.argpartition(similarities, -k)[-k:]:
+                hits.append((file_id, int(position), float(similarities[position])))
+
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit[2])
 
     def delete_index(self, file_id: str):
         """删除向量索引
@@ -251,12 +722,18 @@ class VectorStore:
         Args:
             file_id: 文件 ID
         """
-        if file_id in self.indices:
-            del self.indices[file_id]
+        with self._residency_lock:
+            self._evict(file_id)
+            self.manifest.pop(file_id, None)
+
+        if self.ann_index is not None and file_id in self.ann_index.file_ids():
+            self.ann_index.remove(file_id)
+            self._update_ann_index()
 
-        filepath = os.path.join(self.storage_dir, f"{file_id}.json")
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        for filepath in VectorIndex.paths(file_id, self.storage_dir):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        self._remove_legacy_file(file_id)
 
     def list_files(self) -> List[str]:
         """列出所有已索引的文件
@@ -264,4 +741,5 @@ class VectorStore:
         Returns:
             文件 ID 列表
         """
-        return list(self.indices.keys())
+        with self._residency_lock:
+            return list(self.manifest.keys())
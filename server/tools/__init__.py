@@ -11,6 +11,9 @@ from .monitor import MonitorTool
 from .semantic_search import SemanticSearchTool
 from .file_upload import FileUploadTool
 from .file_download import FileDownloadTool
+from .executor import ToolExecutor
+from .system_sampler import SystemSampler
+from .process_stats import ProcessScanner
 
 __all__ = [
     'Tool',
@@ -22,4 +25,7 @@ __all__ = [
     'SemanticSearchTool',
     'FileUploadTool',
     'FileDownloadTool',
+    'ToolExecutor',
+    'SystemSampler',
+    'ProcessScanner',
 ]
@@ -5,6 +5,8 @@
 遵循章程：真实实现，不允许虚假实现或占位符
 """
 
+import asyncio
+import threading
 import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -35,6 +37,9 @@ class Tool(ABC):
     name: str = "base_tool"
     description: str = "工具基类"
     timeout: int = 5  # 默认超时时间（秒）
+    blocking: bool = True  # execute() 是否可能阻塞（阻塞型工具由 ToolExecutor 放到线程池执行）
+    max_concurrency: int = 4  # 同一工具同时执行的最大调用数
+    loop: asyncio.AbstractEventLoop | None = None  # 服务器主事件循环（由 ToolExecutor 注入）
 
     @abstractmethod
     def execute(self, **kwargs) -> ToolExecutionResult:
@@ -59,6 +64,58 @@ class Tool(ABC):
         """
         return True, ""
 
+    def _run_async(self, coro, timeout: float | None = None) -> Any:
+        """在同步的 execute() 中运行协程
+
+        - 在工作线程中（主事件循环运行中）：提交到主事件循环执行，
+          复用其连接池和锁，并阻塞等待结果
+        - 在事件循环线程中被直接调用：不能阻塞当前循环，在新线程的临时事件循环中执行
+        - 没有事件循环：直接 asyncio.run()
+
+        Args:
+            coro: 协程对象
+            timeout: 最长等待时间（秒），None 表示不限制
+
+        Returns:
+            协程返回值
+
+        Raises:
+            TimeoutError: 超过 timeout 仍未完成
+        """
+        try:
+            asyncio.get_running_loop()
+            in_loop_thread = True
+        except RuntimeError:
+            in_loop_thread = False
+
+        if not in_loop_thread:
+            if self.loop is not None and self.loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+                try:
+                    return future.result(timeout)
+                except TimeoutError:
+                    future.cancel()
+                    raise
+            return asyncio.run(coro)
+
+        result = [None]
+        exception = [None]
+
+        def run_in_new_loop():
+            try:
+                result[0] = asyncio.run(coro)
+            except BaseException as e:
+                exception[0] = e
+
+        thread = threading.Thread(target=run_in_new_loop, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            raise TimeoutError(f"异步操作超时（>{timeout}秒）")
+        if exception[0]:
+            raise exception[0]
+        return result[0]
+
     def _execute_with_timeout(self, func, *args, **kwargs) -> ToolExecutionResult:
         """带超时的执行工具
 
@@ -5,11 +5,14 @@
 遵循章程：安全加固，命令黑名单字符过滤 + 路径白名单
 """
 
-import subprocess
+import asyncio
+import codecs
+import time
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Awaitable, Callable, List, Optional
 
 from .base import Tool, ToolExecutionResult
+from .native_commands import NATIVE_COMMANDS, CommandOutput
 
 
 # 白名单命令
@@ -32,6 +35,9 @@ BLACKLIST_CHARS = [';', '&', '|', '>', '<', '`', '$', '(', ')', '\n', '\r']
 # 需要路径验证的命令
 PATH_VALIDATION_COMMANDS = ['cat', 'head', 'tail', 'grep', 'ls']
 
+# tail 的跟踪模式选项
+FOLLOW_OPTIONS = ['-f', '-F', '--follow']
+
 
 @dataclass
 class CommandTool(Tool):
@@ -44,6 +50,7 @@ class CommandTool(Tool):
 - cat <文件>: 查看文件内容（如：cat config.yaml）
 - head <文件>: 查看文件前几行（如：head -20 config.yaml）
 - tail <文件>: 查看文件后几行（如：tail -20 config.yaml）
+- tail -f <文件>: 持续跟踪文件新增内容并实时推送（如：tail -f /var/log/syslog，用户可用 /unfollow 停止）
 - grep <模式> <文件>: 在文件中搜索文本（如：grep "port" config.yaml）
 - ls [目录]: 列出目录内容（如：ls storage/uploads/）
 - ps: 查看进程列表
@@ -60,7 +67,11 @@ class CommandTool(Tool):
 注意：命令必须在白名单中，路径必须通过白名单验证"""
     timeout: int = 5
     path_validator: Optional[object] = field(default=None)
-    max_output_size: int = 102400  # 100KB
+    max_output_size: int = 102400  # 100KB，读满后终止进程
+
+    READ_CHUNK_SIZE = 8192  # 每次读取 stdout 的字节数
+    STREAM_INTERVAL = 0.2  # 流式推送部分输出的最小间隔（秒）
+    STREAM_MAX_CHARS = 1024  # 每次推送的最大字符数
 
     def validate_args(self, command: str, args: List[str] = None) -> tuple[bool, str]:
         """验证命令和参数
@@ -148,14 +159,93 @@ class CommandTool(Tool):
 
         return True, ""
 
-    def execute(self, command: str, args: List[str] = None, **kwargs) -> ToolExecutionResult:
+    def execute(self, command: str, args: List[str] = None, session=None, **kwargs) -> ToolExecutionResult:
         """执行命令
 
         Args:
             command: 命令名称（如 'ls', 'cat'）
             args: 参数列表（如 ['-la', '/home']）
+            session: 客户端会话（可选，提供时以 AGENT_THOUGHT 推送部分输出）
             **kwargs: 其他参数
 
+        Returns:
+            ToolExecutionResult: 执行结果
+        """
+        # tail -f：先返回当前末尾内容，再由会话在后台持续推送新增行
+        if command == 'tail' and args and any(arg in FOLLOW_OPTIONS for arg in args):
+            return self._follow(args, session)
+
+        on_output = None
+        if session is not None:
+            async def on_output(text: str):
+                await session.send_status("tool_output", text)
+
+        try:
+            # 留出进程终止和回收的时间，超时由 run() 自身处理
+            return self._run_async(self.run(command, args, on_output), timeout=self.timeout + 1)
+        except TimeoutError:
+            return ToolExecutionResult(
+                success=False,
+                output="",
+                error=f"命令执行超时（>{self.timeout}秒）"
+            )
+
+    def _follow(self, args: List[str], session=None) -> ToolExecutionResult:
+        """处理 tail -f：返回文件末尾内容并在会话中启动跟踪
+
+        Args:
+            args: tail 参数（含跟踪选项）
+            session: 客户端会话
+
+        Returns:
+            ToolExecutionResult: 执行结果
+        """
+        # 去掉跟踪选项后验证（tail 的路径验证针对最后一个参数）
+        plain_args = [arg for arg in args if arg not in FOLLOW_OPTIONS]
+        if not plain_args:
+            return ToolExecutionResult(success=False, output="", error="用法: tail -f <文件>")
+        is_valid, error_msg = self.validate_args('tail', plain_args)
+        if not is_valid:
+            return ToolExecutionResult(success=False, output="", error=error_msg)
+        try:
+            result = self._run_async(self.run('tail', plain_args), timeout=self.timeout + 1)
+        except TimeoutError:
+            return ToolExecutionResult(
+                success=False,
+                output="",
+                error=f"命令执行超时（>{self.timeout}秒）"
+            )
+        if not result.success:
+            return result
+
+        if session is None:
+            note = "（当前连接不支持实时跟踪，仅显示文件末尾内容）"
+        else:
+            started, note = self._run_async(session.start_follow(plain_args[-1]), timeout=self.timeout)
+            if not started:
+                return ToolExecutionResult(success=False, output=result.output, error=note)
+
+        return ToolExecutionResult(
+            success=True,
+            output=f"{result.output}\n\n{note}".strip()
+        )
+
+    async def run(
+        self,
+        command: str,
+        args: List[str] = None,
+        on_output: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> ToolExecutionResult:
+        """异步执行命令
+
+        增量读取 stdout，读满 max_output_size 后立即终止进程，
+        不会把超大输出整体读入内存。
+
+        Args:
+            command: 命令名称
+            args: 参数列表
+            on_output: 部分输出回调（按 STREAM_INTERVAL 节流）
+
         Returns:
             ToolExecutionResult: 执行结果
         """
@@ -173,43 +263,151 @@ class CommandTool(Tool):
         if args:
             full_command.extend(args)
 
-        try:
-            # 执行命令
-            result = subprocess.run(
-                full_command,
-                capture_output=True,
-                text=True,
-                timeout=self.timeout,
-                check=False
-            )
-
-            # 获取输出
-            output = result.stdout
-            if result.stderr:
-                output += f"\n[错误输出]\n{result.stderr}"
-
-            # 限制输出大小
-            if len(output) > self.max_output_size:
-                output = output[:self.max_output_size] + f"\n... (输出已截断，共 {len(result.stdout)} 字节)"
+        # 优先使用进程内实现（不 fork），不支持的选项回退到子进程
+        native = NATIVE_COMMANDS.get(command)
+        if native is not None:
+            try:
+                output = await asyncio.to_thread(native, list(args or []), self.max_output_size)
+            except Exception as e:
+                return ToolExecutionResult(
+                    success=False,
+                    output="",
+                    error=f"命令执行失败: {str(e)}"
+                )
+            if output is not None:
+                return self._build_result(output)
 
-            return ToolExecutionResult(
-                success=result.returncode == 0,
-                output=output.strip(),
-                error=None if result.returncode == 0 else f"命令返回码: {result.returncode}"
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *full_command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
             )
-
-        except subprocess.TimeoutExpired:
+        except Exception as e:
             return ToolExecutionResult(
                 success=False,
                 output="",
-                error=f"命令执行超时（>{self.timeout}秒）"
+                error=f"命令执行失败: {str(e)}"
             )
-        except Exception as e:
+
+        stderr_task = asyncio.create_task(self._read_stderr(process.stderr))
+        try:
+            stdout, truncated = await asyncio.wait_for(
+                self._read_stdout(process, on_output), self.timeout
+            )
+            await process.wait()
+            stderr = await stderr_task
+        except asyncio.TimeoutError:
+            self._kill(process)
+            await process.wait()
+            stderr_task.cancel()
             return ToolExecutionResult(
                 success=False,
                 output="",
-                error=f"命令执行失败: {str(e)}"
+                error=f"命令执行超时（>{self.timeout}秒）"
             )
+        except BaseException:
+            # 被取消等情况：确保子进程不会遗留
+            self._kill(process)
+            stderr_task.cancel()
+            raise
+
+        return self._build_result(CommandOutput(
+            stdout=stdout,
+            stderr=stderr,
+            returncode=process.returncode,
+            truncated=truncated
+        ))
+
+    def _build_result(self, result: CommandOutput) -> ToolExecutionResult:
+        """把命令输出转换为工具执行结果"""
+        # 获取输出
+        output = result.stdout
+        if result.stderr:
+            output += f"\n[错误输出]\n{result.stderr}"
+
+        if result.truncated:
+            output += f"\n... (输出已截断，仅读取前 {self.max_output_size} 字节)"
+
+        # 读满预算时进程被主动终止，返回码不代表命令失败
+        success = result.truncated or result.returncode == 0
+        return ToolExecutionResult(
+            success=success,
+            output=output.strip(),
+            error=None if success else f"命令返回码: {result.returncode}"
+        )
+
+    async def _read_stdout(
+        self,
+        process: asyncio.subprocess.Process,
+        on_output: Optional[Callable[[str], Awaitable[None]]]
+    ) -> tuple[str, bool]:
+        """增量读取 stdout，直到 EOF 或达到字节预算
+
+        Returns:
+            (输出文本, 是否被截断)
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parts = []
+        received = 0
+        truncated = False
+        pending = ""
+        last_push = time.monotonic()
+
+        while True:
+            data = await process.stdout.read(self.READ_CHUNK_SIZE)
+            if not data:
+                parts.append(decoder.decode(b"", final=True))
+                break
+
+            remaining = self.max_output_size - received
+            if len(data) > remaining:
+                data = data[:remaining]
+                truncated = True
+
+            received += len(data)
+            text = decoder.decode(data)
+            parts.append(text)
+
+            if truncated:
+                # 达到预算：终止进程，不再读取剩余输出
+                self._kill(process)
+                break
+
+            if on_output is not None:
+                pending += text
+                now = time.monotonic()
+                if now - last_push >= self.STREAM_INTERVAL:
+                    last_push = now
+                    try:
+                        await on_output(pending[-self.STREAM_MAX_CHARS:])
+                    except Exception:
+                        # 推送失败（如客户端断开）不影响命令执行
+                        on_output = None
+                    pending = ""
+
+        return "".join(parts), truncated
+
+    async def _read_stderr(self, stream: asyncio.StreamReader) -> str:
+        """读取 stderr（超出预算的部分丢弃，但持续读取以免子进程阻塞）"""
+        data = bytearray()
+        while True:
+            chunk = await stream.read(self.READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(data) < self.max_output_size:
+                data.extend(chunk[:self.max_output_size - len(data)])
+        return data.decode('utf-8', errors='replace')
+
+    @staticmethod
+    def _kill(process: asyncio.subprocess.Process):
+        """终止子进程（已退出则忽略）"""
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
 
     def get_help(self) -> str:
         """获取帮助信息"""
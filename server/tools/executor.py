@@ -0,0 +1,181 @@
+"""
+工具执行器模块
+
+在有界线程池中执行同步工具，避免阻塞事件循环，并在截止时间强制返回。
+遵循章程：真实实现，不允许虚假实现或占位符
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from .base import Tool, ToolExecutionResult
+
+logger = logging.getLogger(__name__)
+
+
+class ToolExecutor:
+    """工具执行器
+
+    - 阻塞型工具（Tool.blocking=True）提交到有界线程池，事件循环不再被卡住
+    - 每个工具按 Tool.max_concurrency 限制并发，超出的调用排队等待
+    - 截止时间到达时立即返回超时结果：尚未开始的调用被取消；
+      已在运行的线程无法强制终止，记为 abandoned，直到其结束才释放并发名额
+    """
+
+    def __init__(self, max_workers: int = 8):
+        """初始化执行器
+
+        Args:
+            max_workers: 线程池大小
+        """
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def _get_metrics(self, tool_name: str) -> Dict[str, Any]:
+        """获取（或创建）工具的统计项"""
+        if tool_name not in self.metrics:
+            self.metrics[tool_name] = {
+                "calls": 0,
+                "failures": 0,
+                "timeouts": 0,
+                "cancelled": 0,      # 排队中即被取消（未实际执行）
+                "running": 0,
+                "abandoned": 0,      # 超时后仍在后台运行的线程数
+                "queue_wait": 0.0,   # 累计排队时间（秒）
+                "total_duration": 0.0,
+                "max_duration": 0.0
+            }
+        return self.metrics[tool_name]
+
+    async def execute(self, tool: Tool, tool_args: Dict[str, Any], timeout: float) -> ToolExecutionResult:
+        """执行工具（带截止时间）
+
+        Args:
+            tool: 工具实例
+            tool_args: 工具参数
+            timeout: 截止时间（秒），包含排队时间
+
+        Returns:
+            ToolExecutionResult: 执行结果（超时时 success=False）
+        """
+        loop = asyncio.get_running_loop()
+        tool.loop = loop
+        metrics = self._get_metrics(tool.name)
+        metrics["calls"] += 1
+
+        semaphore = self._semaphores.get(tool.name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(tool.max_concurrency)
+            self._semaphores[tool.name] = semaphore
+
+        start_time = time.time()
+        deadline = loop.time() + timeout
+
+        # 不用 wait_for：Python 3.11 中 acquire 完成后仍可能报超时，名额就此丢失
+        acquired = False
+        try:
+            async with asyncio.timeout(timeout):
+                await semaphore.acquire()
+                acquired = True
+        except TimeoutError:
+            if acquired:
+                semaphore.release()
+            metrics["timeouts"] += 1
+            metrics["cancelled"] += 1
+            duration = time.time() - start_time
+            logger.warning(f"[TOOL] {tool.name} 排队超时（{duration:.2f}s），并发上限 {tool.max_concurrency}")
+            return self._timeout_result(duration, timeout)
+
+        metrics["queue_wait"] += time.time() - start_time
+
+        if not tool.blocking:
+            # 非阻塞工具直接在事件循环中执行
+            try:
+                result = tool.execute(**tool_args)
+            except Exception as e:
+                result = ToolExecutionResult(success=False, output="", error=f"工具执行失败: {str(e)}")
+            finally:
+                semaphore.release()
+            return self._finish(metrics, result, time.time() - start_time)
+
+        metrics["running"] += 1
+        future = self._pool.submit(self._call, tool, tool_args)
+        timed_out = [False]
+
+        def on_done(_):
+            # 线程结束（或排队中被取消）后才释放并发名额
+            def release():
+                metrics["running"] -= 1
+                if timed_out[0] and not future.cancelled():
+                    metrics["abandoned"] -= 1
+                semaphore.release()
+            loop.call_soon_threadsafe(release)
+
+        future.add_done_callback(on_done)
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            timed_out[0] = True
+            metrics["timeouts"] += 1
+            duration = time.time() - start_time
+            if future.cancelled():
+                metrics["cancelled"] += 1
+                logger.warning(f"[TOOL] {tool.name} 超时（{duration:.2f}s），排队中的调用已取消")
+            else:
+                metrics["abandoned"] += 1
+                logger.warning(f"[TOOL] {tool.name} 超时（{duration:.2f}s），工作线程仍在运行")
+            return self._timeout_result(duration, timeout)
+
+        return self._finish(metrics, result, time.time() - start_time)
+
+    @staticmethod
+    def _call(tool: Tool, tool_args: Dict[str, Any]) -> ToolExecutionResult:
+        """在工作线程中执行工具"""
+        try:
+            return tool.execute(**tool_args)
+        except Exception as e:
+            return ToolExecutionResult(success=False, output="", error=f"工具执行失败: {str(e)}")
+
+    @staticmethod
+    def _finish(metrics: Dict[str, Any], result: ToolExecutionResult, duration: float) -> ToolExecutionResult:
+        """记录执行统计"""
+        if not result.success:
+            metrics["failures"] += 1
+        metrics["total_duration"] += duration
+        metrics["max_duration"] = max(metrics["max_duration"], duration)
+        result.duration = duration
+        return result
+
+    @staticmethod
+    def _timeout_result(duration: float, timeout: float) -> ToolExecutionResult:
+        """构造超时结果"""
+        return ToolExecutionResult(
+            success=False,
+            output="",
+            error=f"工具执行超时（{duration:.2f}s > {timeout}s）",
+            duration=duration
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各工具的执行统计
+
+        Returns:
+            {工具名: 统计项}，附带平均耗时
+        """
+        stats = {}
+        for tool_name, metrics in self.metrics.items():
+            item = dict(metrics)
+            finished = item["calls"] - item["timeouts"]
+            item["avg_duration"] = item["total_duration"] / finished if finished > 0 else 0.0
+            stats[tool_name] = item
+        return stats
+
+    def shutdown(self):
+        """关闭线程池（不等待仍在运行的调用）"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
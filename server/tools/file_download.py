@@ -13,6 +13,7 @@ import time
 from dataclasses import dataclass
 from typing import Optional
 
+from server.rdt_server import file_checksum
 from .base import Tool, ToolExecutionResult
 
 
@@ -33,6 +34,7 @@ class FileDownloadTool(Tool):
     name: str = "file_download"
     description: str = "将服务器文件发送给用户下载，支持RDT/HTTP/NPLT三种传输模式"
     timeout: int = 20  # 下载超时时间（秒）
+    blocking: bool = False  # 只调度后台传输任务，需在事件循环中执行
 
     path_validator: Optional[object] = None  # 路径验证器
     rdt_server: Optional[object] = None  # RDT服务器实例
@@ -242,18 +244,17 @@ class FileDownloadTool(Tool):
         """通过RDT协议下载文件
 
         端到端流程（关键集成点）：
-        1. 读取文件数据到内存
-        2. 调用 server.offer_file_download() 发送 DOWNLOAD_OFFER 消息
+        1. 调用 server.offer_file_download() 发送 DOWNLOAD_OFFER 消息
            - NPLT 消息类型：MessageType.DOWNLOAD_OFFER
-           - 包含：filename, size, checksum, download_token, server_host, server_port
-        3. server.offer_file_download() 内部调用 rdt_server.create_session() 创建 RDT 会话
-           - 生成唯一的 download_token
-           - 存储 file_data 和 client_addr
-        4. 等待 0.5 秒让客户端准备接收（连接 RDT 服务器）
-        5. 调用 rdt_server.send_file() 执行 UDP 数据包传输
-           - 使用滑动窗口协议（window_size=5, timeout=0.1s）
-           - 发送到 session.client_addr
-        6. 客户端接收文件并保存到 downloads/ 目录
+           - 包含：filename, size, checksum, download_token, server_host, server_port, rdt_version
+        2. server.offer_file_download() 内部调用 rdt_server.create_session() 创建 RDT 会话
+           - 生成唯一的 download_token，协商协议版本
+           - 记录文件路径（发送时分块读取，不整体载入内存）和客户端 UDP 地址
+        3. 等待 0.5 秒让客户端准备接收（连接 RDT 服务器）
+        4. 调用 rdt_server.send_file() 执行 UDP 数据包传输
+           - 拥塞窗口和超时时间自适应
+           - 发送到客户端注册的 UDP 地址
+        5. 客户端接收文件并保存到 downloads/ 目录
 
         Args:
             file_path: 文件路径
@@ -282,10 +283,6 @@ class FileDownloadTool(Tool):
         try:
             import asyncio
 
-            # 读取文件数据
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-
             # 调用 server.offer_file_download() 发送 DOWNLOAD_OFFER 消息
             # 注意：这里需要在后台异步执行，因为 execute 是同步方法
             async def _transfer_file():
@@ -293,31 +290,23 @@ class FileDownloadTool(Tool):
                 logger.info(f"[DOWNLOAD] === 后台传输任务开始执行: {filename} ===")
                 # 1. 发送下载提议
                 if self.server:
-                    success = await self.server.offer_file_download(session, filename, file_data)
-                    if not success:
+                    download_token = await self.server.offer_file_download(
+                        session, filename, file_path=file_path
+                    )
+                    if not download_token:
                         logger.error("[DOWNLOAD] 发送下载提议失败")
                         return False
-
-                    # 获取 download_token（从 RDT 服务器的最新会话）
-                    # offer_file_download 会创建会话，我们获取最新创建的
-                    if hasattr(self.rdt_server, 'sessions'):
-                        # 找到最新的会话
-                        for token, rdt_session in self.rdt_server.sessions.items():
-                            if rdt_session.filename == filename:
-                                download_token = token
-                                break
-                        else:
-                            # 未找到，使用 file_id
-                            download_token = file_id or f"token_{filename}"
-                    else:
-                        download_token = file_id or f"token_{filename}"
                 else:
                     # Fallback: 直接创建 RDT 会话
                     logger.warning("[DOWNLOAD] server未初始化，跳过DOWNLOAD_OFFER消息")
+                    udp_port = getattr(session, 'client_udp_port', None)
+                    # 校验和在线程中计算，不阻塞事件循环
+                    checksum = await asyncio.to_thread(file_checksum, file_path)
                     download_token = self.rdt_server.create_session(
                         filename=filename,
-                        file_data=file_data,
-                        client_addr=session.client_addr
+                        client_addr=(session.client_addr[0], udp_port) if udp_port else session.client_addr,
+                        file_path=file_path,
+                        checksum=checksum
                     )
 
                 logger.info(f"[DOWNLOAD] RDT会话已创建 token={download_token}")
@@ -325,8 +314,8 @@ class FileDownloadTool(Tool):
                 # 2. 等待客户端准备（0.5秒）
                 await asyncio.sleep(0.5)
 
-                # 3. 执行 RDT 传输
-                send_success = await self.rdt_server.send_file(download_token, session.client_addr)
+                # 3. 执行 RDT 传输（发送到创建会话时登记的客户端 UDP 地址）
+                send_success = await self.rdt_server.send_file(download_token)
 
                 if not send_success:
                     logger.error(f"[DOWNLOAD] RDT传输失败 token={download_token}")
@@ -353,9 +342,18 @@ class FileDownloadTool(Tool):
 
                 logger.info(f"[DOWNLOAD] 后台传输任务已创建: {filename}")
             except RuntimeError as e:
-                # 没有运行的事件循环，创建新的
-                logger.warning(f"[DOWNLOAD] 没有运行的事件循环，创建新的: {e}")
-                asyncio.run(_transfer_file())
+                if self.loop is not None and self.loop.is_running():
+                    # 在工具线程池中执行：RDT 服务器的 UDP 传输属于主事件循环，传输任务必须提交到主循环
+                    future = asyncio.run_coroutine_threadsafe(_transfer_file(), self.loop)
+                    self._background_tasks.append(future)
+                    future.add_done_callback(
+                        lambda f: self._background_tasks.remove(f) if f in self._background_tasks else None
+                    )
+                    logger.info(f"[DOWNLOAD] 后台传输任务已提交到主事件循环: {filename}")
+                else:
+                    # 没有运行的事件循环，创建新的
+                    logger.warning(f"[DOWNLOAD] 没有运行的事件循环，创建新的: {e}")
+                    asyncio.run(_transfer_file())
 
             # 立即返回成功（传输在后台进行）
             return {
@@ -1,16 +1,19 @@
 """
 系统监控工具模块
 
-提供系统资源监控功能（CPU、内存、磁盘）。
+提供系统资源监控功能（CPU、内存、磁盘、网络、进程 Top N）。
+配置了 SystemSampler 时直接从采样环形缓冲区回答，并支持时间窗口查询。
 遵循章程：真实实现，不允许虚假实现或占位符
 """
 
 import os
 import shutil
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional
 
 from .base import Tool, ToolExecutionResult
+from .native_commands import memory_usage
+from .process_stats import ProcessScanner
 
 
 @dataclass
@@ -18,22 +21,58 @@ class MonitorTool(Tool):
     """系统监控工具"""
 
     name: str = "sys_monitor"
-    description: str = "监控系统资源使用情况（CPU、内存、磁盘）"
+    description: str = """监控系统资源使用情况（CPU、内存、磁盘、网络、进程）
+
+参数：
+- metric: cpu / memory / disk / network / process / all（默认 all）
+- window: 统计窗口（秒，可选，默认 60），如最近 5 分钟传 300
+- top: process 指标返回的进程数（默认 10）
+- sort_by: process 指标的排序依据 cpu / memory（默认 cpu）"""
     timeout: int = 5
+    sampler: Optional[object] = None  # SystemSampler 实例（可选）
+    default_window: int = 60  # 默认统计窗口（秒）
+    process_scanner: Optional[ProcessScanner] = None  # 进程扫描器（首次查询时创建）
+    max_top: int = 50  # process 指标最多返回的进程数
 
-    def execute(self, metric: str = "all", **kwargs) -> ToolExecutionResult:
+    def execute(
+        self,
+        metric: str = "all",
+        window: Optional[int] = None,
+        top: int = 10,
+        sort_by: str = "cpu",
+        **kwargs
+    ) -> ToolExecutionResult:
         """执行监控
 
         Args:
-            metric: 监控指标（'cpu', 'memory', 'disk', 'all'）
+            metric: 监控指标（'cpu', 'memory', 'disk', 'network', 'process', 'all'）
+            window: 统计窗口（秒），仅在配置了采样器时生效
+            top: process 指标返回的进程数
+            sort_by: process 指标的排序依据（'cpu' 或 'memory'）
             **kwargs: 其他参数
 
         Returns:
             ToolExecutionResult: 监控结果
         """
         try:
+            if metric == "process":
+                return ToolExecutionResult(
+                    success=True,
+                    output=self._get_process_info(int(top), sort_by)
+                )
+
+            stats = None
+            if self.sampler is not None:
+                stats = self.sampler.window(float(window or self.default_window))
+
+            if metric == "network":
+                return ToolExecutionResult(
+                    success=True,
+                    output=self._get_network_info(stats)
+                )
+
             if metric == "cpu" or metric == "all":
-                cpu_info = self._get_cpu_info()
+                cpu_info = self._get_cpu_info(stats)
                 if metric == "cpu":
                     return ToolExecutionResult(
                         success=True,
@@ -41,7 +80,7 @@ class MonitorTool(Tool):
                     )
 
             if metric == "memory" or metric == "all":
-                memory_info = self._get_memory_info()
+                memory_info = self._get_memory_info(stats)
                 if metric == "memory":
                     return ToolExecutionResult(
                         success=True,
@@ -49,7 +88,7 @@ class MonitorTool(Tool):
                     )
 
             if metric == "disk" or metric == "all":
-                disk_info = self._get_disk_info()
+                disk_info = self._get_disk_info(stats)
                 if metric == "disk":
                     return ToolExecutionResult(
                         success=True,
@@ -65,6 +104,8 @@ class MonitorTool(Tool):
 
 {disk_info}
 """
+            if stats is not None:
+                all_info += f"\n{self._get_network_info(stats)}\n"
             return ToolExecutionResult(
                 success=True,
                 output=all_info.strip()
@@ -77,7 +118,26 @@ class MonitorTool(Tool):
                 error=f"监控失败: {str(e)}"
             )
 
-    def _get_cpu_info(self) -> str:
+    @staticmethod
+    def _describe_window(stats: dict) -> str:
+        """采样窗口描述（如：最近 5 分钟，300 个采样）"""
+        span = stats["span"]
+        if span >= 120:
+            text = f"最近 {span / 60:.0f} 分钟"
+        else:
+            text = f"最近 {span:.0f} 秒"
+        return f"{text}，{stats['samples']} 个采样"
+
+    @staticmethod
+    def _format_rate(value: float) -> str:
+        """格式化吞吐（字节/秒）"""
+        for unit in ("B/s", "KB/s", "MB/s"):
+            if value < 1024:
+                return f"{value:.1f} {unit}"
+            value /= 1024
+        return f"{value:.1f} GB/s"
+
+    def _get_cpu_info(self, stats: Optional[dict] = None) -> str:
         """获取 CPU 信息"""
         try:
             # 读取 CPU 负载
@@ -86,7 +146,20 @@ class MonitorTool(Tool):
             # CPU 核心数
             cpu_count = os.cpu_count()
 
-            # 计算 CPU 使用率（基于负载）
+            if stats is not None:
+                # 基于 /proc/stat 采样的真实使用率
+                cpu = stats["cpu"]
+                per_core = ", ".join(
+                    f"cpu{i} {avg:.1f}%" for i, avg in enumerate(cpu["per_core_avg"])
+                )
+                return f"""CPU 使用率（{self._describe_window(stats)}）:
+  • 当前: {cpu['current']:.1f}%
+  • 平均 / 最高 / 最低: {cpu['avg']:.1f}% / {cpu['max']:.1f}% / {cpu['min']:.1f}%
+  • 各核心平均: {per_core}
+  • 负载 (1min/5min/15min): {load1:.2f} / {load5:.2f} / {load15:.2f}
+  • 核心数: {cpu_count}"""
+
+            # 未配置采样器：以负载估算使用率
             cpu_usage = min(100, (load1 / cpu_count * 100) if cpu_count else 0)
 
             return f"""CPU 使用率:
@@ -96,25 +169,22 @@ class MonitorTool(Tool):
         except Exception as e:
             return f"CPU 信息获取失败: {str(e)}"
 
-    def _get_memory_info(self) -> str:
+    def _get_memory_info(self, stats: Optional[dict] = None) -> str:
         """获取内存信息"""
         try:
-            # 使用 free 命令获取内存信息
-            import subprocess
-            result = subprocess.run(
-                ['free', '-b'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            if stats is not None:
+                # 直接使用最近一次采样
+                memory = stats["memory"]
+                total = memory["total"]
+                used = memory["used"]
+                available = memory["available"]
+            else:
+                # 直接读取 /proc/meminfo（口径与 free 命令一致），无需 fork 子进程
+                usage = memory_usage()
 
-            # 解析输出
-            lines = result.stdout.strip().split('\n')
-            mem_line = lines[1].split()
-
-            total = int(mem_line[1])
-            used = int(mem_line[2])
-            available = int(mem_line[6])
+                total = usage["total"]
+                used = usage["used"]
+                available = usage["available"]
 
             # 转换为 GB
             total_gb = total / (1024**3)
@@ -122,14 +192,22 @@ class MonitorTool(Tool):
             available_gb = available / (1024**3)
             usage_percent = (used / total * 100) if total > 0 else 0
 
-            return f"""内存使用:
+            info = f"""内存使用:
   • 总内存: {total_gb:.2f} GB
   • 已使用: {used_gb:.2f} GB ({usage_percent:.1f}%)
   • 可用: {available_gb:.2f} GB"""
+
+            if stats is not None:
+                memory = stats["memory"]
+                info += (
+                    f"\n  • {self._describe_window(stats)}: 平均已用 {memory['avg_used'] / (1024**3):.2f} GB，"
+                    f"最高 {memory['max_used'] / (1024**3):.2f} GB"
+                )
+            return info
         except Exception as e:
             return f"内存信息获取失败: {str(e)}"
 
-    def _get_disk_info(self) -> str:
+    def _get_disk_info(self, stats: Optional[dict] = None) -> str:
         """获取磁盘信息"""
         try:
             # 获取根分区磁盘使用情况
@@ -141,26 +219,90 @@ class MonitorTool(Tool):
             free_gb = free / (1024**3)
             usage_percent = (used / total * 100) if total > 0 else 0
 
-            return f"""磁盘使用:
+            info = f"""磁盘使用:
   • 总容量: {total_gb:.2f} GB
   • 已使用: {used_gb:.2f} GB ({usage_percent:.1f}%)
   • 可用: {free_gb:.2f} GB"""
+
+            if stats is not None:
+                io = stats["disk_io"]
+                info += (
+                    f"\n  • 读写速率（当前）: 读 {self._format_rate(io['read'])} / 写 {self._format_rate(io['write'])}"
+                    f"\n  • 读写速率（{self._describe_window(stats)}）: "
+                    f"平均 {self._format_rate(io['read_avg'])} / {self._format_rate(io['write_avg'])}，"
+                    f"峰值 {self._format_rate(io['read_max'])} / {self._format_rate(io['write_max'])}"
+                )
+            return info
         except Exception as e:
             return f"磁盘信息获取失败: {str(e)}"
 
+    def _get_network_info(self, stats: Optional[dict] = None) -> str:
+        """获取网络吞吐信息（需要采样器）"""
+        if stats is None:
+            return "网络吞吐: 系统采样未启用或尚无采样数据"
+
+        network = stats["network"]
+        lines = [
+            f"网络吞吐（{self._describe_window(stats)}）:",
+            f"  • 当前: 接收 {self._format_rate(network['rx'])} / 发送 {self._format_rate(network['tx'])}",
+            f"  • 平均: 接收 {self._format_rate(network['rx_avg'])} / 发送 {self._format_rate(network['tx_avg'])}",
+            f"  • 峰值: 接收 {self._format_rate(network['rx_max'])} / 发送 {self._format_rate(network['tx_max'])}"
+        ]
+        for name, (rx, tx) in sorted(network["interfaces"].items()):
+            lines.append(f"  • {name}: 接收 {self._format_rate(rx)} / 发送 {self._format_rate(tx)}")
+        return "\n".join(lines)
+
+    def _get_process_info(self, top: int, sort_by: str) -> str:
+        """获取资源占用最高的进程（紧凑表格）"""
+        if self.process_scanner is None:
+            self.process_scanner = ProcessScanner()
+
+        result = self.process_scanner.top(min(max(1, top), self.max_top), sort_by)
+        sort_label = "CPU" if sort_by == "cpu" else "内存"
+        lines = [
+            f"进程 Top {len(result['processes'])}（按{sort_label}排序，"
+            f"采样间隔 {result['interval']:.1f}s，共 {result['total']} 个进程）:",
+            f"{'PID':>7} {'USER':<10} {'CPU%':>6} {'MEM%':>5} {'RSS':>8} {'THR':>4} S COMMAND"
+        ]
+        for process in result["processes"]:
+            command = self.process_scanner.read_command_line(process.pid) or f"[{process.name}]"
+            lines.append(
+                f"{process.pid:>7} {process.user[:10]:<10} {process.cpu_percent:>6.1f} "
+                f"{process.memory_percent:>5.1f} {self._format_size(process.rss):>8} "
+                f"{process.threads:>4} {process.state} {command}"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_size(size: int) -> str:
+        """格式化内存大小（与 top 类似的紧凑写法）"""
+        for unit in ("K", "M", "G"):
+            size /= 1024
+            if size < 1024:
+                return f"{size:.1f}{unit}"
+        return f"{size / 1024:.1f}T"
+
     def get_help(self) -> str:
         """获取帮助信息"""
         return """
 系统监控工具 - 支持的监控指标:
 
-  cpu    - CPU 使用率和负载
-  memory - 内存使用情况
-  disk   - 磁盘使用情况
-  all    - 所有监控指标（默认）
+  cpu     - CPU 使用率（含各核心）和负载
+  memory  - 内存使用情况
+  disk    - 磁盘使用情况和读写速率
+  network - 网络吞吐（需要系统采样）
+  process - 资源占用最高的进程（Top N）
+  all     - 所有监控指标（默认）
+
+  window  - 统计窗口（秒），如 300 表示最近 5 分钟
+  top     - process 指标返回的进程数（默认 10）
+  sort_by - process 指标的排序依据：cpu（默认）/ memory
 
 使用示例:
   - 监控所有: {'metric': 'all'}
   - 监控 CPU: {'metric': 'cpu'}
   - 监控内存: {'metric': 'memory'}
   - 监控磁盘: {'metric': 'disk'}
+  - 最近 5 分钟 CPU: {'metric': 'cpu', 'window': 300}
+  - 内存占用最高的 5 个进程: {'metric': 'process', 'sort_by': 'memory', 'top': 5}
 """
@@ -0,0 +1,545 @@
+"""
+白名单只读命令的进程内实现
+
+为 cat/head/tail/grep/free 提供不 fork 子进程的实现，输出格式与 GNU coreutils /
+grep / procps 保持一致。遇到不支持的选项时返回 None，由调用方回退到子进程执行。
+遵循章程：真实实现，不允许虚假实现或占位符
+"""
+
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Union
+
+
+@dataclass
+class CommandOutput:
+    """命令执行输出"""
+    stdout: str
+    stderr: str
+    returncode: int
+    truncated: bool = False
+
+
+class _OutputBuffer:
+    """带字节预算的输出缓冲区"""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.data = bytearray()
+        self.errors: List[str] = []
+        self.truncated = False
+
+    @property
+    def remaining(self) -> int:
+        return self.budget - len(self.data)
+
+    def write(self, data: bytes) -> bool:
+        """写入数据，超出预算时截断
+
+        Returns:
+            是否还能继续写入
+        """
+        if self.truncated:
+            return False
+        if len(data) > self.remaining:
+            self.data.extend(data[:self.remaining])
+            self.truncated = True
+            return False
+        self.data.extend(data)
+        return True
+
+    def error(self, message: str):
+        """记录错误输出"""
+        self.errors.append(message)
+
+    def result(self, returncode: int) -> CommandOutput:
+        return CommandOutput(
+            stdout=self.data.decode('utf-8', errors='replace'),
+            stderr="\n".join(self.errors),
+            returncode=returncode,
+            truncated=self.truncated
+        )
+
+
+def _open_error(command: str, path: str) -> Optional[str]:
+    """检查文件是否可读，返回与 coreutils 一致的错误信息"""
+    if not os.path.exists(path):
+        return f"{command}: {path}: No such file or directory"
+    if os.path.isdir(path):
+        return f"{command}: {path}: Is a directory"
+    if not os.access(path, os.R_OK):
+        return f"{command}: {path}: Permission denied"
+    return None
+
+
+def _parse_line_count(args: List[str]) -> Optional[tuple[int, List[str]]]:
+    """解析 head/tail 的行数选项（-n N、-nN、-N）
+
+    Returns:
+        (行数, 文件列表)，存在不支持的选项时返回 None
+    """
+    count = 10
+    files = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '-n' and i + 1 < len(args):
+            value = args[i + 1]
+            i += 2
+        elif arg.startswith('-n') and len(arg) > 2:
+            value = arg[2:]
+            i += 1
+        elif arg.startswith('-') and arg[1:].isdigit():
+            value = arg[1:]
+            i += 1
+        elif arg.startswith('-') and arg != '-':
+            return None
+        else:
+            files.append(arg)
+            i += 1
+            continue
+
+        # 负数（head -n -5）和 +N（tail -n +5）语义不同，交给原命令
+        if not value.isdigit():
+            return None
+        count = int(value)
+
+    if not files:
+        return None
+    return count, files
+
+
+def _write_headers(command: str, files: List[str], reader: Callable[[str, int], bytes], budget: int) -> CommandOutput:
+    """按 head/tail 格式输出多个文件（多文件时带 ==> 文件名 <== 标题）"""
+    out = _OutputBuffer(budget)
+    returncode = 0
+    printed = 0
+
+    for path in files:
+        error = _open_error(command, path)
+        if error:
+            out.error(error)
+            returncode = 1
+            continue
+
+        if len(files) > 1:
+            header = f"==> {path} <==\n"
+            if not out.write(("\n" if printed else "").encode() + header.encode('utf-8')):
+                break
+        printed += 1
+
+        if not out.write(reader(path, out.remaining + 1)):
+            break
+
+    return out.result(returncode)
+
+
+def native_cat(args: List[str], budget: int) -> Optional[CommandOutput]:
+    """cat：按预算读取文件内容"""
+    if not args or any(arg.startswith('-') and arg != '-' for arg in args) or '-' in args:
+        return None
+
+    out = _OutputBuffer(budget)
+    returncode = 0
+    for path in args:
+        error = _open_error('cat', path)
+        if error:
+            out.error(error)
+            returncode = 1
+            continue
+
+        with open(path, 'rb') as f:
+            if not out.write(f.read(out.remaining + 1)):
+                break
+
+    return out.result(returncode)
+
+
+def _head_lines(path: str, count: int, limit: int) -> bytes:
+    """读取文件前 count 行（最多 limit 字节）"""
+    data = bytearray()
+    with open(path, 'rb') as f:
+        for _ in range(count):
+            line = f.readline(limit - len(data))
+            if not line:
+                break
+            data.extend(line)
+            if len(data) >= limit:
+                break
+    return bytes(data)
+
+
+def _tail_lines(path: str, count: int, limit: int, block_size: int = 8192) -> bytes:
+    """从文件末尾向前分块读取，取最后 count 行（最多 limit 字节）"""
+    if count == 0:
+        return b""
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        blocks = []
+        separators = 0
+
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            separators += block.count(b"\n")
+            if not blocks and block.endswith(b"\n"):
+                # 末尾换行是最后一行的结束符，不算作分隔
+                separators -= 1
+            blocks.append(block)
+            if separators >= count:
+                break
+
+    data = b"".join(reversed(blocks))
+    body = data[:-1] if data.endswith(b"\n") else data
+    cut = len(body)
+    for _ in range(count):
+        cut = body.rfind(b"\n", 0, cut)
+        if cut < 0:
+            break
+
+    result = data[cut + 1:] if cut >= 0 else data
+    # 超出预算时保留开头部分（与顺序读取的截断行为一致）
+    return result[:limit]
+
+
+def native_head(args: List[str], budget: int) -> Optional[CommandOutput]:
+    """head：只读取前 N 行"""
+    parsed = _parse_line_count(args)
+    if parsed is None:
+        return None
+    count, files = parsed
+    return _write_headers('head', files, lambda path, limit: _head_lines(path, count, limit), budget)
+
+
+def native_tail(args: List[str], budget: int) -> Optional[CommandOutput]:
+    """tail：从文件末尾反向定位最后 N 行"""
+    parsed = _parse_line_count(args)
+    if parsed is None:
+        return None
+    count, files = parsed
+    if count == 0:
+        # GNU tail -n 0 不打开文件，也不输出标题
+        return _OutputBuffer(budget).result(0)
+    return _write_headers('tail', files, lambda path, limit: _tail_lines(path, count, limit), budget)
+
+
+# grep 支持的单字母选项
+GREP_FLAGS = set("invcwlFEHh")
+
+# GNU grep 支持、Python re 语义一致的转义
+GREP_ESCAPES = set("wWsSbB")
+
+# 含非 ASCII 字节的文件需解码后匹配，超过该大小时交给原命令
+GREP_DECODE_LIMIT = 64 * 1024 * 1024
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+
+def _grep_pattern_to_regex(pattern: str, extended: bool, fixed: bool) -> Optional[str]:
+    """把 grep 的 BRE/ERE 模式转换为 Python 正则
+
+    Returns:
+        Python 正则，无法保证语义一致时返回 None
+    """
+    if fixed:
+        return re.escape(pattern)
+
+    # POSIX 字符类等暂不转换
+    if '[:' in pattern or '[=' in pattern or '[.' in pattern:
+        return None
+
+    result = []
+    i = 0
+    in_bracket = False
+    while i < len(pattern):
+        char = pattern[i]
+
+        if in_bracket:
+            if char == ']' and not pattern[i - 1] == '[' and not pattern[i - 2:i] == '[^':
+                in_bracket = False
+            result.append('\\\\' if char == '\\' else char)
+            i += 1
+            continue
+
+        if char == '[':
+            in_bracket = True
+            result.append(char)
+            i += 1
+            continue
+
+        if char == '\\' and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            i += 2
+            if nxt in '<>':
+                result.append(r'\b')
+            elif nxt.isdigit():
+                result.append('\\' + nxt)
+            elif nxt.isalpha():
+                if nxt not in GREP_ESCAPES:
+                    return None
+                result.append('\\' + nxt)
+            elif not extended and nxt in '+?|(){}':
+                # BRE 中 \+ \? \| \( \) \{ \} 是元字符
+                result.append(nxt)
+            else:
+                result.append(re.escape(nxt))
+            continue
+
+        if not extended and char in '+?|(){}':
+            # BRE 中这些字符是普通字符
+            result.append('\\' + char)
+        else:
+            result.append(char)
+        i += 1
+
+    return ''.join(result)
+
+
+def native_grep(args: List[str], budget: int) -> Optional[CommandOutput]:
+    """grep：编译正则后在内存映射的文件上检索"""
+    flags = set()
+    operands = []
+    for arg in args:
+        if arg.startswith('-') and len(arg) > 1:
+            letters = set(arg[1:])
+            if not letters <= GREP_FLAGS:
+                return None
+            flags |= letters
+        else:
+            operands.append(arg)
+
+    # 从标准输入读取时交给原命令
+    if len(operands) < 2:
+        return None
+
+    pattern, files = operands[0], operands[1:]
+    regex_source = _grep_pattern_to_regex(pattern, extended='E' in flags, fixed='F' in flags)
+    if regex_source is None:
+        return None
+    if 'w' in flags:
+        regex_source = rf'(?<!\w)(?:{regex_source})(?!\w)'
+
+    try:
+        # MULTILINE：在整个映射上搜索时 ^/$ 仍按行匹配
+        regex_flags = re.MULTILINE | (re.IGNORECASE if 'i' in flags else 0)
+        text_regex = re.compile(regex_source, regex_flags)
+        # 纯 ASCII 的模式和文件直接用字节正则在映射上搜索；
+        # 含多字节字符时字节正则会把一个字符当成多个字节（.、-i、-w、量词都不对），改用 str 正则
+        regex = re.compile(regex_source.encode('ascii'), regex_flags) if pattern.isascii() else None
+    except re.error:
+        return None
+
+    with_filename = ('H' in flags or len(files) > 1) and 'h' not in flags
+    out = _OutputBuffer(budget)
+    matched_any = False
+    had_error = False
+
+    for path in files:
+        error = _open_error('grep', path)
+        if error:
+            out.error(error)
+            had_error = True
+            continue
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                lines = []
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    # 二进制文件的输出格式特殊，交给原命令
+                    if b"\0" in data[:32768]:
+                        return None
+                    if regex is not None and _NON_ASCII.search(data) is None:
+                        lines = _grep_lines(data, regex, invert='v' in flags)
+                    else:
+                        if size > GREP_DECODE_LIMIT:
+                            return None
+                        try:
+                            text = data[:].decode('utf-8')
+                        except UnicodeDecodeError:
+                            # 非 UTF-8 文件的匹配规则与 grep 不同，交给原命令
+                            return None
+                        lines = [
+                            (line_number, line.encode('utf-8'))
+                            for line_number, line in _grep_lines(text, text_regex, invert='v' in flags)
+                        ]
+
+        prefix = f"{path}:".encode('utf-8') if with_filename else b""
+        if lines:
+            matched_any = True
+
+        if 'l' in flags:
+            if lines and not out.write(path.encode('utf-8') + b"\n"):
+                break
+            continue
+
+        if 'c' in flags:
+            if not out.write(prefix + f"{len(lines)}\n".encode()):
+                break
+            continue
+
+        for line_number, line in lines:
+            number = f"{line_number}:".encode() if 'n' in flags else b""
+            if not out.write(prefix + number + line + b"\n"):
+                break
+        if out.truncated:
+            break
+
+    # 与 GNU grep 一致：任一文件出错即返回 2（即使其他文件有匹配）
+    returncode = 2 if had_error else (0 if matched_any else 1)
+    return out.result(returncode)
+
+
+def _grep_lines(data: Union[mmap.mmap, str], regex: re.Pattern, invert: bool) -> List[tuple[int, Union[bytes, str]]]:
+    """在内存映射数据（或解码后的文本）上逐行匹配
+
+    Returns:
+        [(行号, 行内容)]
+    """
+    newline = "\n" if isinstance(data, str) else b"\n"
+    size = len(data)
+    results = []
+
+    if invert:
+        line_number = 0
+        position = 0
+        while position < size:
+            end = data.find(newline, position)
+            if end < 0:
+                end = size
+            line_number += 1
+            line = data[position:end]
+            if not regex.search(line):
+                results.append((line_number, line))
+            position = end + 1
+        return results
+
+    # 正向匹配：直接在整个映射上搜索，命中后再定位所在行，避免逐行调用正则
+    line_number = 1
+    counted_to = 0
+    position = 0
+    while position < size:
+        match = regex.search(data, position)
+        if match is None:
+            break
+        # 以换行结尾的文件，末尾换行之后不再是一行（能匹配空串的模式会在这里命中）
+        if match.start() == size and data[size - 1:size] == newline:
+            break
+
+        line_start = data.rfind(newline, 0, match.start()) + 1
+        line_end = data.find(newline, line_start)
+        if line_end < 0:
+            line_end = size
+        line = data[line_start:line_end]
+
+        # 跨行匹配（如 \s 匹配到换行）不算数：在单行内复核
+        if match.end() <= line_end or regex.search(line):
+            line_number += data[counted_to:line_start].count(newline)
+            counted_to = line_start
+            results.append((line_number, line))
+
+        position = line_end + 1
+
+    return results
+
+
+def read_meminfo(path: str = "/proc/meminfo") -> Dict[str, int]:
+    """读取 /proc/meminfo（单位：字节）"""
+    info = {}
+    with open(path, 'r') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            parts = value.split()
+            if parts:
+                info[key] = int(parts[0]) * 1024
+    return info
+
+
+def memory_usage() -> Dict[str, int]:
+    """按 procps free 的口径计算内存使用（单位：字节）"""
+    info = read_meminfo()
+    total = info.get('MemTotal', 0)
+    available = info.get('MemAvailable', info.get('MemFree', 0))
+    swap_total = info.get('SwapTotal', 0)
+    swap_free = info.get('SwapFree', 0)
+    return {
+        "total": total,
+        "used": total - available,
+        "free": info.get('MemFree', 0),
+        "shared": info.get('Shmem', 0),
+        "buff_cache": info.get('Buffers', 0) + info.get('Cached', 0) + info.get('SReclaimable', 0),
+        "available": available,
+        "swap_total": swap_total,
+        "swap_used": swap_total - swap_free,
+        "swap_free": swap_free
+    }
+
+
+def _human_size(value: int) -> str:
+    """procps 风格的人类可读大小（如 5.9Gi、498Mi、0B）"""
+    if len(f"{value}B") <= 4:
+        return f"{value}B"
+    for power, unit in enumerate("KMGTPE", start=1):
+        scaled = value / (1024 ** power)
+        text = f"{scaled:.1f}{unit}"
+        if len(text) <= 4:
+            return text + "i"
+        text = f"{int(scaled)}{unit}"
+        if len(text) <= 4:
+            return text + "i"
+    return f"{value}B"
+
+
+# free 单位选项 -> 右移位数
+FREE_UNITS = {'-b': 0, '-k': 10, '-m': 20, '-g': 30}
+
+
+def native_free(args: List[str], budget: int) -> Optional[CommandOutput]:
+    """free：读取 /proc/meminfo，输出 procps 格式"""
+    shift = 10
+    human = False
+    for arg in args:
+        if arg in FREE_UNITS:
+            shift = FREE_UNITS[arg]
+        elif arg == '-h':
+            human = True
+        else:
+            return None
+
+    if not os.path.exists("/proc/meminfo"):
+        return None
+
+    usage = memory_usage()
+
+    def fmt(value: int) -> str:
+        return _human_size(value) if human else str(value >> shift)
+
+    def row(label: str, values: List[str]) -> str:
+        return f"{label:<7} {values[0]:>12}" + "".join(f" {value:>11}" for value in values[1:])
+
+    lines = [
+        row("", ["total", "used", "free", "shared", "buff/cache", "available"]),
+        row("Mem:", [fmt(usage[key]) for key in ("total", "used", "free", "shared", "buff_cache", "available")]),
+        row("Swap:", [fmt(usage[key]) for key in ("swap_total", "swap_used", "swap_free")])
+    ]
+
+    out = _OutputBuffer(budget)
+    out.write(("\n".join(lines) + "\n").encode('utf-8'))
+    return out.result(0)
+
+
+# 命令名 -> 进程内实现
+NATIVE_COMMANDS: Dict[str, Callable[[List[str], int], Optional[CommandOutput]]] = {
+    'cat': native_cat,
+    'head': native_head,
+    'tail': native_tail,
+    'grep': native_grep,
+    'free': native_free,
+}
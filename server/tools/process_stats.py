@@ -0,0 +1,192 @@
+"""
+进程资源统计模块
+
+直接扫描 /proc/<pid>/stat 和 /proc/<pid>/status 获取各进程的 CPU 时间和内存占用，
+在相邻两次扫描间求差得到 CPU 使用率，无需 fork ps 再由模型解析大段文本。
+遵循章程：真实实现，不允许虚假实现或占位符
+"""
+
+import os
+import pwd
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .native_commands import read_meminfo
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+@dataclass
+class ProcessInfo:
+    """单个进程的一次快照"""
+
+    pid: int
+    name: str
+    state: str
+    user: str
+    cpu_ticks: int     # utime + stime（时钟滴答）
+    start_time: int    # 进程启动时间（时钟滴答），用于识别 PID 复用
+    rss: int           # 常驻内存（字节）
+    threads: int
+    cpu_percent: float = 0.0
+    memory_percent: float = 0.0
+
+
+class ProcessScanner:
+    """进程扫描器
+
+    保留上一次扫描结果：两次查询间隔在 [min_interval, max_age] 内时直接与上次求差，
+    否则现场扫描两次（间隔 min_interval 秒）。CPU 使用率口径与 top 一致（单核满载为 100%）。
+    """
+
+    SORT_KEYS = {
+        "cpu": lambda p: (p.cpu_percent, p.rss),
+        "memory": lambda p: (p.rss, p.cpu_percent)
+    }
+
+    def __init__(self, proc_root: str = "/proc", min_interval: float = 0.5, max_age: float = 10.0):
+        """初始化扫描器
+
+        Args:
+            proc_root: procfs 挂载点
+            min_interval: 计算 CPU 使用率的最短采样间隔（秒）
+            max_age: 上次扫描结果的最长有效期（秒），超过则重新建立基线
+        """
+        self.proc_root = proc_root
+        self.min_interval = min_interval
+        self.max_age = max_age
+
+        self._previous: Optional[Dict[int, ProcessInfo]] = None
+        self._previous_time = 0.0
+        self._users: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def top(self, n: int = 10, sort_by: str = "cpu") -> dict:
+        """获取资源占用最高的 n 个进程
+
+        Args:
+            n: 返回的进程数
+            sort_by: 排序依据（'cpu' 或 'memory'）
+
+        Returns:
+            {"processes": [ProcessInfo], "total": 进程总数, "interval": 采样间隔（秒）}
+        """
+        if sort_by not in self.SORT_KEYS:
+            raise ValueError(f"不支持的排序方式: {sort_by}（可选: {', '.join(self.SORT_KEYS)}）")
+
+        with self._lock:
+            now = time.monotonic()
+            age = now - self._previous_time
+            if self._previous is None or age > self.max_age:
+                self._previous = self.scan()
+                self._previous_time = now
+                age = 0.0
+            if age < self.min_interval:
+                time.sleep(self.min_interval - age)
+
+            previous = self._previous
+            current = self.scan()
+            current_time = time.monotonic()
+            interval = current_time - self._previous_time
+            self._previous = current
+            self._previous_time = current_time
+
+        meminfo = read_meminfo(os.path.join(self.proc_root, "meminfo"))
+        memory_total = meminfo.get("MemTotal", 0)
+
+        for pid, info in current.items():
+            before = previous.get(pid)
+            if before is not None and before.start_time == info.start_time:
+                delta = info.cpu_ticks - before.cpu_ticks
+            else:
+                # 采样期间新启动的进程：按启动以来的全部 CPU 时间计算
+                delta = info.cpu_ticks
+            info.cpu_percent = max(0.0, 100.0 * delta / CLOCK_TICKS / interval) if interval > 0 else 0.0
+            info.memory_percent = 100.0 * info.rss / memory_total if memory_total else 0.0
+
+        processes = sorted(current.values(), key=self.SORT_KEYS[sort_by], reverse=True)
+        return {
+            "processes": processes[:max(1, n)],
+            "total": len(current),
+            "interval": interval
+        }
+
+    def scan(self) -> Dict[int, ProcessInfo]:
+        """扫描全部进程（扫描期间退出的进程直接跳过）"""
+        processes = {}
+        for entry in os.listdir(self.proc_root):
+            if not entry.isdigit():
+                continue
+            info = self._read_process(int(entry))
+            if info is not None:
+                processes[info.pid] = info
+        return processes
+
+    def _read_process(self, pid: int) -> Optional[ProcessInfo]:
+        """读取单个进程的 stat 和 status"""
+        base = os.path.join(self.proc_root, str(pid))
+        try:
+            with open(os.path.join(base, "stat"), 'rb') as f:
+                stat = f.read().decode('utf-8', errors='replace')
+            with open(os.path.join(base, "status"), 'rb') as f:
+                status = f.read().decode('utf-8', errors='replace')
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            return None
+
+        # 进程名可能包含空格和括号，以最后一个 ')' 分隔
+        name_start = stat.find('(')
+        name_end = stat.rfind(')')
+        if name_start < 0 or name_end < 0:
+            return None
+        fields = stat[name_end + 2:].split()
+        if len(fields) < 22:
+            return None
+
+        uid = None
+        rss = None
+        for line in status.splitlines():
+            if line.startswith("Uid:"):
+                uid = int(line.split()[1])
+            elif line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) * 1024
+        if rss is None:
+            # 内核线程没有 VmRSS，使用 stat 中的页数
+            rss = int(fields[21]) * PAGE_SIZE
+
+        return ProcessInfo(
+            pid=pid,
+            name=stat[name_start + 1:name_end],
+            state=fields[0],
+            user=self._user_name(uid),
+            cpu_ticks=int(fields[11]) + int(fields[12]),
+            start_time=int(fields[19]),
+            rss=rss,
+            threads=int(fields[17])
+        )
+
+    def _user_name(self, uid: Optional[int]) -> str:
+        """UID 转用户名（带缓存）"""
+        if uid is None:
+            return "?"
+        if uid not in self._users:
+            try:
+                self._users[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                self._users[uid] = str(uid)
+        return self._users[uid]
+
+    def read_command_line(self, pid: int, max_length: int = 60) -> str:
+        """读取进程命令行（内核线程或已退出的进程返回空字符串）"""
+        try:
+            with open(os.path.join(self.proc_root, str(pid), "cmdline"), 'rb') as f:
+                data = f.read(max_length * 4)
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            return ""
+        # 参数中的换行、制表符等压缩为单个空格，保证表格一行一个进程
+        command = " ".join(data.replace(b"\0", b" ").decode('utf-8', errors='replace').split())
+        if len(command) > max_length:
+            command = command[:max_length - 3] + "..."
+        return command
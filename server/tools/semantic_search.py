@@ -8,7 +8,6 @@
 消除代码重复：90% → 0%
 """
 
-import asyncio
 import logging
 import os
 import re
@@ -162,19 +161,24 @@ class SemanticSearchTool(Tool):
         indexed_files = self.vector_store.list_files()
 
         for file_id in indexed_files:
-            index = self.vector_store.get_index(file_id)
-            if not index:
+            # 先用清单匹配，命中后才加载索引（懒加载模式下避免加载全部索引）
+            entry = self.vector_store.get_manifest(file_id)
+            if not entry:
                 continue
 
             # scope 过滤
-            filepath = index.chunk_metadata[0].get('filepath', '') if index.chunk_metadata else ''
+            filepath = entry.filepath
             if scope == "uploads" and not filepath.startswith("storage/uploads"):
                 continue
             if scope == "system" and filepath.startswith("storage/uploads"):
                 continue
 
             # 精确匹配文件名
-            if index.filename == target_filename or os.path.basename(filepath) == target_filename:
+            if entry.filename == target_filename or os.path.basename(filepath) == target_filename:
+                index = self.vector_store.get_index(file_id)
+                if not index:
+                    continue
+
                 results.append({
                     'filepath': filepath,
                     'filename': index.filename,
@@ -210,18 +214,19 @@ class SemanticSearchTool(Tool):
         indexed_files = self.vector_store.list_files()
 
         for file_id in indexed_files:
-            index = self.vector_store.get_index(file_id)
-            if not index:
+            # 先用清单匹配，命中后才加载索引（懒加载模式下避免加载全部索引）
+            entry = self.vector_store.get_manifest(file_id)
+            if not entry:
                 continue
 
             # scope 过滤
-            filepath = index.chunk_metadata[0].get('filepath', '') if index.chunk_metadata else ''
+            filepath = entry.filepath
             if scope == "uploads" and not filepath.startswith("storage/uploads"):
                 continue
             if scope == "system" and filepath.startswith("storage/uploads"):
                 continue
 
-            filename = index.filename.lower()
+            filename = entry.filename.lower()
             basename = os.path.basename(filepath).lower()
 
             # 模糊匹配策略
@@ -246,6 +251,10 @@ class SemanticSearchTool(Tool):
                     similarity = 0.85
 
             if match:
+                index = self.vector_store.get_index(file_id)
+                if not index:
+                    continue
+
                 results.append({
                     'filepath': filepath,
                     'filename': index.filename,
@@ -428,43 +437,12 @@ class SemanticSearchTool(Tool):
             # 第3层：向量语义检索（兜底策略，如果前两层未满）
             semantic_results = []
             if len(exact_results) + len(fuzzy_results) < top_k:
-                # 需要异步执行语义检索
-                try:
-                    # 尝试在当前事件循环中运行
-                    loop = asyncio.get_running_loop()
-                    # 如果已经在运行中，使用asyncio.run_coroutine_threadsafe或直接在当前循环中调度
-                    # 但execute()是同步方法，无法使用await
-                    # 所以需要在新线程中运行协程
-                    import concurrent.futures
-                    import threading
-
-                    result = [None]
-                    exception = [None]
-
-                    def run_in_new_loop():
-                        try:
-                            new_loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(new_loop)
-                            result[0] = new_loop.run_until_complete(
-                                self._search_semantic(query, scope, top_k - len(exact_results) - len(fuzzy_results))
-                            )
-                            new_loop.close()
-                        except Exception as e:
-                            exception[0] = e
-
-                    thread = threading.Thread(target=run_in_new_loop)
-                    thread.start()
-                    thread.join(timeout=10)  # 最多等待10秒
-
-                    if exception[0]:
-                        raise exception[0]
-                    semantic_results = result[0] if result[0] is not None else []
-
-                except RuntimeError:
-                    # 没有运行中的事件循环，使用asyncio.run()
-                    semantic_results = asyncio.run(
-                        self._search_semantic(query, scope, top_k - len(exact_results) - len(fuzzy_results))
-                    )
+                # 需要异步执行语义检索：execute() 是同步方法，
+                # 由 _run_async 提交到主事件循环（或在无循环时直接运行）
+                semantic_results = self._run_async(
+                    self._search_semantic(query, scope, top_k - len(exact_results) - len(fuzzy_results)),
+                    timeout=10
+                )
                 logger.info(f"[SEARCH] query=\"{query}\" semantic_match={len(semantic_results)}")
 
             # 合并并去重结果
@@ -14,6 +14,11 @@ NPLT (Network Protocol for LLM Transport) 是一个轻量级的二进制应用
 +--------+--------+--------+----------+
 
 注：v1 协议使用 1 字节长度字段（最大 255 字节），v2 扩展为 2 字节（最大 65535 字节）
+
+多路上传：FILE_METADATA 中携带 stream_id（1-65535）时，该上传的数据以 STREAM_DATA
+消息发送，载荷以 2 字节大端序 stream_id 开头，同一连接上可同时进行多个上传。
+不带 stream_id 的上传（stream_id 视为 0）使用 FILE_DATA，载荷为原始文件数据。
+两种帧由消息类型区分，可在同一连接上混用。
 """
 
 import struct
@@ -37,6 +42,9 @@ class MessageType(IntEnum):
     SESSION_NEW = 0x16        # 创建新会话
     SESSION_DELETE = 0x17     # 删除会话
     CLIENT_UDP_PORT = 0x18    # 客户端 UDP 端口注册（用于 RDT 文件传输）
+    FOLLOW_STOP = 0x19        # 停止日志跟踪（数据为文件路径，空表示全部）
+    FILE_OFFSET = 0x1A        # 续传偏移（服务器 -> 客户端，JSON：upload_id、offset）
+    STREAM_DATA = 0x1B        # 多路上传数据（载荷以 2 字节 stream_id 开头）
 
 
 @dataclass
@@ -126,3 +134,39 @@ class NPLTMessage:
         """字符串表示（用于调试）"""
         data_str = self.data.decode('utf-8', errors='replace')[:50]
         return f"NPLTMessage(type={self.type.name}, seq={self.seq}, data='{data_str}')"
+
+
+STREAM_ID_FORMAT = ">H"
+STREAM_ID_SIZE = struct.calcsize(STREAM_ID_FORMAT)
+MAX_STREAM_CHUNK = NPLTMessage.MAX_DATA_LENGTH - STREAM_ID_SIZE  # 多路上传单帧最大文件数据
+
+
+def encode_stream_chunk(stream_id: int, chunk: bytes) -> bytes:
+    """为多路上传的 STREAM_DATA 载荷加上 stream_id 前缀
+
+    Args:
+        stream_id: 上传流 ID（1-65535）
+        chunk: 文件数据
+
+    Returns:
+        STREAM_DATA 载荷
+    """
+    return struct.pack(STREAM_ID_FORMAT, stream_id) + chunk
+
+
+def decode_stream_chunk(data: bytes) -> tuple[int, memoryview]:
+    """拆分多路上传的 STREAM_DATA 载荷
+
+    Args:
+        data: STREAM_DATA 载荷
+
+    Returns:
+        (stream_id, 文件数据视图)
+
+    Raises:
+        ValueError: 载荷短于 stream_id 前缀
+    """
+    if len(data) < STREAM_ID_SIZE:
+        raise ValueError(f"数据块太短：{len(data)} < {STREAM_ID_SIZE}")
+    stream_id, = struct.unpack_from(STREAM_ID_FORMAT, data)
+    return stream_id, memoryview(data)[STREAM_ID_SIZE:]
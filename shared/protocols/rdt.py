@@ -12,12 +12,57 @@ RDT (Reliable Data Transfer) 是一个基于滑动窗口的可靠数据传输协
 | Seq    | Check  | Data     |
 | 2 Bytes| 2 Bytes| <=1024 Bytes|
 +--------+--------+----------+
+
+选择确认（SACK，经 DOWNLOAD_OFFER 的 features 协商，旧客户端继续使用 ACK）：
++--------+----------+--------+
+| Seq    | Bitmap   | Check  |
+| 2 Bytes| 8 Bytes  | 2 Bytes|
++--------+----------+--------+
+Bitmap 第 i 位表示序列号 Seq+1+i 的包已收到。
+
+v2（经 CLIENT_UDP_PORT 的 rdt_versions 和 DOWNLOAD_OFFER 的 rdt_version 协商）：
+32 位序列号（1400 字节分片可传输约 5.6 TiB），传输 ID 区分同一地址上的多个传输，
+整个包用 CRC32 校验。
+数据包：
++--------+--------+-------------+--------+--------+------------+
+| Ver(2) | 保留   | Transfer ID | Seq    | CRC32  | Data       |
+| 1 Byte | 1 Byte | 4 Bytes     | 4 Bytes| 4 Bytes| <=1400 Bytes|
++--------+--------+-------------+--------+--------+------------+
+确认包（总是携带 SACK 位图）：
++--------+--------+-------------+--------+----------+--------+
+| Ver(2) | 保留   | Transfer ID | Seq    | Bitmap   | CRC32  |
+| 1 Byte | 1 Byte | 4 Bytes     | 4 Bytes| 8 Bytes  | 4 Bytes|
++--------+--------+-------------+--------+----------+--------+
 """
 
 import struct
 import zlib
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
+
+# DOWNLOAD_OFFER 中声明的可选特性
+FEATURE_SACK = "sack"
+
+# 协议版本
+RDT_VERSION_1 = 1
+RDT_VERSION_2 = 2
+SUPPORTED_VERSIONS = (RDT_VERSION_1, RDT_VERSION_2)
+
+SACK_BITMAP_BITS = 64
+
+
+def sack_bitmap(seq: int, received) -> int:
+    """构造 SACK 位图：第 i 位表示 seq+1+i 在 received 中"""
+    bitmap = 0
+    for i in range(SACK_BITMAP_BITS):
+        if seq + 1 + i in received:
+            bitmap |= 1 << i
+    return bitmap
+
+
+def sack_seqs(seq: int, bitmap: int) -> List[int]:
+    """解析 SACK 位图，返回标记为已收到的序列号"""
+    return [seq + 1 + i for i in range(SACK_BITMAP_BITS) if bitmap >> i & 1]
 
 
 def crc16(data: bytes) -> int:
@@ -133,7 +178,7 @@ class RDTPacket:
 @dataclass
 class ACKPacket:
     """ACK 确认包"""
-    seq: int  # 确认的序列号（表示已收到此序列号及之前的所有包）
+    seq: int  # 累积确认号：接收方期望的下一个序列号（表示此序列号之前的所有包均已收到）
     checksum: int
 
     HEADER_FORMAT = ">HH"
@@ -175,3 +220,190 @@ class ACKPacket:
     def __str__(self) -> str:
         """字符串表示（用于调试）"""
         return f"ACKPacket(seq={self.seq}, checksum={self.checksum:04x})"
+
+
+@dataclass
+class SACKPacket:
+    """选择确认包（累积确认号 + 之后已收到包的位图）"""
+    seq: int  # 累积确认号，含义同 ACKPacket.seq
+    bitmap: int  # 第 i 位表示 seq+1+i 已收到
+    checksum: int
+
+    BITMAP_BITS = SACK_BITMAP_BITS
+    HEADER_FORMAT = ">HQH"
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+    @classmethod
+    def from_received(cls, seq: int, received) -> 'SACKPacket':
+        """根据已收到的序列号集合构造（只报告 seq 之后 BITMAP_BITS 个序列号内的包）"""
+        return cls(seq=seq, bitmap=sack_bitmap(seq, received), checksum=0)
+
+    def received_seqs(self) -> List[int]:
+        """位图中标记为已收到的序列号"""
+        return sack_seqs(self.seq, self.bitmap)
+
+    def encode(self) -> bytes:
+        """编码为字节流"""
+        data_to_checksum = struct.pack(">HQ", self.seq, self.bitmap)
+        computed_checksum = crc16(data_to_checksum)
+
+        return struct.pack(
+            self.HEADER_FORMAT,
+            self.seq,
+            self.bitmap,
+            computed_checksum
+        )
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'SACKPacket':
+        """从字节流解码"""
+        if len(data) < cls.HEADER_SIZE:
+            raise ValueError(
+                f"SACK 包太短：{len(data)} < {cls.HEADER_SIZE}"
+            )
+
+        seq, bitmap, checksum = struct.unpack(
+            cls.HEADER_FORMAT,
+            data[:cls.HEADER_SIZE]
+        )
+
+        return cls(seq=seq, bitmap=bitmap, checksum=checksum)
+
+    def validate(self) -> bool:
+        """验证 SACK 包校验和"""
+        data_to_checksum = struct.pack(">HQ", self.seq, self.bitmap)
+        computed_checksum = crc16(data_to_checksum)
+        return self.checksum == computed_checksum
+
+    def __str__(self) -> str:
+        """字符串表示（用于调试）"""
+        return f"SACKPacket(seq={self.seq}, bitmap={self.bitmap:016x}, checksum={self.checksum:04x})"
+
+
+@dataclass
+class RDTPacketV2:
+    """RDT v2 数据包"""
+    transfer_id: int
+    seq: int
+    data: bytes
+    checksum: int = 0
+
+    VERSION = RDT_VERSION_2
+    MAX_DATA_LENGTH = 1400  # 加上 14 字节头部和 28 字节 UDP/IP 头部，不超过以太网 MTU
+    MAX_SEQ = 0xFFFFFFFF
+    HEADER_FORMAT = ">BxIII"  # 版本, 保留, 传输 ID, 序列号, CRC32
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+    def _compute_checksum(self) -> int:
+        header = struct.pack(">BxII", self.VERSION, self.transfer_id, self.seq)
+        return zlib.crc32(self.data, zlib.crc32(header))
+
+    def encode(self) -> bytes:
+        """编码为字节流"""
+        if len(self.data) > self.MAX_DATA_LENGTH:
+            raise ValueError(
+                f"数据长度超过限制：{len(self.data)} > {self.MAX_DATA_LENGTH}"
+            )
+
+        header = struct.pack(
+            self.HEADER_FORMAT,
+            self.VERSION,
+            self.transfer_id,
+            self.seq,
+            self._compute_checksum()
+        )
+        return header + self.data
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'RDTPacketV2':
+        """从字节流解码"""
+        if len(data) < cls.HEADER_SIZE:
+            raise ValueError(
+                f"数据包太短：{len(data)} < {cls.HEADER_SIZE}"
+            )
+
+        version, transfer_id, seq, checksum = struct.unpack(
+            cls.HEADER_FORMAT,
+            data[:cls.HEADER_SIZE]
+        )
+        if version != cls.VERSION:
+            raise ValueError(f"协议版本不匹配：{version}")
+
+        payload = data[cls.HEADER_SIZE:]
+        if len(payload) > cls.MAX_DATA_LENGTH:
+            raise ValueError(
+                f"数据长度超过限制：{len(payload)} > {cls.MAX_DATA_LENGTH}"
+            )
+
+        return cls(transfer_id=transfer_id, seq=seq, data=payload, checksum=checksum)
+
+    def validate(self) -> bool:
+        """验证数据包校验和"""
+        return self.checksum == self._compute_checksum()
+
+    def __str__(self) -> str:
+        """字符串表示（用于调试）"""
+        return (f"RDTPacketV2(transfer_id={self.transfer_id}, seq={self.seq}, "
+                f"checksum={self.checksum:08x}, data_len={len(self.data)})")
+
+
+@dataclass
+class ACKPacketV2:
+    """RDT v2 确认包（累积确认号 + SACK 位图）"""
+    transfer_id: int
+    seq: int  # 累积确认号，含义同 ACKPacket.seq
+    bitmap: int = 0  # 第 i 位表示 seq+1+i 已收到
+    checksum: int = 0
+
+    VERSION = RDT_VERSION_2
+    HEADER_FORMAT = ">BxIIQI"  # 版本, 保留, 传输 ID, 累积确认号, 位图, CRC32
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+    @classmethod
+    def from_received(cls, transfer_id: int, seq: int, received) -> 'ACKPacketV2':
+        """根据已收到的序列号集合构造"""
+        return cls(transfer_id=transfer_id, seq=seq, bitmap=sack_bitmap(seq, received))
+
+    def received_seqs(self) -> List[int]:
+        """位图中标记为已收到的序列号"""
+        return sack_seqs(self.seq, self.bitmap)
+
+    def _compute_checksum(self) -> int:
+        return zlib.crc32(struct.pack(">BxIIQ", self.VERSION, self.transfer_id, self.seq, self.bitmap))
+
+    def encode(self) -> bytes:
+        """编码为字节流"""
+        return struct.pack(
+            self.HEADER_FORMAT,
+            self.VERSION,
+            self.transfer_id,
+            self.seq,
+            self.bitmap,
+            self._compute_checksum()
+        )
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'ACKPacketV2':
+        """从字节流解码"""
+        if len(data) < cls.HEADER_SIZE:
+            raise ValueError(
+                f"ACK 包太短：{len(data)} < {cls.HEADER_SIZE}"
+            )
+
+        version, transfer_id, seq, bitmap, checksum = struct.unpack(
+            cls.HEADER_FORMAT,
+            data[:cls.HEADER_SIZE]
+        )
+        if version != cls.VERSION:
+            raise ValueError(f"协议版本不匹配：{version}")
+
+        return cls(transfer_id=transfer_id, seq=seq, bitmap=bitmap, checksum=checksum)
+
+    def validate(self) -> bool:
+        """验证确认包校验和"""
+        return self.checksum == self._compute_checksum()
+
+    def __str__(self) -> str:
+        """字符串表示（用于调试）"""
+        return (f"ACKPacketV2(transfer_id={self.transfer_id}, seq={self.seq}, "
+                f"bitmap={self.bitmap:016x}, checksum={self.checksum:08x})")
@@ -21,6 +21,9 @@ class LLMConfig:
     temperature: float = 0.7
     max_tokens: int = 128000
     timeout: int = 30
+    pool_size: int = 32  # HTTP 连接池上限（所有会话共享）
+    keepalive_timeout: float = 60.0  # 空闲连接保活时间（秒）
+    connect_timeout: float = 10.0  # 建立连接（含 TLS 握手）超时（秒）
 
     def validate(self) -> bool:
         """验证配置有效性"""
@@ -41,6 +44,11 @@ class ServerConfig:
     storage_dir: str = "storage"
     logs_dir: str = "logs"
     log_level: str = "INFO"
+    monitor_interval: float = 1.0  # 系统指标采样间隔（秒）
+    monitor_history: int = 3600  # 采样历史容量（采样数），interval * history 即可查询的最长窗口
+    rdt_initial_window: int = 10  # RDT 初始拥塞窗口（包数）
+    rdt_max_window: int = 1024  # RDT 拥塞窗口上限（包数）
+    rdt_initial_rto: float = 1.0  # RDT 尚无 RTT 采样时的重传超时（秒）
 
 
 @dataclass
@@ -85,6 +93,23 @@ class FileAccessConfig:
     max_file_size: int = 10485760  # 10MB
     chunk_size: int = 500
     chunk_overlap: int = 50
+    embed_batch_size: int = 64  # 每个嵌入请求的最大分块数
+    embed_concurrency: int = 4  # 并发嵌入请求数上限
+    embed_max_retries: int = 3  # 单个批次失败后的最大重试次数
+    embed_cache_enabled: bool = True  # 按分块内容缓存嵌入向量
+    embed_cache_max_entries: int = 200000  # 嵌入缓存最大条目数（LRU 淘汰）
+
+    # 后台文件监视（auto_index 为 true 时启动）
+    watch_debounce: float = 2.0  # 防抖时间（秒）
+    watch_max_wait: float = 30.0  # 持续写入的文件最长等待时间（秒），超过后即使仍在写入也会索引
+    watch_poll_interval: float = 10.0  # 轮询模式扫描间隔（秒，inotify 不可用时）
+    watch_queue_size: int = 256  # 待索引队列容量（满时背压）
+    watch_workers: int = 2  # 索引工作协程数
+
+    # 向量存储配置
+    vector_index_type: str = "auto"  # 全局 ANN 索引类型（auto/flat/ivf/hnsw，懒加载模式下不使用）
+    vector_lazy_load: bool = False  # 懒加载：启动时只加载清单，索引按需加载
+    vector_max_resident_mb: int = 256  # 懒加载模式下常驻索引内存上限（MB）
 
     # 命令执行限制
     max_output_size: int = 102400  # 100KB
@@ -0,0 +1,192 @@
+"""
+白名单命令进程内实现的测试
+
+以系统中真实的 GNU 命令（grep/head/tail/cat）为准逐项对比输出和退出码。
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+from server.tools import native_commands
+from server.tools.native_commands import native_cat, native_grep, native_head, native_tail
+
+pytestmark = [
+    pytest.mark.unit,
+    pytest.mark.skipif(
+        any(shutil.which(command) is None for command in ("grep", "head", "tail", "cat")),
+        reason="需要 GNU grep/head/tail/cat 作为对照"
+    )
+]
+
+
+def run_gnu(command, args):
+    """执行系统命令，返回 (stdout, returncode)"""
+    result = subprocess.run([command, *args], capture_output=True, env={"LC_ALL": "C.UTF-8"})
+    return result.stdout.decode("utf-8"), result.returncode
+
+
+def run_gnu_grep(args):
+    return run_gnu("grep", args)
+
+
+def assert_same_as_gnu(args):
+    output = native_grep(args, budget=1 << 20)
+    assert output is not None
+    assert (output.stdout, output.returncode) == run_gnu_grep(args)
+
+
+@pytest.fixture
+def blank_lines_file(tmp_path):
+    path = tmp_path / "blank.txt"
+    path.write_bytes(b"x\n\n\ny\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("args", [
+    ["-n", "^$"],
+    ["-c", "^$"],
+    ["-n", "z*"],
+    ["-c", "z*"],
+    ["-n", "$"],
+])
+def test_grep_empty_match_not_past_final_newline(blank_lines_file, args):
+    """能匹配空串的模式不会在末尾换行之后多出一行"""
+    assert_same_as_gnu([*args, blank_lines_file])
+
+
+def test_grep_empty_line_numbers(blank_lines_file):
+    output = native_grep(["-n", "^$", blank_lines_file], budget=1 << 20)
+    assert output.stdout == "2:\n3:\n"
+
+
+def test_grep_empty_match_without_final_newline(tmp_path):
+    path = tmp_path / "no_newline.txt"
+    path.write_bytes(b"x\n\ny")
+    assert_same_as_gnu(["-n", "z*", str(path)])
+
+
+@pytest.fixture
+def unicode_file(tmp_path):
+    path = tmp_path / "unicode.txt"
+    path.write_text("错误日志\nΑβγ\n错误\nplain\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("args", [
+    ["错.日志"],
+    ["-i", "αβγ"],
+    ["-w", "误"],
+    ["-w", "错误"],
+    ["-n", "错?日"],
+    ["-c", "."],
+    ["-v", "错"],
+    ["-n", "pl.in"],
+])
+def test_grep_multibyte_semantics(unicode_file, args):
+    """多字节字符按字符而不是按字节匹配"""
+    assert_same_as_gnu([*args, unicode_file])
+
+
+def test_grep_error_exit_code_with_matches(unicode_file, tmp_path):
+    """任一文件出错时退出码为 2，即使其他文件有匹配"""
+    missing = str(tmp_path / "missing.txt")
+    output = native_grep(["plain", unicode_file, missing], budget=1 << 20)
+    assert output.returncode == 2
+    assert output.stdout == f"{unicode_file}:plain\n"
+    assert run_gnu_grep(["plain", unicode_file, missing]) == (output.stdout, 2)
+
+
+# ===== head / tail / cat =====
+
+@pytest.fixture
+def text_files(tmp_path):
+    """多个行数、结尾各不相同的文件"""
+    files = {
+        "lines.txt": b"".join(f"line {i}\n".encode() for i in range(1, 101)),
+        "no_newline.txt": b"first\nsecond\nthird",
+        "blank.txt": b"\n\n\nx\n\n",
+        "empty.txt": b"",
+        "unicode.txt": "错误日志\nΑβγ\n结束\n".encode("utf-8"),
+    }
+    for name, content in files.items():
+        (tmp_path / name).write_bytes(content)
+    return {name: str(tmp_path / name) for name in files}
+
+
+HEAD_TAIL_CASES = [
+    ["-n", "5", "lines.txt"],
+    ["-n", "1", "no_newline.txt"],
+    ["-n", "2", "no_newline.txt"],
+    ["-n", "3", "blank.txt"],
+    ["-n", "10", "empty.txt"],
+    ["-n", "1000", "lines.txt"],
+    ["-n", "2", "unicode.txt"],
+    ["-n", "2", "lines.txt", "no_newline.txt", "blank.txt"],
+    ["-n", "0", "lines.txt", "no_newline.txt"],
+]
+
+
+def _resolve(args, text_files):
+    return [text_files.get(arg, arg) for arg in args]
+
+
+@pytest.mark.parametrize("args", HEAD_TAIL_CASES)
+def test_head_matches_gnu(text_files, args):
+    args = _resolve(args, text_files)
+    output = native_head(args, budget=1 << 20)
+    assert (output.stdout, output.returncode) == run_gnu("head", args)
+
+
+@pytest.mark.parametrize("args", HEAD_TAIL_CASES)
+def test_tail_matches_gnu(text_files, args):
+    args = _resolve(args, text_files)
+    output = native_tail(args, budget=1 << 20)
+    assert (output.stdout, output.returncode) == run_gnu("tail", args)
+
+
+@pytest.mark.parametrize("name", ["lines.txt", "no_newline.txt", "blank.txt", "unicode.txt"])
+@pytest.mark.parametrize("count", [1, 2, 7, 1000])
+def test_tail_lines_across_blocks(text_files, name, count):
+    """小块大小覆盖跨多个块向前查找的情况"""
+    path = text_files[name]
+    data = native_commands._tail_lines(path, count, limit=1 << 20, block_size=3)
+    assert data.decode("utf-8") == run_gnu("tail", ["-n", str(count), path])[0]
+
+
+def test_tail_zero_lines_with_missing_file(text_files, tmp_path):
+    """tail -n 0 不打开文件：多文件时不输出任何内容，缺失的文件也不报错"""
+    args = ["-n", "0", text_files["lines.txt"], str(tmp_path / "missing.txt")]
+    output = native_tail(args, budget=1 << 20)
+    assert (output.stdout, output.returncode) == run_gnu("tail", args) == ("", 0)
+
+
+@pytest.mark.parametrize("command, native", [("head", native_head), ("tail", native_tail)])
+def test_head_tail_missing_file(text_files, tmp_path, command, native):
+    args = ["-n", "2", text_files["lines.txt"], str(tmp_path / "missing.txt"), text_files["no_newline.txt"]]
+    output = native(args, budget=1 << 20)
+    assert (output.stdout, output.returncode) == run_gnu(command, args)
+
+
+@pytest.mark.parametrize("names", [
+    ["lines.txt"],
+    ["no_newline.txt", "blank.txt"],
+    ["empty.txt", "unicode.txt", "no_newline.txt"],
+])
+def test_cat_matches_gnu(text_files, names):
+    args = _resolve(names, text_files)
+    output = native_cat(args, budget=1 << 20)
+    assert (output.stdout, output.returncode) == run_gnu("cat", args)
+
+
+def test_cat_missing_file(text_files, tmp_path):
+    args = [text_files["lines.txt"], str(tmp_path / "missing.txt")]
+    output = native_cat(args, budget=1 << 20)
+    assert (output.stdout, output.returncode) == run_gnu("cat", args)
+
+
+def test_tail_output_truncated_to_budget(text_files):
+    output = native_tail(["-n", "50", text_files["lines.txt"]], budget=20)
+    assert output.truncated
+    assert output.stdout == run_gnu("tail", ["-n", "50", text_files["lines.txt"]])[0][:20]